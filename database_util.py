@@ -1,7 +1,21 @@
+from contextlib import contextmanager
 from functools import wraps
+from select import select
+from threading import Condition
+from time import monotonic
+from typing import Any, Callable, Dict, Generic, Iterator, List, Optional, Type, TypeVar
 
-from psycopg2 import connect
-from psycopg2.extensions import cursor, connection
+from psycopg2 import connect, InterfaceError, OperationalError
+from psycopg2.extensions import cursor, connection, TRANSACTION_STATUS_IDLE
+
+# shared by every command line entry point
+CONNECTION_PARAMS = {
+    "dbname": "flask_recon",
+    "user": "postgres",
+    "password": "postgres",
+    "host": "localhost",
+    "port": "5432"
+}
 
 
 def commit_on_success(func):
@@ -10,21 +24,194 @@ def commit_on_success(func):
         try:
             result = func(self, *args, **kwargs)
             self._conn.commit()
-            return result
         except Exception as e:
             self._conn.rollback()
+            self.discard_after_commit()
             raise e
+        # outside the try, since the transaction is already committed and must not be rolled back
+        self.run_after_commit()
+        return result
 
     return wrapper
 
 
 class BaseHandler(cursor):
     _conn: connection
+    _after_commit: List[Callable[[], None]]
 
     def __init__(self, dbname: str, user: str, password: str, host: str, port: str):
         self._conn = connect(database=dbname, user=user, password=password, host=host, port=port)
+        self._after_commit = []
         super().__init__(self._conn)
 
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        # for state shared outside the connection that must only change once the transaction is durable
+        self._after_commit.append(callback)
+
+    def run_after_commit(self) -> None:
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def discard_after_commit(self) -> None:
+        self._after_commit = []
+
     def __del__(self):
-        self._conn.close()
+        self.disconnect()
         super().close()
+
+    @contextmanager
+    def server_side_cursor(self, name: str, itersize: int = 2000) -> Iterator[cursor]:
+        named_cursor = self._conn.cursor(name=name)
+        named_cursor.itersize = itersize
+        try:
+            yield named_cursor
+        finally:
+            named_cursor.close()
+            self._conn.rollback()
+
+    def is_healthy(self) -> bool:
+        if self._conn.closed:
+            return False
+        try:
+            self.execute("SELECT 1")
+            self.fetchone()
+            self._conn.rollback()
+            return True
+        except (OperationalError, InterfaceError):
+            return False
+
+    def listen(self, channel: str) -> None:
+        # notifications are only delivered outside a transaction, so the listening connection runs in autocommit
+        self._conn.autocommit = True
+        self.execute(f"LISTEN {channel}")
+
+    def poll_notifications(self, timeout: float) -> List[str]:
+        if select([self._conn], [], [], timeout) == ([], [], []):
+            return []
+
+        self._conn.poll()
+        payloads = [notification.payload for notification in self._conn.notifies]
+        self._conn.notifies.clear()
+        return payloads
+
+    def disconnect(self) -> None:
+        if not self._conn.closed:
+            self._conn.close()
+
+    def reset(self) -> None:
+        self.discard_after_commit()
+        if not self._conn.closed and self._conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            self._conn.rollback()
+
+    @property
+    def connection_closed(self) -> bool:
+        return bool(self._conn.closed)
+
+
+H = TypeVar("H", bound=BaseHandler)
+
+
+class PoolExhausted(Exception):
+    def __init__(self):
+        super().__init__("No database connection became available before the checkout timeout")
+
+
+class HandlerPool(Generic[H]):
+    _handler_class: Type[H]
+    _connection_params: Dict[str, Any]
+    _min_size: int
+    _max_size: int
+    _checkout_timeout: Optional[float]
+    _idle: List[H]
+    _size: int
+    _condition: Condition
+
+    def __init__(self, handler_class: Type[H], connection_params: Dict[str, Any], min_size: int = 1,
+                 max_size: int = 10, checkout_timeout: Optional[float] = 30.0):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+
+        self._handler_class = handler_class
+        self._connection_params = connection_params
+        self._min_size = min_size
+        self._max_size = max_size
+        self._checkout_timeout = checkout_timeout
+        self._condition = Condition()
+        self._idle = [self._create() for _ in range(min_size)]
+        self._size = min_size
+
+    def _create(self) -> H:
+        return self._handler_class(**self._connection_params)
+
+    def _reserve(self) -> Optional[H]:
+        deadline = None if self._checkout_timeout is None else monotonic() + self._checkout_timeout
+        with self._condition:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self._max_size:
+                    self._size += 1
+                    return None
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolExhausted()
+                self._condition.wait(remaining)
+
+    def _discard(self) -> None:
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def acquire(self) -> H:
+        while True:
+            handler = self._reserve()
+            if handler is not None:
+                if handler.is_healthy():
+                    return handler
+                self._discard()
+                continue
+
+            try:
+                return self._create()
+            except Exception:
+                self._discard()
+                raise
+
+    def release(self, handler: H) -> None:
+        if handler.connection_closed:
+            self._discard()
+            return
+
+        try:
+            handler.reset()
+        except (OperationalError, InterfaceError):
+            self._discard()
+            return
+
+        with self._condition:
+            self._idle.append(handler)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[H]:
+        handler = self.acquire()
+        try:
+            yield handler
+        finally:
+            self.release(handler)
+
+    def close(self) -> None:
+        with self._condition:
+            for handler in self._idle:
+                handler.disconnect()
+            self._size -= len(self._idle)
+            self._idle = []
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
@@ -0,0 +1,20 @@
+CREATE TABLE IF NOT EXISTS "endpoints"
+(
+    "endpoint_id" SERIAL PRIMARY KEY,
+    "url"         VARCHAR(255) NOT NULL,
+    "created_at"  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS "check_results"
+(
+    "check_id"      SERIAL PRIMARY KEY,
+    "endpoint_id"   INTEGER          NOT NULL,
+    "status_code"   INTEGER          NOT NULL,
+    "response_time" DOUBLE PRECISION NOT NULL,
+    "created_at"    TIMESTAMP        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY ("endpoint_id") REFERENCES "endpoints" ("endpoint_id")
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS "endpoint_url_index" ON "endpoints" ("url");
+CREATE INDEX IF NOT EXISTS "check_result_endpoint_created_at_index" ON "check_results" ("endpoint_id", "created_at");
+CREATE INDEX IF NOT EXISTS "check_result_created_at_index" ON "check_results" ("created_at");
@@ -1,5 +1,14 @@
+from .analysis import AnalysisPipeline, AnalysisCache
 from .database import DatabaseHandler
+from .honeypots import HoneypotCache
+from .ingestion import IngestionQueue
+from .limiter import TokenBucketLimiter, FloodAggregator
+from .metrics import METRICS, MetricsRegistry
+from .passwords import PasswordHasher, Scrypt, Pbkdf2
 from .server import Listener
-from .structures import RemoteHost, IncomingRequest, RequestMethod, RemoteHost, HALT_PAYLOAD
+from .sessions import SessionCache
+from .stats import DashboardStats
+from .tarpit import Tarpit
+from .structures import RemoteHost, IncomingRequest, RequestMethod, RemoteHost, PageCursor, HALT_PAYLOAD
 from .util import download_templates, RequestAnalyser
 from .routes import add_routes
@@ -1,14 +1,31 @@
-from os.path import isdir
 from sys import argv
 
+if "gevent" in argv:
+    if __package__:
+        # python -m has already imported the package, and with it unpatched threading, socket and psycopg2
+        print("gevent mode must be started as main.py, not with python -m flask_recon.")
+        exit(1)
+
+    # before anything imports socket, threading or psycopg2, or their blocking calls would stall every greenlet
+    from gevent.monkey import patch_all
+    from psycogreen.gevent import patch_psycopg
+
+    patch_all()
+    patch_psycopg()
+
+from os.path import isdir
+
 from flask import Flask
 
+from database_util import BaseHandler, CONNECTION_PARAMS
 from flask_recon import Listener, download_templates, add_routes
+from migrations import MigrationRunner
 
 if __name__ == '__main__':
-    if not 3 <= len(argv) <= 7:
+    if not 3 <= len(argv) <= 13:
         print("Usage: python main.py <port> <host> [Optional[api]] [Optional[webapp]] [Optional[halt]] [Optional[ssl]] "
-              "[Optional[gen_admin_key]]")
+              "[Optional[gen_admin_key]] [Optional[queue]] [Optional[rebuild_stats]] [Optional[gevent]] "
+              "[Optional[analysis]] [Optional[migrate]] [Optional[rate_limit]]")
         exit(1)
     port = argv[1]
     if "webapp" in argv and not isdir("flask_recon/templates"):
@@ -24,28 +41,45 @@ if __name__ == '__main__':
         print("Port must be an integer.")
         exit(1)
 
+    if "migrate" in argv:
+        # applied before connecting the listener, which reads the honeypot table on connect
+        for version, name in MigrationRunner(BaseHandler(**CONNECTION_PARAMS), "flask_recon").run():
+            print(f"Applied flask_recon migration {version:04d}_{name}.")
+
     listener = Listener(
         flask=Flask(__name__, template_folder="templates"),
         halt_scanner_threads="halt" in argv,
         max_halt_messages=100_000,
         port=port
     )
-    listener.connect_database(
-        dbname="flask_recon",
-        user="postgres",
-        password="postgres",
-        host="localhost",
-        port="5432"
-    )
+    listener.connect_database(**CONNECTION_PARAMS)
+    if "queue" in argv:
+        listener.start_ingestion_queue()
+    if "analysis" in argv:
+        listener.start_analysis_pipeline()
+    if "rate_limit" in argv:
+        listener.start_flood_aggregation()
     add_routes(
         listener=listener,
         run_api="api" in argv,
         run_webapp="webapp" in argv
     )
+    if "rebuild_stats" in argv:
+        listener.database_handler.rebuild_dashboard_stats()
     if "gen_admin_key" in argv:
         print("Admin Registration Key: ", listener.database_handler.generate_admin_key())
 
-    if "ssl" in argv:
-        listener.run(host=argv[2], port=port, ssl_context=("cert.pem", "key.pem",))
-    else:
-        listener.run(host=argv[2], port=port)
+    try:
+        if "gevent" in argv:
+            # greenlet per connection, so the tarpit can hold many scanners without a thread each
+            from gevent.pywsgi import WSGIServer
+
+            ssl_args = {"keyfile": "key.pem", "certfile": "cert.pem"} if "ssl" in argv else {}
+            WSGIServer((argv[2], port), listener, **ssl_args).serve_forever()
+        elif "ssl" in argv:
+            listener.run(host=argv[2], port=port, ssl_context=("cert.pem", "key.pem",))
+        else:
+            listener.run(host=argv[2], port=port)
+    finally:
+        # background writers still hold counts and queued rows that would otherwise be lost
+        listener.shutdown()
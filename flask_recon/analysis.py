@@ -0,0 +1,232 @@
+from datetime import datetime, timedelta
+from json import dumps
+from queue import Queue, Empty, Full
+from sys import argv
+from threading import Thread, Lock, Event
+from typing import List, Dict, Any, Optional
+
+from psycopg2 import OperationalError, InterfaceError
+
+from database_util import CONNECTION_PARAMS
+from flask_recon.cache import LRUCache
+from flask_recon.database import DatabaseHandler
+from flask_recon.structures import IncomingRequest
+from flask_recon.util import RequestAnalyser, COMPLETIONS_URL
+
+
+class AnalysisCache:
+    # in-memory LRU in front of the persistent analysis_cache table, both keyed by the request fingerprint
+    _memory: LRUCache[str, str]
+    _max_age: timedelta
+    _max_entries: int
+    _counter_lock: Lock
+    _memory_hits: int
+    _database_hits: int
+    _misses: int
+
+    def __init__(self, max_age: timedelta = timedelta(days=30), max_entries: int = 100_000,
+                 memory_size: int = 5_000):
+        self._memory = LRUCache(max_size=memory_size, ttl=max_age.total_seconds())
+        self._max_age = max_age
+        self._max_entries = max_entries
+        self._counter_lock = Lock()
+        self._memory_hits, self._database_hits, self._misses = 0, 0, 0
+
+    def get(self, database_handler: DatabaseHandler, fingerprint: str) -> Optional[str]:
+        if (analysis := self._memory.get(fingerprint)) is not None:
+            self._increment("_memory_hits")
+            return analysis
+
+        if (analysis := database_handler.get_cached_analysis(fingerprint, self._max_age)) is not None:
+            self._memory.put(fingerprint, analysis)
+            self._increment("_database_hits")
+            return analysis
+
+        self._increment("_misses")
+        return None
+
+    def put(self, database_handler: DatabaseHandler, fingerprint: str, analysis: str) -> None:
+        database_handler.insert_cached_analysis(fingerprint, analysis)
+        self._memory.put(fingerprint, analysis)
+
+    def analyse(self, database_handler: DatabaseHandler, analyser: RequestAnalyser, req: IncomingRequest) -> str:
+        fingerprint = analyser.fingerprint(req)
+        if (analysis := self.get(database_handler, fingerprint)) is not None:
+            return analysis
+
+        analysis = dumps(analyser.analyse_request(req))
+        self.put(database_handler, fingerprint, analysis)
+        return analysis
+
+    def purge(self, database_handler: DatabaseHandler) -> int:
+        return database_handler.purge_analysis_cache(self._max_age, self._max_entries)
+
+    def _increment(self, counter: str) -> None:
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._counter_lock:
+            lookups = self._memory_hits + self._database_hits + self._misses
+            return {
+                "memory_hits": self._memory_hits,
+                "database_hits": self._database_hits,
+                "misses": self._misses,
+                "hit_rate": (self._memory_hits + self._database_hits) / lookups if lookups else 0.0,
+            }
+
+
+class AnalysisPipeline:
+    _analyser: RequestAnalyser
+    _cache: AnalysisCache
+    _connection_params: Dict[str, Any]
+    _queue: "Queue[int]"
+    _workers: List[Thread]
+    _concurrency: int
+    _max_retries: int
+    _retry_interval: float
+    _stop_event: Event
+    _counter_lock: Lock
+    _queued: int
+    _completed: int
+    _skipped: int
+    _failed: int
+
+    def __init__(self, analyser: RequestAnalyser, cache: AnalysisCache, connection_params: Dict[str, Any],
+                 concurrency: int = 4, max_queued: int = 10_000, max_retries: int = 5, retry_interval: float = 1.0):
+        if concurrency < 1 or max_queued < 1:
+            raise ValueError("concurrency and max_queued must be positive.")
+
+        self._analyser = analyser
+        self._cache = cache
+        self._connection_params = connection_params
+        self._queue = Queue(maxsize=max_queued)
+        self._workers = []
+        self._concurrency = concurrency
+        self._max_retries = max_retries
+        self._retry_interval = retry_interval
+        self._stop_event = Event()
+        self._counter_lock = Lock()
+        self._queued, self._completed, self._skipped, self._failed = 0, 0, 0, 0
+
+    def start(self) -> None:
+        for i in range(self._concurrency):
+            worker = Thread(target=self._run_worker, name=f"flask-recon-analysis-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def submit(self, request_id: int) -> bool:
+        try:
+            self._queue.put_nowait(request_id)
+        except Full:
+            return False
+
+        self._increment("_queued")
+        return True
+
+    def join(self) -> None:
+        self._queue.join()
+
+    def analyse(self, database_handler: DatabaseHandler, request_id: int) -> Optional[str]:
+        if (analysis := database_handler.get_request_analysis(request_id)) is not None:
+            self._increment("_skipped")
+            return analysis
+
+        if (req := database_handler.get_request(request_id)) is None:
+            return None
+
+        analysis = self._cache.analyse(database_handler, self._analyser, req)
+        database_handler.insert_request_analysis(request_id, analysis)
+        self._increment("_completed")
+        return analysis
+
+    def _run_worker(self) -> None:
+        database_handler = None
+        while not self._stop_event.is_set():
+            try:
+                request_id = self._queue.get(timeout=0.5)
+            except Empty:
+                continue
+            try:
+                database_handler = self._process(database_handler, request_id)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, database_handler: Optional[DatabaseHandler], request_id: int) -> Optional[DatabaseHandler]:
+        for attempt in range(self._max_retries + 1):
+            try:
+                if database_handler is None:
+                    database_handler = DatabaseHandler(**self._connection_params)
+                self.analyse(database_handler, request_id)
+                return database_handler
+            except (OperationalError, InterfaceError):
+                # same as the ingestion workers: a lost connection is rebuilt and the job retried on the new one
+                if database_handler is not None:
+                    database_handler.disconnect()
+                database_handler = None
+                if self._stop_event.wait(self._retry_interval * 2 ** attempt):
+                    break
+            except Exception:
+                # the reads in analyse run outside commit_on_success, so a failed one would leave the transaction
+                # aborted for every later job
+                if database_handler is not None:
+                    database_handler.reset()
+                break
+        self._increment("_failed")
+        return database_handler
+
+    def _increment(self, counter: str, amount: int = 1) -> None:
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._counter_lock:
+            return {
+                "depth": self._queue.qsize(),
+                "queued": self._queued,
+                "completed": self._completed,
+                "skipped": self._skipped,
+                "failed": self._failed,
+            }
+
+
+if __name__ == '__main__':
+    if not 1 <= len(argv) <= 5:
+        print("Usage: python -m flask_recon.analysis [Optional[limit]] [Optional[min_threat_level]] "
+              "[Optional[concurrency]] [Optional[completions_url]]")
+        exit(1)
+
+    try:
+        limit = int(argv[1]) if len(argv) > 1 else 500
+        min_threat_level = int(argv[2]) if len(argv) > 2 else 7
+        concurrency = int(argv[3]) if len(argv) > 3 else 4
+    except ValueError:
+        print("Limit, minimum threat level and concurrency must be integers.")
+        exit(1)
+
+    analysis_cache = AnalysisCache()
+    pipeline = AnalysisPipeline(
+        analyser=RequestAnalyser(open("token", "r").read(), completions_url=argv[4] if len(argv) > 4 else COMPLETIONS_URL,
+                                 pool_size=concurrency),
+        cache=analysis_cache,
+        connection_params=CONNECTION_PARAMS,
+        concurrency=concurrency
+    )
+    database_handler = DatabaseHandler(**CONNECTION_PARAMS)
+    analysis_cache.purge(database_handler)
+    request_ids = database_handler.get_unanalysed_request_ids(
+        since=datetime.now() - timedelta(days=1), min_threat_level=min_threat_level, limit=limit)
+    pipeline.start()
+    for request_id in request_ids:
+        pipeline.submit(request_id)
+    pipeline.join()
+    pipeline.stop()
+    print(pipeline.stats, analysis_cache.stats)
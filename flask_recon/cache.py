@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Generic, TypeVar, Optional, Dict, Tuple, Hashable
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    _max_size: int
+    _ttl: Optional[float]
+    _entries: "OrderedDict[K, Tuple[V, Optional[float]]]"
+    _lock: Lock
+    _hits: int
+    _misses: int
+    _evictions: int
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        if max_size < 1:
+            raise ValueError("max_size must be positive.")
+
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._hits, self._misses, self._evictions = 0, 0, 0
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= monotonic():
+                del self._entries[key]
+                self._misses += 1
+                self._evictions += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        ttl = self._ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (value, None if ttl is None else monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
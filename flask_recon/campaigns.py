@@ -0,0 +1,50 @@
+from sys import argv
+from typing import Dict, Any
+
+from database_util import CONNECTION_PARAMS
+from flask_recon.database import DatabaseHandler
+from flask_recon.fingerprints import RequestFingerprint
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+class FingerprintBackfill:
+    _reader: DatabaseHandler
+    _writer: DatabaseHandler
+    _batch_size: int
+
+    def __init__(self, connection_params: Dict[str, Any], batch_size: int = BACKFILL_BATCH_SIZE):
+        self._reader = DatabaseHandler(**connection_params)
+        self._writer = DatabaseHandler(**connection_params)
+        self._batch_size = batch_size
+
+    def run(self) -> int:
+        # only rows without a fingerprint are read, so an interrupted backfill resumes where it stopped
+        total = 0
+        for rows in self._reader.stream_requests(self._batch_size, unfingerprinted=True):
+            self._writer.assign_fingerprints([
+                (row[10], RequestFingerprint.of(DatabaseHandler.request_from_row(row)), row[0], row[1])
+                for row in rows
+            ])
+            # the counts are only queued when the batch commits, so they are written straight after
+            self._writer.flush_campaigns()
+            total += len(rows)
+            print(f"Fingerprinted {total} requests.")
+        return total
+
+
+if __name__ == '__main__':
+    if not 1 <= len(argv) <= 2:
+        print("Usage: python -m flask_recon.campaigns [Optional[batch_size]]")
+        exit(1)
+
+    try:
+        batch_size = int(argv[1]) if len(argv) > 1 else BACKFILL_BATCH_SIZE
+    except ValueError:
+        print("Batch size must be an integer.")
+        exit(1)
+
+    FingerprintBackfill(
+        connection_params=CONNECTION_PARAMS,
+        batch_size=batch_size
+    ).run()
@@ -1,21 +1,60 @@
-from datetime import datetime
-from hashlib import sha256
+from datetime import datetime, timedelta
 from json import dumps, loads
-from typing import Optional, List, Tuple, Dict, Union, Any
+from time import monotonic, sleep
+from typing import Optional, List, Tuple, Dict, Union, Any, Iterator
 from uuid import uuid4
 
+from psycopg2.extras import execute_values
+
 from database_util import BaseHandler, commit_on_success
-from flask_recon.structures import IncomingRequest, RemoteHost, RequestMethod
+from flask_recon.cache import LRUCache
+from flask_recon.fingerprints import RequestFingerprint
+from flask_recon.search import SearchPlanner
+from flask_recon.summaries import SummaryCounters, SummarySnapshot, CampaignCounters, CampaignSnapshot
+from flask_recon.flags import RequestType, AttackType
+from flask_recon.structures import IncomingRequest, RemoteHost, PageCursor
+
+ACTOR_CACHE_SIZE = 10_000
+HEADER_CACHE_SIZE = 50_000
+HOST_SORT_COLUMNS = {
+    "host": "host",
+    "valid": "valid",
+    "invalid": "invalid",
+    "total": "total",
+    "threat_level": "threat_level",
+}
+DEFAULT_PAGE_SIZE = 100
+SESSION_LIFETIME = timedelta(days=7)
+HONEYPOT_CHANNEL = "honeypots_changed"
+HONEYPOT_MATCH_TYPES = ("file", "prefix", "glob")
+# body is jsonb and headers are decoded from the header dictionary, both read back as JSON text so every consumer
+# decodes them the same way
+REQUEST_COLUMNS = ('"requests"."actor_id", "requests"."timestamp", "requests"."method", "requests"."body"::TEXT, '
+                   'request_headers("requests"."header_ids"), "requests"."query_string", "requests"."port", '
+                   '"requests"."threat_level", "requests"."path", "actors"."host", "requests"."request_id", '
+                   '"requests"."request_types", "requests"."attack_types", "requests"."matched_flags", '
+                   '"requests"."flags_version", "requests"."acceptable"')
+INSERT_COLUMNS = ("actor_id, timestamp, method, path, body, header_ids, query_string, port, acceptable, threat_level, "
+                  "request_types, attack_types, matched_flags, flags_version, fingerprint")
+ENDPOINT_HOST_SORT_COLUMNS = {
+    "host": "host",
+    "threat_level": "threat_level",
+    "requests": "requests",
+}
+CAMPAIGN_SORT_COLUMNS = {
+    "actors": "actor_count",
+    "requests": "request_count",
+    "first_seen": "first_seen",
+    "last_seen": "last_seen",
+}
 
 
 class DatabaseHandler(BaseHandler):
-    def actor_exists(self, remote_host: RemoteHost) -> bool:
-        self.execute("SELECT EXISTS(SELECT actor_id FROM actors WHERE host = %s)", (remote_host.address,))
-        return self.fetchone()[0]
-
-    @commit_on_success
-    def insert_actor(self, remote_host: RemoteHost, flagged: bool = False) -> None:
-        self.execute("INSERT INTO actors (host, flagged) VALUES (%s, %s)", (remote_host.address, flagged,))
+    # shared by every handler in the process so pooled connections and ingestion workers all benefit
+    _actor_cache: LRUCache[str, int] = LRUCache(max_size=ACTOR_CACHE_SIZE)
+    _header_cache: LRUCache[Tuple[str, str], int] = LRUCache(max_size=HEADER_CACHE_SIZE)
+    _summaries: SummaryCounters = SummaryCounters()
+    _campaigns: CampaignCounters = CampaignCounters()
 
     def get_actor_average_threat_level(self, actor_id: int) -> int:
         self.execute("SELECT threat_level FROM requests WHERE actor_id = %s", (actor_id,))
@@ -26,12 +65,89 @@ class DatabaseHandler(BaseHandler):
         return sum(levels) // len(levels) if levels else 0
 
     def get_actor_id(self, remote_host: RemoteHost) -> int:
+        if (actor_id := self._actor_cache.get(remote_host.address)) is not None:
+            return actor_id
+
         self.execute("SELECT actor_id FROM actors WHERE host = %s", (remote_host.address,))
         result = self.fetchone()
         if not result:
             return -1
+        self._actor_cache.put(remote_host.address, result[0])
         return result[0]
 
+    def resolve_actor_id(self, remote_host: RemoteHost) -> int:
+        actor_ids, _ = self.resolve_actor_ids([remote_host.address])
+        return actor_ids[remote_host.address]
+
+    def resolve_actor_ids(self, hosts: List[str]) -> Tuple[Dict[str, int], int]:
+        actor_ids, missing = {}, []
+        for host in hosts:
+            if (actor_id := self._actor_cache.get(host)) is not None:
+                actor_ids[host] = actor_id
+            else:
+                missing.append((host,))
+
+        new_actors = 0
+        if missing:
+            # sorted so concurrent batches lock conflicting actor rows in the same order
+            missing.sort()
+            # the no-op update makes RETURNING yield the existing row's id on conflict, and xmax = 0 marks new rows
+            inserted = execute_values(self, "INSERT INTO actors (host) VALUES %s "
+                                            "ON CONFLICT (host) DO UPDATE SET host = EXCLUDED.host "
+                                            "RETURNING host, actor_id, xmax = 0", missing, fetch=True)
+            resolved = {host: actor_id for host, actor_id, _ in inserted}
+            new_actors = sum(is_new for _, _, is_new in inserted)
+            actor_ids.update(resolved)
+            # like header ids, only shared with other connections once the rows they point at are committed
+            self.after_commit(lambda: self.cache_actor_ids(resolved))
+        return actor_ids, new_actors
+
+    def cache_actor_ids(self, actor_ids: Dict[str, int]) -> None:
+        for host, actor_id in actor_ids.items():
+            self._actor_cache.put(host, actor_id)
+
+    @property
+    def actor_cache_stats(self) -> Dict[str, int]:
+        return self._actor_cache.stats
+
+    def resolve_header_ids(self, headers: List[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        header_ids, missing = {}, set()
+        for header in headers:
+            if (header_id := self._header_cache.get(header)) is not None:
+                header_ids[header] = header_id
+            else:
+                missing.add(header)
+
+        if missing:
+            # same no-op update as resolve_actor_ids, so existing pairs come back with their ids
+            inserted = execute_values(self, """
+                INSERT INTO "header_values" ("name", "value") VALUES %s
+                ON CONFLICT (md5("name"), md5("value")) DO UPDATE SET "name" = EXCLUDED."name"
+                RETURNING "name", "value", "header_id"
+            """, sorted(missing), fetch=True)
+            resolved = {(name, value): header_id for name, value, header_id in inserted}
+            header_ids.update(resolved)
+            # shared with every other connection, so an id only becomes visible to them once its row is committed;
+            # there is no foreign key to reject an id whose row was rolled back
+            self.after_commit(lambda: self.cache_header_ids(resolved))
+        return header_ids
+
+    def cache_header_ids(self, header_ids: Dict[Tuple[str, str], int]) -> None:
+        for header, header_id in header_ids.items():
+            self._header_cache.put(header, header_id)
+
+    @property
+    def header_cache_stats(self) -> Dict[str, int]:
+        return self._header_cache.stats
+
+    @staticmethod
+    def header_pairs(request: IncomingRequest) -> Optional[List[Tuple[str, str]]]:
+        if request.headers is None:
+            return None
+        # text columns reject NUL just like jsonb did
+        return [(str(name).replace("\x00", "\ufffd"), str(value).replace("\x00", "\ufffd"))
+                for name, value in request.headers.items()]
+
     def address_is_authorised(self, remote_host: RemoteHost) -> bool:
         self.execute("SELECT address FROM authorized_addresses WHERE host = %s", (remote_host.address,))
         return True if self.fetchone() else False
@@ -46,161 +162,541 @@ class DatabaseHandler(BaseHandler):
         self.execute("UPDATE actors SET threat_level = %s WHERE actor_id = %s", (threat_level, actor_id))
 
     @commit_on_success
-    def insert_request(self, request: IncomingRequest) -> None:
-        if not self.actor_exists(request.host):
-            self.insert_actor(request.host)
-
-        request.determine_threat_level()
-        actor_id = self.get_actor_id(request.host)
-        self.execute("SELECT NOW()")
-        timestamp = self.fetchone()[0]
+    def insert_request(self, request: IncomingRequest, timestamp: datetime) -> None:
+        # the listener classifies up front for its metrics, so only unclassified requests are scored here
+        if request.flags_version is None:
+            request.determine_threat_level()
+        fingerprint = RequestFingerprint.of(request)
+        headers = self.header_pairs(request)
+        actor_ids, new_actors = self.resolve_actor_ids([request.host.address])
+        actor_id = actor_ids[request.host.address]
+        header_ids = self.resolve_header_ids(headers or [])
         # using a parameterized query automatically escapes the input and prevents SQL injection
         self.execute(
-            "INSERT INTO requests (actor_id, timestamp, method, path, body, headers, query_string, port, acceptable, threat_level) "
-            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-            (actor_id, timestamp, request.method.value, request.uri, dumps(request.body),
-             dumps(request.headers), request.query_string, request.local_port, request.is_acceptable,
-             request.threat_level))
+            f"INSERT INTO requests ({INSERT_COLUMNS}) "
+            "VALUES (%s, %s, %s, %s, %s, %s::INTEGER[], %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+            "RETURNING request_id, path, timestamp",
+            (actor_id, timestamp, *self.request_values(request, fingerprint.digest, headers, header_ids)))
+        inserted = self.fetchone()
+        self.record_ingest([inserted], new_actors)
+        self.record_fingerprints([(fingerprint, actor_id, inserted[2])])
+
+    @commit_on_success
+    def insert_requests(self, requests: List[Tuple[IncomingRequest, datetime]]) -> None:
+        hosts = list({request.host.address for request, _ in requests})
+        headers = [self.header_pairs(request) for request, _ in requests]
+        unique_headers = list({header for pairs in headers for header in pairs or []})
+        actor_ids, new_actors = self.resolve_actor_ids(hosts)
+        header_ids = self.resolve_header_ids(unique_headers)
+        rows, fingerprints = [], []
+        for (request, timestamp), pairs in zip(requests, headers):
+            if request.flags_version is None:
+                request.determine_threat_level()
+            fingerprint = RequestFingerprint.of(request)
+            actor_id = actor_ids[request.host.address]
+            method, *values = self.request_values(request, fingerprint.digest, pairs, header_ids)
+            rows.append((actor_id, timestamp, method, *values))
+            fingerprints.append((fingerprint, actor_id, timestamp))
+        inserted = execute_values(self, f"INSERT INTO requests ({INSERT_COLUMNS}) VALUES %s "
+                                        "RETURNING request_id, path, timestamp", rows, page_size=len(rows),
+                                  template="(%s, %s, %s, %s, %s, %s::INTEGER[], %s, %s, %s, %s, %s, %s, %s, "
+                                           "%s, %s)",
+                                  fetch=True)
+        self.record_ingest(inserted, new_actors)
+        self.record_fingerprints(fingerprints)
+
+    def record_ingest(self, inserted: List[Tuple[int, str, datetime]], new_actors: int) -> None:
+        # counted once the insert commits and written by flush_summaries, never inline on the hot path
+        entries = [(request_id, path, timestamp, 1) for request_id, path, timestamp in inserted]
+        self.after_commit(lambda: self._summaries.add(entries, new_actors))
+
+    def flush_summaries(self) -> int:
+        if (snapshot := self._summaries.drain()) is None:
+            return 0
+        try:
+            self.write_summaries(snapshot)
+        except Exception as e:
+            self._summaries.restore(snapshot)
+            raise e
+        return snapshot[0]
+
+    @commit_on_success
+    def write_summaries(self, snapshot: SummarySnapshot) -> None:
+        requests, new_actors, endpoints, first_request_time, last_request_time = snapshot
+        new_endpoints = []
+        if endpoints:
+            # GREATEST ignores NULL, so hits without a stored row never move last_request_id
+            new_endpoints = execute_values(self, """
+                INSERT INTO "endpoint_counts" ("path", "hits", "last_request_id") VALUES %s
+                ON CONFLICT ("path") DO UPDATE SET
+                    "hits" = "endpoint_counts"."hits" + EXCLUDED."hits",
+                    "last_request_id" = GREATEST("endpoint_counts"."last_request_id", EXCLUDED."last_request_id")
+                RETURNING xmax = 0
+            """, sorted((path, hits, last_request_id) for path, (hits, last_request_id) in endpoints.items()),
+                                           fetch=True)
+
+        self.execute("""
+            UPDATE "dashboard_stats" SET
+                "request_count" = "request_count" + %s,
+                "actor_count" = "actor_count" + %s,
+                "endpoint_count" = "endpoint_count" + %s,
+                "first_request_time" = LEAST("first_request_time", %s),
+                "last_request_time" = GREATEST("last_request_time", %s)
+            WHERE "stats_id" = 1
+        """, (requests, new_actors, sum(is_new for is_new, in new_endpoints), first_request_time, last_request_time))
+
+    @classmethod
+    def pending_summaries(cls) -> int:
+        return cls._summaries.pending
+
+    @classmethod
+    def pending_campaigns(cls) -> int:
+        return cls._campaigns.pending
+
+    @commit_on_success
+    def insert_request_aggregates(self, aggregates: List[Tuple[str, str, str, datetime, int]]) -> None:
+        actor_ids, new_actors = self.resolve_actor_ids(list({host for host, _, _, _, _ in aggregates}))
+        counts: Dict[Tuple[int, str, str, datetime], int] = {}
+        for host, path, method, minute, hits in aggregates:
+            key = (actor_ids[host], path, method, minute)
+            counts[key] = counts.get(key, 0) + hits
+
+        # sorted so concurrent flushes lock conflicting aggregate rows in the same order
+        execute_values(self, """
+            INSERT INTO "request_aggregates" ("actor_id", "path", "method", "minute", "hits") VALUES %s
+            ON CONFLICT ("actor_id", "path", "method", "minute") DO UPDATE SET
+                "hits" = "request_aggregates"."hits" + EXCLUDED."hits"
+        """, sorted((*key, hits) for key, hits in counts.items()))
+
+        # counted like stored rows, through the summary flush, so a path whose sampled row is still queued keeps
+        # its hits
+        entries = [(None, path, minute, hits) for (_, path, _, minute), hits in counts.items()]
+        self.after_commit(lambda: self._summaries.add(entries, new_actors))
+
+    def record_fingerprints(self, entries: List[Tuple[RequestFingerprint, int, datetime]]) -> None:
+        # like record_ingest, counted after commit and written by flush_campaigns so fingerprint rows stay off the
+        # insert transaction
+        self.after_commit(lambda: self._campaigns.add(entries))
+
+    def flush_campaigns(self) -> int:
+        if (snapshot := self._campaigns.drain()) is None:
+            return 0
+        try:
+            self.write_campaigns(snapshot)
+        except Exception as e:
+            self._campaigns.restore(snapshot)
+            raise e
+        return len(snapshot[0])
+
+    @commit_on_success
+    def write_campaigns(self, snapshot: CampaignSnapshot) -> None:
+        campaigns, actors = snapshot
+        # sorted so concurrent flushes lock conflicting fingerprint rows in the same order
+        execute_values(self, """
+            INSERT INTO "fingerprints" ("fingerprint", "method", "path_template", "query_keys", "header_names",
+                                        "ua_family", "request_count", "first_seen", "last_seen") VALUES %s
+            ON CONFLICT ("fingerprint") DO UPDATE SET
+                "request_count" = "fingerprints"."request_count" + EXCLUDED."request_count",
+                "first_seen" = LEAST("fingerprints"."first_seen", EXCLUDED."first_seen"),
+                "last_seen" = GREATEST("fingerprints"."last_seen", EXCLUDED."last_seen")
+        """, [(digest, *fingerprint.components, hits, first_seen, last_seen)
+              for digest, (fingerprint, hits, first_seen, last_seen) in sorted(campaigns.items())],
+                       template="(%s, %s, %s, %s::TEXT[], %s::TEXT[], %s, %s, %s, %s)")
+
+        # only pairs not seen before come back, so actor_count stays a distinct count without scanning requests
+        new_actors = execute_values(self, """
+            INSERT INTO "fingerprint_actors" ("fingerprint", "actor_id") VALUES %s
+            ON CONFLICT DO NOTHING
+            RETURNING "fingerprint"
+        """, sorted(actors), fetch=True)
+        if not new_actors:
+            return
+
+        actor_counts: Dict[str, int] = {}
+        for digest, in new_actors:
+            actor_counts[digest] = actor_counts.get(digest, 0) + 1
+        execute_values(self, """
+            UPDATE "fingerprints" SET "actor_count" = "fingerprints"."actor_count" + "v"."actors"
+            FROM (VALUES %s) AS "v" ("fingerprint", "actors")
+            WHERE "fingerprints"."fingerprint" = "v"."fingerprint"
+        """, sorted(actor_counts.items()))
+
+    @commit_on_success
+    def assign_fingerprints(self, entries: List[Tuple[int, RequestFingerprint, int, datetime]]) -> None:
+        updated = execute_values(self, """
+            UPDATE "requests" SET "fingerprint" = "v"."fingerprint"
+            FROM (VALUES %s) AS "v" ("request_id", "fingerprint")
+            WHERE "requests"."request_id" = "v"."request_id" AND "requests"."fingerprint" IS NULL
+            RETURNING "requests"."request_id"
+        """, [(request_id, fingerprint.digest) for request_id, fingerprint, _, _ in entries], fetch=True)
+        # rows fingerprinted concurrently since they were read are left out of the campaign totals
+        updated = {request_id for request_id, in updated}
+        self.record_fingerprints([(fingerprint, actor_id, timestamp)
+                                  for request_id, fingerprint, actor_id, timestamp in entries
+                                  if request_id in updated])
+
+    @staticmethod
+    def request_values(request: IncomingRequest, fingerprint: str, headers: Optional[List[Tuple[str, str]]],
+                       header_ids: Dict[Tuple[str, str], int]) -> Tuple[Any, ...]:
+        return (request.method.value, request.uri, DatabaseHandler.dumps_jsonb(request.body),
+                [header_ids[header] for header in headers] if headers is not None else None, request.query_string,
+                request.local_port, request.is_acceptable, request.threat_level,
+                [t.value for t in request.request_types], [t.value for t in request.attack_types],
+                request.matched_flags, request.flags_version, fingerprint)
+
+    @staticmethod
+    def dumps_jsonb(value: Any) -> str:
+        # jsonb rejects the NUL escape that scanner payloads regularly contain, so it becomes the replacement character
+        return dumps(value).replace("\\u0000", "\\ufffd")
 
     def get_request(self, request_id: int) -> Optional[IncomingRequest]:
-        self.execute("SELECT * FROM requests WHERE request_id = %s", (request_id,))
+        self.execute(f'SELECT {REQUEST_COLUMNS} FROM "requests" '
+                     'JOIN "actors" ON "actors"."actor_id" = "requests"."actor_id" '
+                     'WHERE "requests"."request_id" = %s', (request_id,))
         row = self.fetchone()
         if row is None:
             return
+        return self.request_from_row(row)
+
+    def stream_requests(self, batch_size: int = 5000, after_request_id: int = 0,
+                        stale_version: Optional[str] = None, unfingerprinted: bool = False,
+                        until_request_id: Optional[int] = None) -> Iterator[List[Tuple[Any, ...]]]:
+        query = (f'SELECT {REQUEST_COLUMNS} FROM "requests" '
+                 'JOIN "actors" ON "actors"."actor_id" = "requests"."actor_id" '
+                 'WHERE "requests"."request_id" > %s')
+        variables = [after_request_id]
+        if until_request_id is not None:
+            query += ' AND "requests"."request_id" <= %s'
+            variables.append(until_request_id)
+        if stale_version is not None:
+            query += ' AND "requests"."flags_version" IS DISTINCT FROM %s'
+            variables.append(stale_version)
+        if unfingerprinted:
+            query += ' AND "requests"."fingerprint" IS NULL'
+        query += ' ORDER BY "requests"."request_id"'
+
+        with self.server_side_cursor("stream_requests", itersize=batch_size) as named_cursor:
+            named_cursor.execute(query, variables)
+            while rows := named_cursor.fetchmany(batch_size):
+                yield rows
+
+    def get_actor_ids_until(self, request_id: int) -> List[int]:
+        self.execute('SELECT DISTINCT "actor_id" FROM "requests" WHERE "request_id" <= %s', (request_id,))
+        return [row[0] for row in self.fetchall()]
+
+    def get_settled_request_id(self, timeout: float = 30.0, poll_interval: float = 0.1) -> Optional[int]:
+        # ids are drawn before their transaction commits, so concurrent writers can make a lower id visible after a
+        # higher one; once every transaction running after the max id was read has ended, nothing below it can appear
+        self.execute('SELECT COALESCE(MAX("request_id"), 0) FROM "requests"')
+        watermark = self.fetchone()[0]
+        self._conn.rollback()
+        # a writer takes its transaction id just after drawing the request id, so it is given a moment to do so
+        sleep(poll_interval)
+        self.execute("SELECT txid_snapshot_xmax(txid_current_snapshot())")
+        xmax = self.fetchone()[0]
+        self._conn.rollback()
+
+        deadline = monotonic() + timeout
+        while True:
+            self.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            xmin = self.fetchone()[0]
+            self._conn.rollback()
+            if xmin >= xmax:
+                return watermark
+            if monotonic() >= deadline:
+                return None
+            sleep(poll_interval)
+
+    def export_requests(self, batch_size: int = 5000, actor_id: Optional[int] = None,
+                        start: Optional[datetime] = None, end: Optional[datetime] = None,
+                        endpoint: Optional[str] = None,
+                        min_threat_level: Optional[int] = None) -> Iterator[List[IncomingRequest]]:
+        conditions, variables = [], []
+        if actor_id is not None:
+            conditions.append('"requests"."actor_id" = %s')
+            variables.append(actor_id)
+        if start is not None:
+            conditions.append('"requests"."timestamp" >= %s')
+            variables.append(start)
+        if end is not None:
+            conditions.append('"requests"."timestamp" < %s')
+            variables.append(end)
+        if endpoint is not None:
+            conditions.append('"requests"."path" = %s')
+            variables.append(endpoint)
+        if min_threat_level is not None:
+            conditions.append('"requests"."threat_level" >= %s')
+            variables.append(min_threat_level)
+
+        query = f'SELECT {REQUEST_COLUMNS} FROM "requests" JOIN "actors" ON "actors"."actor_id" = "requests"."actor_id"'
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += ' ORDER BY "requests"."timestamp" DESC, "requests"."request_id" DESC'
+
+        with self.server_side_cursor("export_requests", itersize=batch_size) as named_cursor:
+            named_cursor.execute(query, variables)
+            while rows := named_cursor.fetchmany(batch_size):
+                yield [self.request_from_row(row) for row in rows]
 
-        self.execute("SELECT host FROM actors WHERE actor_id = %s", (row[1],))
+    @commit_on_success
+    def update_request_classifications(self, classifications: List[Tuple[Any, ...]]) -> None:
+        execute_values(self, """
+            UPDATE "requests" SET
+                "threat_level" = "v"."threat_level",
+                "request_types" = "v"."request_types",
+                "attack_types" = "v"."attack_types",
+                "matched_flags" = "v"."matched_flags",
+                "flags_version" = "v"."flags_version"
+            FROM (VALUES %s) AS "v" ("request_id", "threat_level", "request_types", "attack_types", "matched_flags",
+                                     "flags_version")
+            WHERE "requests"."request_id" = "v"."request_id"
+        """, classifications, template="(%s, %s, %s::TEXT[], %s::TEXT[], %s::TEXT[], %s)",
+                       page_size=len(classifications))
+
+    @commit_on_success
+    def update_actor_threat_levels(self, actor_ids: List[int]) -> None:
+        self.execute("""
+            UPDATE "actors" SET "threat_level" = "averages"."threat_level"
+            FROM (
+                SELECT "actor_id", FLOOR(AVG("threat_level"))::INTEGER AS "threat_level"
+                FROM "requests"
+                WHERE "actor_id" = ANY(%s)
+                GROUP BY "actor_id"
+            ) AS "averages"
+            WHERE "actors"."actor_id" = "averages"."actor_id"
+        """, (actor_ids,))
+
+    def get_request_analysis(self, request_id: int) -> Optional[str]:
+        self.execute("SELECT analysis FROM analysed_requests WHERE request_id = %s", (request_id,))
         result = self.fetchone()
-        if not result:
-            return IncomingRequest(row[8]).from_components(
-                host="Unknown",
-                timestamp=row[0],
-                request_method=RequestMethod.GET,
-                request_body={},
-                request_headers={},
-                query_string="",
-                request_uri="",
-                request_id=-1,
-                threat_level=0,
+        return result[0] if result else None
+
+    @commit_on_success
+    def insert_request_analysis(self, request_id: int, analysis: str) -> None:
+        self.execute("INSERT INTO analysed_requests (request_id, analysis) VALUES (%s, %s) "
+                     "ON CONFLICT (request_id) DO UPDATE SET analysis = EXCLUDED.analysis, created_at = NOW()",
+                     (request_id, analysis))
+
+    def get_unanalysed_request_ids(self, since: datetime, min_threat_level: int = 0,
+                                   limit: Optional[int] = None) -> List[int]:
+        self.execute("""
+            SELECT "requests"."request_id"
+            FROM "requests"
+            LEFT JOIN "analysed_requests" ON "analysed_requests"."request_id" = "requests"."request_id"
+            WHERE "requests"."timestamp" >= %s
+              AND "requests"."threat_level" >= %s
+              AND "analysed_requests"."request_id" IS NULL
+            ORDER BY "requests"."threat_level" DESC, "requests"."request_id" DESC
+            LIMIT %s
+        """, (since, min_threat_level, limit))
+        return [row[0] for row in self.fetchall()]
+
+    @commit_on_success
+    def get_cached_analysis(self, fingerprint: str, max_age: timedelta) -> Optional[str]:
+        self.execute("""
+            UPDATE "analysis_cache" SET "last_used_at" = NOW(), "hits" = "hits" + 1
+            WHERE "fingerprint" = %s AND "created_at" > NOW() - %s
+            RETURNING "analysis"
+        """, (fingerprint, max_age))
+        result = self.fetchone()
+        return result[0] if result else None
+
+    @commit_on_success
+    def insert_cached_analysis(self, fingerprint: str, analysis: str) -> None:
+        self.execute("""
+            INSERT INTO "analysis_cache" ("fingerprint", "analysis") VALUES (%s, %s)
+            ON CONFLICT ("fingerprint") DO UPDATE SET
+                "analysis" = EXCLUDED."analysis", "created_at" = NOW(), "last_used_at" = NOW()
+        """, (fingerprint, analysis))
+
+    @commit_on_success
+    def purge_analysis_cache(self, max_age: timedelta, max_entries: int) -> int:
+        self.execute('DELETE FROM "analysis_cache" WHERE "created_at" <= NOW() - %s', (max_age,))
+        expired = self.rowcount
+        # least recently used entries beyond the cap are evicted
+        self.execute("""
+            DELETE FROM "analysis_cache" WHERE "fingerprint" IN (
+                SELECT "fingerprint" FROM "analysis_cache" ORDER BY "last_used_at" DESC OFFSET %s
             )
-        host = RemoteHost(result[0])
-        return IncomingRequest(row[6]).from_components(
-            host=host.address,
-            timestamp=row[2],
-            request_method=row[3],
-            request_body=loads(row[5]),
-            request_headers=loads(row[6]),
-            query_string=row[7],
-            request_uri=row[4],
-            request_id=row[0],
-            threat_level=row[10],
-        )
+        """, (max_entries,))
+        return expired + self.rowcount
 
-    def get_honeypot(self, file: str) -> Optional[str]:
-        self.execute("SELECT dummy_contents FROM honeypots WHERE file_name = %s", (file,))
-        return self.fetchone()[0] if self.rowcount > 0 else None
+    def get_honeypots(self) -> List[Tuple[str, str, str]]:
+        self.execute("SELECT file_name, match_type, dummy_contents FROM honeypots ORDER BY honeypot_id")
+        return self.fetchall()
 
-    def honeypot_exists(self, file: str) -> bool:
-        self.execute("SELECT EXISTS(SELECT honeypot_id FROM honeypots WHERE file_name = %s)", (file,))
+    def honeypot_exists(self, file: str, match_type: str = "file") -> bool:
+        self.execute("SELECT EXISTS(SELECT honeypot_id FROM honeypots WHERE file_name = %s AND match_type = %s)",
+                     (file, match_type))
         return self.fetchone()[0]
 
     @commit_on_success
-    def insert_honeypot(self, file: str, contents: str) -> None:
-        if self.honeypot_exists(file):
+    def insert_honeypot(self, file: str, contents: str, match_type: str = "file") -> None:
+        if match_type not in HONEYPOT_MATCH_TYPES:
+            raise ValueError(f"Unknown honeypot match type {match_type}.")
+        if self.honeypot_exists(file, match_type):
             return
 
-        self.execute("INSERT INTO honeypots (file_name, dummy_contents) VALUES (%s, %s)", (file, contents))
+        self.execute("INSERT INTO honeypots (file_name, dummy_contents, match_type) VALUES (%s, %s, %s)",
+                     (file, contents, match_type))
+        # delivered on commit to every process listening, so their honeypot caches reload
+        self.execute(f"NOTIFY {HONEYPOT_CHANNEL}")
 
     def count_endpoint(self, endpoint: str) -> int:
         self.execute("SELECT COUNT(*) FROM requests WHERE path = %s", (endpoint,))
         return self.fetchone()[0]
 
-    def count_requests(self, host: RemoteHost) -> Tuple[int, int]:
-        actor_id = self.get_actor_id(host)
-        self.execute("SELECT COUNT(*) FROM requests WHERE actor_id = %s AND acceptable = TRUE", (actor_id,))
-        valid = self.fetchone()[0]
-        self.execute("SELECT COUNT(*) FROM requests WHERE actor_id = %s AND acceptable = FALSE", (actor_id,))
-        invalid = self.fetchone()[0]
-        return valid, invalid
-
-    def get_all_endpoints(self) -> List[Tuple[str, int]]:
-        self.execute("SELECT path FROM requests")
-        r = []
-        e = set()
-        for row in self.fetchall():
-            endpoint = row[0]
-            if endpoint in e:
-                continue
-            e.add(endpoint)
-            r.append((endpoint, self.count_endpoint(endpoint)))
-        return sorted(r, key=lambda x: x[1], reverse=True)
+    def get_all_endpoints(self, limit: Optional[int] = None, offset: int = 0,
+                          min_count: int = 1) -> List[Tuple[str, int]]:
+        # rate limited requests only exist as request_aggregates counts, so they are added to the stored rows
+        self.execute("""
+            SELECT "path", SUM("hits")::BIGINT AS "hits"
+            FROM (
+                SELECT "path", COUNT(*) AS "hits" FROM "requests" GROUP BY "path"
+                UNION ALL
+                SELECT "path", SUM("hits") FROM "request_aggregates" GROUP BY "path"
+            ) AS "endpoints"
+            GROUP BY "path"
+            HAVING SUM("hits") >= %s
+            ORDER BY "hits" DESC, "path"
+            LIMIT %s OFFSET %s
+        """, (min_count, limit, offset))
+        return self.fetchall()
 
     def count_requests_from_actor(self, actor_id: str, endpoint: str) -> int:
         self.execute("SELECT COUNT(*) FROM requests WHERE actor_id = %s AND path = %s", (actor_id, endpoint))
         return self.fetchone()[0]
 
-    def get_hosts_by_endpoint(self, endpoint: str) -> List[Tuple[Dict[str, Union[str, int]], int]]:
-        self.execute("SELECT actor_id FROM requests WHERE path = %s", (endpoint,))
-        actors = self.fetchall()
-        e = set()
-        r = []
-        for row in actors:
-            self.execute("SELECT host, threat_level FROM actors WHERE actor_id = %s", (row[0],))
-            host, threat_level = self.fetchone()
-            if host in e:
-                continue
-            e.add(host)
-            r.append(
-                ({"address": host, "threat_level": threat_level}, self.count_requests_from_actor(row[0], endpoint)))
-        return sorted(r, key=lambda x: x[1], reverse=True)
-
-    def get_remote_hosts(self) -> List[Tuple[str, int, int, int, int]]:
-        self.execute("SELECT actor_id, host, threat_level FROM actors")
-        r = []
-        for row in self.fetchall():
-            host = RemoteHost(row[1])
-            threat_level = self.get_actor_average_threat_level(row[0])
-            valid, invalid = self.count_requests(host)
-            total = valid + invalid
-            r.append((host.address, valid, invalid, total, threat_level))
-        return sorted(r, key=lambda x: x[3], reverse=True)
-
-    def get_requests(self, endpoint: Optional[str] = None, host: Optional[RemoteHost] = None) -> List[IncomingRequest]:
-        if host is None and endpoint is None:
-            self.execute(
-                "SELECT actor_id, timestamp, method, body, headers, query_string, port, acceptable, path, request_id FROM requests")
-        if host is None and endpoint is not None:
-            self.execute(
-                "SELECT actor_id, timestamp, method, body, headers, query_string, port, acceptable, path, request_id FROM requests WHERE path = %s",
-                (endpoint,))
-        if host is not None and endpoint is None:
-            self.execute(
-                "SELECT actor_id, timestamp, method, body, headers, query_string, port, acceptable, path, request_id FROM requests WHERE actor_id = %s",
-                (self.get_actor_id(host),))
-        if host is not None and endpoint is not None:
-            self.execute(
-                "SELECT actor_id, timestamp, method, body, headers, query_string, port, acceptable, path, request_id FROM requests WHERE path = %s AND actor_id = %s",
-                (endpoint, self.get_actor_id(host)))
-
-        requests = self.fetchall()
-        r = []
-        for row in requests:
-            if host is None:
-                self.execute("SELECT host FROM actors WHERE actor_id = %s", (row[0],))
-                host = RemoteHost(self.fetchone()[0])
-            incoming_request = IncomingRequest(row[6]).from_components(
-                host=host.address,
-                timestamp=row[1],
-                request_method=row[2],
-                request_body=loads(row[3]),
-                request_headers=loads(row[4]),
-                query_string=row[5],
-                request_uri=row[8],
-                request_id=row[-1],
-                threat_level=row[7],
-            )
-            incoming_request.determine_threat_level()
-            r.append(incoming_request)
-        return sorted(r, key=lambda x: x.timestamp, reverse=True)
+    def get_hosts_by_endpoint(self, endpoint: str, limit: Optional[int] = None, offset: int = 0,
+                              sort_by: str = "requests",
+                              descending: bool = True) -> List[Tuple[Dict[str, Union[str, int]], int]]:
+        if sort_by not in ENDPOINT_HOST_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort hosts by {sort_by}.")
+
+        direction = "DESC" if descending else "ASC"
+        self.execute(f"""
+            SELECT "actors"."host", "actors"."threat_level", SUM("counts"."requests")::BIGINT AS "requests"
+            FROM (
+                SELECT "actor_id", COUNT(*) AS "requests" FROM "requests" WHERE "path" = %s GROUP BY "actor_id"
+                UNION ALL
+                SELECT "actor_id", SUM("hits") FROM "request_aggregates" WHERE "path" = %s GROUP BY "actor_id"
+            ) AS "counts"
+            JOIN "actors" ON "actors"."actor_id" = "counts"."actor_id"
+            GROUP BY "actors"."actor_id", "actors"."host", "actors"."threat_level"
+            ORDER BY "{ENDPOINT_HOST_SORT_COLUMNS[sort_by]}" {direction}, "actors"."host"
+            LIMIT %s OFFSET %s
+        """, (endpoint, endpoint, limit, offset))
+        return [({"address": host, "threat_level": threat_level}, count) for host, threat_level, count in
+                self.fetchall()]
+
+    def get_remote_hosts(self, limit: Optional[int] = None, offset: int = 0, sort_by: str = "total",
+                         descending: bool = True) -> List[Tuple[str, int, int, int, int]]:
+        if sort_by not in HOST_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort hosts by {sort_by}.")
+
+        direction = "DESC" if descending else "ASC"
+        self.execute(f"""
+            SELECT "actors"."host",
+                   COUNT("requests"."request_id") FILTER (WHERE "requests"."acceptable") AS "valid",
+                   COUNT("requests"."request_id") FILTER (WHERE NOT "requests"."acceptable") AS "invalid",
+                   (COUNT("requests"."request_id") + COALESCE(MAX("aggregates"."hits"), 0))::BIGINT AS "total",
+                   COALESCE(FLOOR(AVG("requests"."threat_level")), 0)::INTEGER AS "threat_level"
+            FROM "actors"
+            LEFT JOIN "requests" ON "requests"."actor_id" = "actors"."actor_id"
+            -- rate limited requests were never classified, so they count towards the total only
+            LEFT JOIN (
+                SELECT "actor_id", SUM("hits") AS "hits" FROM "request_aggregates" GROUP BY "actor_id"
+            ) AS "aggregates" ON "aggregates"."actor_id" = "actors"."actor_id"
+            GROUP BY "actors"."actor_id", "actors"."host"
+            ORDER BY "{HOST_SORT_COLUMNS[sort_by]}" {direction}, "actors"."host"
+            LIMIT %s OFFSET %s
+        """, (limit, offset))
+        return self.fetchall()
+
+    def get_requests(self, endpoint: Optional[str] = None, host: Optional[RemoteHost] = None,
+                     limit: Optional[int] = DEFAULT_PAGE_SIZE,
+                     cursor: Optional[PageCursor] = None) -> Tuple[List[IncomingRequest], Optional[PageCursor]]:
+        conditions, variables = [], []
+        if endpoint is not None:
+            conditions.append('"requests"."path" = %s')
+            variables.append(endpoint)
+        if host is not None:
+            conditions.append('"actors"."host" = %s')
+            variables.append(host.address)
+        return self.paginate_requests(" AND ".join(conditions), variables, limit, cursor)
+
+    def paginate_requests(self, condition: str, variables: List[Any], limit: Optional[int],
+                          cursor: Optional[PageCursor]) -> Tuple[List[IncomingRequest], Optional[PageCursor]]:
+        conditions = [f"({condition})"] if condition else []
+        if cursor is not None:
+            # keyset pagination, matching the ORDER BY below so each page is an index range scan
+            conditions.append('("requests"."timestamp", "requests"."request_id") < (%s, %s)')
+            variables = [*variables, cursor.timestamp, cursor.request_id]
+
+        query = f'SELECT {REQUEST_COLUMNS} FROM "requests" JOIN "actors" ON "actors"."actor_id" = "requests"."actor_id"'
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += ' ORDER BY "requests"."timestamp" DESC, "requests"."request_id" DESC LIMIT %s'
+        self.execute(query, [*variables, None if limit is None else limit + 1])
+
+        rows = self.fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = PageCursor(rows[-1][1], rows[-1][10])
+        return [self.request_from_row(row) for row in rows], next_cursor
+
+    @staticmethod
+    def request_from_row(row: Tuple[Any, ...]) -> IncomingRequest:
+        # classification is read back as stored; rows are only reclassified by the reclassification job
+        return IncomingRequest(row[6]).from_components(
+            host=row[9],
+            timestamp=row[1],
+            request_method=row[2],
+            request_body=loads(row[3]),
+            request_headers=loads(row[4]),
+            query_string=row[5],
+            request_uri=row[8],
+            request_id=row[10],
+            threat_level=row[7],
+            request_types=[RequestType.from_str(t) for t in row[11]] if row[11] is not None else None,
+            attack_types=[AttackType.from_str(t) for t in row[12]] if row[12] is not None else None,
+            matched_flags=row[13],
+            flags_version=row[14],
+        )
+
+    def get_campaigns(self, limit: Optional[int] = None, offset: int = 0, sort_by: str = "actors",
+                      descending: bool = True, min_actors: int = 1) -> List[Dict[str, Any]]:
+        if sort_by not in CAMPAIGN_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort campaigns by {sort_by}.")
+
+        direction = "DESC" if descending else "ASC"
+        self.execute(f"""
+            SELECT "fingerprint", "method", "path_template", "query_keys", "header_names", "ua_family",
+                   "request_count", "actor_count", "first_seen", "last_seen"
+            FROM "fingerprints"
+            WHERE "actor_count" >= %s
+            ORDER BY "{CAMPAIGN_SORT_COLUMNS[sort_by]}" {direction}, "fingerprint"
+            LIMIT %s OFFSET %s
+        """, (min_actors, limit, offset))
+        return [{
+            "fingerprint": fingerprint,
+            "method": method,
+            "path_template": path_template,
+            "query_keys": query_keys,
+            "header_names": header_names,
+            "ua_family": ua_family,
+            "requests": request_count,
+            "actors": actor_count,
+            "first_seen": first_seen.isoformat() if first_seen else None,
+            "last_seen": last_seen.isoformat() if last_seen else None,
+        } for fingerprint, method, path_template, query_keys, header_names, ua_family, request_count, actor_count,
+            first_seen, last_seen in self.fetchall()]
+
+    def get_campaign_requests(self, fingerprint: str, limit: Optional[int] = DEFAULT_PAGE_SIZE,
+                              cursor: Optional[PageCursor] = None
+                              ) -> Tuple[List[IncomingRequest], Optional[PageCursor]]:
+        return self.paginate_requests('"requests"."fingerprint" = %s', [fingerprint], limit, cursor)
 
     def connect_target_exists(self, url: str) -> bool:
         self.execute("SELECT EXISTS(SELECT connect_target_id FROM connect_targets WHERE url = %s)", (url,))
@@ -228,74 +724,62 @@ class DatabaseHandler(BaseHandler):
                body: Optional[str] = None,
                all_must_match: bool = False,
                case_sensitive: bool = False,
-               ) -> List[IncomingRequest]:
-        query = ("SELECT actor_id, timestamp, method, body, headers, query_string, port, acceptable, path, request_id "
-                 "FROM requests")
-        conditions = []
-        variables = []
+               limit: Optional[int] = DEFAULT_PAGE_SIZE,
+               cursor: Optional[PageCursor] = None,
+               ) -> Tuple[List[IncomingRequest], Optional[PageCursor]]:
+        planner = self.search_planner(actor_id, uri, method, threat_level, acceptable, host, headers, query_string,
+                                      body, all_must_match, case_sensitive)
+        condition, variables = planner.build()
+        return self.paginate_requests(condition, variables, limit, cursor)
+
+    @staticmethod
+    def search_planner(actor_id: Optional[int] = None,
+                       uri: Optional[str] = None,
+                       method: Optional[str] = None,
+                       threat_level: Optional[int] = None,
+                       acceptable: Optional[bool] = None,
+                       host: Optional[str] = None,
+                       headers: Optional[str] = None,
+                       query_string: Optional[str] = None,
+                       body: Optional[str] = None,
+                       all_must_match: bool = False,
+                       case_sensitive: bool = False) -> SearchPlanner:
+        planner = SearchPlanner(case_sensitive, all_must_match)
         if actor_id:
-            conditions.append("actor_id = %s")
-            variables.append(actor_id)
+            planner.equals('"requests"."actor_id"', actor_id)
         if uri:
-            conditions.append(f"path {'LIKE' if case_sensitive else 'ILIKE'} %s")
-            variables.append(f"%{uri}%")
+            planner.contains('"requests"."path"', uri)
         if method:
-            conditions.append(f"method {'LIKE' if case_sensitive else 'ILIKE'} %s")
-            variables.append(f"%{method}%")
+            planner.method(method)
         if threat_level:
-            conditions.append("threat_level = %s")
-            variables.append(threat_level)
+            planner.equals('"requests"."threat_level"', threat_level)
         if acceptable is not None:
-            conditions.append("acceptable = %s")
-            variables.append(acceptable)
+            planner.equals('"requests"."acceptable"', acceptable)
         if host:
-            conditions.append(
-                f"actor_id IN (SELECT actor_id FROM actors WHERE host {'LIKE' if not case_sensitive else 'ILIKE'} %s)")
-            variables.append(f"%{host}%")
+            planner.host(host)
         if headers:
-            conditions.append(f"headers {'LIKE' if case_sensitive else 'ILIKE'} %s")
-            variables.append(f"%{headers}%")
+            planner.headers(headers)
         if query_string:
-            conditions.append(f"query_string {'LIKE' if case_sensitive else 'ILIKE'} %s")
-            variables.append(f"%{query_string}%")
+            planner.contains('"requests"."query_string"', query_string)
         if body:
-            conditions.append(f"body {'LIKE' if case_sensitive else 'ILIKE'} %s")
-            variables.append(f"%{body}%")
+            planner.document('"requests"."body"', body)
+        return planner
 
-        if conditions:
-            separator = " AND " if all_must_match else " OR "
-            query += " WHERE " + separator.join(conditions)
-
-        self.execute(query, variables)
-        requests = self.fetchall()
-        r = []
-        for row in requests:
-            self.execute("SELECT host FROM actors WHERE actor_id = %s", (row[0],))
-            host = RemoteHost(self.fetchone()[0])
-            incoming_request = (IncomingRequest(row[6])
-            .from_components(
-                request_method=row[2], request_body=loads(row[3]), threat_level=row[7], request_headers=loads(row[4]),
-                timestamp=row[1], query_string=row[5], request_uri=row[8], request_id=row[-1], host=host.address)
-            )
-            incoming_request.determine_threat_level()
-            r.append(incoming_request)
-        return sorted(r, key=lambda x: x.timestamp, reverse=True)
-
-    # stats
+    # stats, served from the summary tables that record_ingest maintains
     def get_request_count(self) -> int:
-        self.execute("SELECT COUNT(request_id) FROM requests")
+        self.execute('SELECT "request_count" FROM "dashboard_stats" WHERE "stats_id" = 1')
         return self.fetchone()[0]
 
     def get_actor_count(self) -> int:
-        self.execute("SELECT COUNT(actor_id) FROM actors")
+        self.execute('SELECT "actor_count" FROM "dashboard_stats" WHERE "stats_id" = 1')
         return self.fetchone()[0]
 
     def get_endpoint_count(self) -> int:
-        self.execute("SELECT COUNT(DISTINCT path) FROM requests")
+        self.execute('SELECT "endpoint_count" FROM "dashboard_stats" WHERE "stats_id" = 1')
         return self.fetchone()[0]
 
     def get_last_request_time(self) -> datetime:
-        self.execute("SELECT timestamp FROM requests ORDER BY timestamp DESC LIMIT 1")
+        self.execute('SELECT "last_request_time" FROM "dashboard_stats" WHERE "stats_id" = 1')
         return self.fetchone()[0]
 
     def get_last_actor(self) -> Tuple[str, str]:
@@ -309,30 +793,80 @@ class DatabaseHandler(BaseHandler):
 
     def get_last_endpoint(self) -> Tuple[Any, ...]:
         self.execute("""
-            SELECT "requests"."method", "unique_paths"."path", "requests"."threat_level"
-            FROM (
-                SELECT "path", COUNT(*) AS "count"
-                FROM "requests"
-                GROUP BY "path"
-                HAVING COUNT(*) = 1
-            ) AS unique_paths
-            JOIN "requests" ON "unique_paths"."path" = "requests"."path"
-            ORDER BY "requests"."request_id" DESC
+            SELECT "requests"."method", "requests"."path", "requests"."threat_level"
+            FROM "endpoint_counts"
+            JOIN "requests" ON "requests"."request_id" = "endpoint_counts"."last_request_id"
+            WHERE "endpoint_counts"."hits" = 1
+            ORDER BY "endpoint_counts"."last_request_id" DESC
             LIMIT 1;
         """)
         return self.fetchone()
 
     def get_average_time_between_requests(self) -> float:
+        # the mean gap between consecutive timestamps telescopes to the total span over the number of gaps
         self.execute("""
-            SELECT AVG("time_diff")
-            FROM (
-                SELECT "timestamp" - LAG("timestamp", 1) OVER (ORDER BY "timestamp") AS "time_diff"
-                FROM "requests"
-            ) AS "time_diffs"
-            WHERE "time_diff" IS NOT NULL;
+            SELECT ("last_request_time" - "first_request_time") / NULLIF("request_count" - 1, 0)
+            FROM "dashboard_stats"
+            WHERE "stats_id" = 1
         """)
         return self.fetchone()[0]
 
+    def get_dashboard_stats(self) -> Dict[str, Any]:
+        self.execute("""
+            SELECT "request_count", "actor_count", "endpoint_count", "last_request_time",
+                   ("last_request_time" - "first_request_time") / NULLIF("request_count" - 1, 0)
+            FROM "dashboard_stats"
+            WHERE "stats_id" = 1
+        """)
+        request_count, actor_count, endpoint_count, last_request_time, time_between_requests = self.fetchone()
+        try:
+            last_actor, last_actor_time = self.get_last_actor()
+        except TypeError:
+            last_actor, last_actor_time = None, None
+        return {
+            "total_requests": request_count,
+            "total_actors": actor_count,
+            "total_endpoints": endpoint_count,
+            "last_request_time": last_request_time,
+            "time_between_requests": time_between_requests,
+            "last_endpoint": self.get_last_endpoint() or (None, None, None),
+            "last_actor": last_actor,
+            "last_actor_time": last_actor_time,
+        }
+
+    @commit_on_success
+    def rebuild_dashboard_stats(self) -> None:
+        self.execute('LOCK TABLE "requests", "actors", "request_aggregates" IN SHARE MODE')
+        # every committed row is counted from scratch below, so deltas still waiting to be flushed would count twice
+        self.after_commit(self._summaries.clear)
+        self.execute('DELETE FROM "endpoint_counts"')
+        self.execute("""
+            INSERT INTO "endpoint_counts" ("path", "hits", "last_request_id")
+            SELECT "path", SUM("hits"), MAX("last_request_id")
+            FROM (
+                SELECT "path", COUNT(*) AS "hits", MAX("request_id") AS "last_request_id"
+                FROM "requests" GROUP BY "path"
+                UNION ALL
+                SELECT "path", SUM("hits"), NULL FROM "request_aggregates" GROUP BY "path"
+            ) AS "endpoints"
+            GROUP BY "path"
+        """)
+        # requests folded into request_aggregates during floods still count towards the totals
+        self.execute("""
+            INSERT INTO "dashboard_stats" ("stats_id", "request_count", "actor_count", "endpoint_count",
+                                           "first_request_time", "last_request_time")
+            SELECT 1, COUNT(*) + (SELECT COALESCE(SUM("hits"), 0) FROM "request_aggregates"),
+                   (SELECT COUNT(*) FROM "actors"), (SELECT COUNT(*) FROM "endpoint_counts"), MIN("timestamp"),
+                   MAX("timestamp")
+            FROM "requests"
+            ON CONFLICT ("stats_id") DO UPDATE SET
+                "request_count" = EXCLUDED."request_count",
+                "actor_count" = EXCLUDED."actor_count",
+                "endpoint_count" = EXCLUDED."endpoint_count",
+                "first_request_time" = EXCLUDED."first_request_time",
+                "last_request_time" = EXCLUDED."last_request_time"
+        """)
+
     @commit_on_success
     def generate_admin_key(self) -> str:
         key = str(uuid4())
@@ -340,16 +874,37 @@ class DatabaseHandler(BaseHandler):
         return key
 
     @commit_on_success
-    def generate_admin_session_token(self, admin_username: str) -> str:
+    def generate_admin_session_token(self, admin_username: str,
+                                     lifetime: timedelta = SESSION_LIFETIME) -> Tuple[str, float]:
         self.execute("SELECT admin_id FROM admins WHERE username = %s", (admin_username,))
         admin_id = self.fetchone()[0]
         token = str(uuid4())
-        self.execute("INSERT INTO admin_sessions (token, admin_id) VALUES (%s, %s)", (token, admin_id))
-        return token
+        self.execute("INSERT INTO admin_sessions (token, admin_id, expires_at) VALUES (%s, %s, NOW() + %s) "
+                     "RETURNING EXTRACT(EPOCH FROM expires_at - NOW())::FLOAT", (token, admin_id, lifetime))
+        return token, self.fetchone()[0]
+
+    def get_session_remaining(self, token: str) -> Optional[float]:
+        # seconds left, worked out against the database clock so the naive expires_at is never compared to local time
+        self.execute("SELECT EXTRACT(EPOCH FROM expires_at - NOW())::FLOAT FROM admin_sessions "
+                     "WHERE token = %s AND expires_at > NOW()", (token,))
+        result = self.fetchone()
+        return result[0] if result else None
 
     def validate_session_token(self, token: str) -> bool:
-        self.execute("SELECT EXISTS(SELECT token FROM admin_sessions WHERE token = %s)", (token,))
-        return self.fetchone()[0]
+        return self.get_session_remaining(token) is not None
+
+    @commit_on_success
+    def delete_admin_session(self, token: str) -> None:
+        self.execute("DELETE FROM admin_sessions WHERE token = %s", (token,))
+
+    @commit_on_success
+    def delete_expired_admin_sessions(self, batch_size: int = 1000) -> int:
+        self.execute("""
+            DELETE FROM "admin_sessions" WHERE "session_id" IN (
+                SELECT "session_id" FROM "admin_sessions" WHERE "expires_at" <= NOW() LIMIT %s
+            )
+        """, (batch_size,))
+        return self.rowcount
 
     @commit_on_success
     def validate_and_delete_registration_key(self, key: str) -> bool:
@@ -360,19 +915,18 @@ class DatabaseHandler(BaseHandler):
         return True
 
     @commit_on_success
-    def add_admin(self, username: str, password: str):
-        self.execute("INSERT INTO admins (username, password) VALUES (%s, %s)",
-                     (username, self.hash_password(password)))
+    def add_admin(self, username: str, password_hash: str):
+        self.execute("INSERT INTO admins (username, password) VALUES (%s, %s)", (username, password_hash))
 
-    def validate_admin_credentials(self, username: str, password: str) -> bool:
-        self.execute("SELECT EXISTS(SELECT username FROM admins WHERE username = %s AND password = %s)",
-                     (username, self.hash_password(password)))
-        return self.fetchone()[0]
+    def get_admin_password(self, username: str) -> Optional[str]:
+        self.execute("SELECT password FROM admins WHERE username = %s", (username,))
+        result = self.fetchone()
+        return result[0] if result else None
+
+    @commit_on_success
+    def update_admin_password(self, username: str, password_hash: str) -> None:
+        self.execute("UPDATE admins SET password = %s WHERE username = %s", (password_hash, username))
 
     def username_exists(self, username: str) -> bool:
         self.execute("SELECT EXISTS(SELECT username FROM admins WHERE username = %s)", (username,))
         return self.fetchone()[0]
-
-    @staticmethod
-    def hash_password(password: str) -> str:
-        return sha256(password.encode()).hexdigest()
@@ -0,0 +1,102 @@
+from hashlib import sha256
+from json import dumps
+from re import compile, IGNORECASE
+from typing import List, Tuple, Optional
+from urllib.parse import parse_qsl, unquote
+
+from flask_recon.structures import IncomingRequest
+
+# headers added by the proxies in front of the listener rather than by the client
+PROXY_HEADERS = {
+    "x-forwarded-for", "x-forwarded-host", "x-forwarded-proto", "x-forwarded-port", "x-real-ip", "forwarded",
+    "cf-connecting-ip", "cf-ray", "cf-ipcountry", "cf-visitor", "cdn-loop", "true-client-ip", "via", "x-request-id",
+}
+PATH_PLACEHOLDERS = [
+    (compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", IGNORECASE), "{uuid}"),
+    (compile(r"^\d+$"), "{int}"),
+    (compile(r"^[0-9a-f]{16,}$", IGNORECASE), "{hex}"),
+    (compile(r"^[A-Za-z0-9_\-]{32,}={0,2}$"), "{token}"),
+]
+# checked in order, so specific tools come before the generic families that their user agents also match
+UA_FAMILIES = [
+    (compile(r"^curl/", IGNORECASE), "curl"),
+    (compile(r"^wget/", IGNORECASE), "wget"),
+    (compile(r"python-requests", IGNORECASE), "python-requests"),
+    (compile(r"python-urllib|python/\d", IGNORECASE), "python"),
+    (compile(r"aiohttp|httpx", IGNORECASE), "python"),
+    (compile(r"go-http-client", IGNORECASE), "go-http-client"),
+    (compile(r"zgrab", IGNORECASE), "zgrab"),
+    (compile(r"masscan", IGNORECASE), "masscan"),
+    (compile(r"nmap", IGNORECASE), "nmap"),
+    (compile(r"nuclei", IGNORECASE), "nuclei"),
+    (compile(r"sqlmap", IGNORECASE), "sqlmap"),
+    (compile(r"nikto", IGNORECASE), "nikto"),
+    (compile(r"censys", IGNORECASE), "censys"),
+    (compile(r"expanse|paloalto", IGNORECASE), "expanse"),
+    (compile(r"l9explore|l9tcpid|leakix", IGNORECASE), "leakix"),
+    (compile(r"okhttp", IGNORECASE), "okhttp"),
+    (compile(r"^java/|apache-httpclient", IGNORECASE), "java"),
+    (compile(r"libwww-perl", IGNORECASE), "perl"),
+    (compile(r"headlesschrome", IGNORECASE), "headless-chrome"),
+    (compile(r"bot|crawler|spider", IGNORECASE), "bot"),
+    (compile(r"^mozilla/", IGNORECASE), "browser"),
+]
+
+
+class RequestFingerprint:
+    _method: str
+    _path_template: str
+    _query_keys: List[str]
+    _header_names: List[str]
+    _ua_family: str
+    _digest: str
+
+    def __init__(self, method: str, path_template: str, query_keys: List[str], header_names: List[str],
+                 ua_family: str):
+        self._method = method
+        self._path_template = path_template
+        self._query_keys = query_keys
+        self._header_names = header_names
+        self._ua_family = ua_family
+        self._digest = sha256(dumps([method, path_template, query_keys, header_names, ua_family]).encode()).hexdigest()
+
+    @staticmethod
+    def of(request: IncomingRequest) -> "RequestFingerprint":
+        headers = {k.lower(): v for k, v in (request.headers or {}).items()}
+        return RequestFingerprint(
+            method=getattr(request.method, "value", request.method),
+            path_template=RequestFingerprint.path_template(request.uri),
+            query_keys=sorted({key for key, _ in parse_qsl(request.query_string or "", keep_blank_values=True)}),
+            header_names=sorted(name for name in headers if name not in PROXY_HEADERS),
+            ua_family=RequestFingerprint.ua_family(headers.get("user-agent")),
+        )
+
+    @staticmethod
+    def path_template(path: str) -> str:
+        segments = []
+        for segment in unquote(path).split("/"):
+            if not segment:
+                continue
+            for pattern, placeholder in PATH_PLACEHOLDERS:
+                if pattern.match(segment):
+                    segment = placeholder
+                    break
+            segments.append(segment)
+        return "/" + "/".join(segments)
+
+    @staticmethod
+    def ua_family(user_agent: Optional[str]) -> str:
+        if not user_agent:
+            return "none"
+        for pattern, family in UA_FAMILIES:
+            if pattern.search(user_agent):
+                return family
+        return "other"
+
+    @property
+    def components(self) -> Tuple[str, str, List[str], List[str], str]:
+        return self._method, self._path_template, self._query_keys, self._header_names, self._ua_family
+
+    @property
+    def digest(self) -> str:
+        return self._digest
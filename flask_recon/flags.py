@@ -1,4 +1,6 @@
+from collections import deque
 from enum import Enum
+from hashlib import sha256
 from json import loads
 from typing import List, Any, Dict, Optional
 
@@ -94,19 +96,86 @@ class Flag:
         return self._attack_types
 
 
+class FlagMatcher:
+    # Aho-Corasick automaton over the flag strings, so matching costs one pass over the value
+    # regardless of how many flags are loaded
+    _flags: List[Flag]
+    _goto: List[Dict[str, int]]
+    _fail: List[int]
+    _output: List[List[int]]
+    _always: List[int]
+
+    def __init__(self, flags: List[Flag]):
+        self._flags = flags
+        self._goto, self._fail, self._output = [{}], [0], [[]]
+        self._always = [index for index, flag in enumerate(flags) if not flag.flag]
+        for index, flag in enumerate(flags):
+            if flag.flag:
+                self._output[self.add_pattern(flag.flag)].append(index)
+        self.build_failure_links()
+
+    def add_pattern(self, pattern: str) -> int:
+        node = 0
+        for char in pattern:
+            if (child := self._goto[node].get(char)) is None:
+                child = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = child
+            node = child
+        return node
+
+    def build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def match(self, value: Optional[str]) -> List[Flag]:
+        if not value:
+            return [self._flags[index] for index in self._always]
+
+        goto, fail, output = self._goto, self._fail, self._output
+        found, node = set(self._always), 0
+        for char in value:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        # flags are returned in file order, matching the order a linear scan would produce
+        return [self._flags[index] for index in sorted(found)]
+
+
 class KnownFlags:
     _flags_file: str
-    _payload_flags: List[Flag] = []
-    _ua_flags: List[Flag] = []
+    _version: str
+    _payload_flags: List[Flag]
+    _ua_flags: List[Flag]
+    _payload_matcher: FlagMatcher
+    _ua_matcher: FlagMatcher
 
     def __init__(self, flags_file: str):
         self._flags_file = flags_file
         self.load_flags()
 
     def load_flags(self):
-        flag_data = loads(open(self._flags_file).read())
+        raw_flags = open(self._flags_file, "rb").read()
+        # stored alongside each classification so stale rows can be found after flags.json changes
+        self._version = sha256(raw_flags).hexdigest()[:16]
+        flag_data = loads(raw_flags)
+        self._payload_flags, self._ua_flags = [], []
         self.add_flags(flag_data["payload"], self._payload_flags)
         self.add_flags(flag_data["user_agent"], self._ua_flags)
+        self._payload_matcher = FlagMatcher(self._payload_flags)
+        self._ua_matcher = FlagMatcher(self._ua_flags)
 
     @staticmethod
     def add_flags(flags: List[Dict[str, Any]], target: List[Flag]) -> None:
@@ -116,6 +185,10 @@ class KnownFlags:
             target.append(Flag(request_types=request_types, flag_string=flag["flag"], score=flag["score"],
                                attack_types=attack_types))
 
+    @property
+    def version(self) -> str:
+        return self._version
+
     @property
     def known_payload_flags(self) -> List[Flag]:
         return self._payload_flags
@@ -124,5 +197,13 @@ class KnownFlags:
     def known_ua_flags(self) -> List[Flag]:
         return self._ua_flags
 
+    @property
+    def payload_matcher(self) -> FlagMatcher:
+        return self._payload_matcher
+
+    @property
+    def ua_matcher(self) -> FlagMatcher:
+        return self._ua_matcher
+
 
 KNOWN_FLAGS = KnownFlags("flags.json")
@@ -0,0 +1,78 @@
+from fnmatch import translate
+from re import compile, Pattern
+from threading import Thread, Event
+from typing import Dict, List, Tuple, Any, Optional
+
+from flask_recon.database import DatabaseHandler, HONEYPOT_CHANNEL
+
+
+class HoneypotCache:
+    # swapped in whole on reload, so lookups never see a half-built snapshot
+    _snapshot: Tuple[Dict[str, str], List[Tuple[str, str]], List[Tuple[Pattern, str]]]
+    _poll_interval: float
+    _stop_event: Event
+    _listener_thread: Optional[Thread] = None
+
+    def __init__(self, poll_interval: float = 60.0):
+        self._snapshot = ({}, [], [])
+        self._poll_interval = poll_interval
+        self._stop_event = Event()
+
+    def load(self, database_handler: DatabaseHandler) -> None:
+        files, prefixes, globs = {}, [], []
+        for file_name, match_type, contents in database_handler.get_honeypots():
+            if match_type == "file":
+                files.setdefault(file_name, contents)
+            elif match_type == "prefix":
+                prefixes.append((file_name, contents))
+            elif match_type == "glob":
+                globs.append((compile(translate(file_name)), contents))
+        # longest prefix wins when several match
+        prefixes.sort(key=lambda prefix: len(prefix[0]), reverse=True)
+        self._snapshot = (files, prefixes, globs)
+
+    def lookup(self, path: str) -> Optional[str]:
+        files, prefixes, globs = self._snapshot
+        if (contents := files.get(path.split("/")[-1])) is not None:
+            return contents
+
+        for prefix, contents in prefixes:
+            if path.startswith(prefix):
+                return contents
+
+        for pattern, contents in globs:
+            if pattern.match(path):
+                return contents
+        return None
+
+    def start_listener(self, connection_params: Dict[str, Any]) -> None:
+        self._listener_thread = Thread(target=self._listen, args=(connection_params,), name="flask-recon-honeypots",
+                                       daemon=True)
+        self._listener_thread.start()
+
+    def stop_listener(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        if self._listener_thread is not None:
+            self._listener_thread.join(timeout)
+
+    def _listen(self, connection_params: Dict[str, Any]) -> None:
+        while not self._stop_event.is_set():
+            database_handler = None
+            try:
+                database_handler = DatabaseHandler(**connection_params)
+                database_handler.listen(HONEYPOT_CHANNEL)
+                # reload once per connection in case a change was missed while disconnected
+                self.load(database_handler)
+                while not self._stop_event.is_set():
+                    database_handler.poll_notifications(self._poll_interval)
+                    # a timeout without notifications doubles as the periodic version poll
+                    self.load(database_handler)
+            except Exception:
+                self._stop_event.wait(self._poll_interval)
+            finally:
+                if database_handler is not None:
+                    database_handler.disconnect()
+
+    def __len__(self) -> int:
+        files, prefixes, globs = self._snapshot
+        return len(files) + len(prefixes) + len(globs)
@@ -0,0 +1,151 @@
+from datetime import datetime
+from queue import Queue, Empty, Full
+from threading import Thread, Lock, Event
+from time import sleep
+from typing import List, Tuple, Dict, Any, Optional
+
+from psycopg2 import OperationalError, InterfaceError, DatabaseError
+
+from flask_recon.database import DatabaseHandler
+from flask_recon.metrics import METRICS
+from flask_recon.structures import IncomingRequest
+
+
+class IngestionQueue:
+    _connection_params: Dict[str, Any]
+    _queue: "Queue[Tuple[IncomingRequest, datetime]]"
+    _workers: List[Thread]
+    _worker_count: int
+    _batch_size: int
+    _flush_interval: float
+    _block_timeout: Optional[float]
+    _max_retries: int
+    _retry_interval: float
+    _stop_event: Event
+    _counter_lock: Lock
+    _enqueued: int
+    _dropped: int
+    _written: int
+    _failed: int
+
+    def __init__(self, connection_params: Dict[str, Any], max_size: int = 10_000, workers: int = 2,
+                 batch_size: int = 500, flush_interval: float = 0.5, block_timeout: Optional[float] = None,
+                 max_retries: int = 5, retry_interval: float = 1.0):
+        if max_size < 1 or workers < 1 or batch_size < 1:
+            raise ValueError("max_size, workers and batch_size must be positive.")
+
+        self._connection_params = connection_params
+        self._queue = Queue(maxsize=max_size)
+        self._workers = []
+        self._worker_count = workers
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        # None drops immediately when the queue is full, otherwise the caller waits up to block_timeout seconds
+        self._block_timeout = block_timeout
+        self._max_retries = max_retries
+        self._retry_interval = retry_interval
+        self._stop_event = Event()
+        self._counter_lock = Lock()
+        self._enqueued, self._dropped, self._written, self._failed = 0, 0, 0, 0
+
+    def start(self) -> None:
+        for i in range(self._worker_count):
+            worker = Thread(target=self._run_worker, name=f"flask-recon-ingest-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def put(self, request: IncomingRequest, received_at: datetime) -> bool:
+        item = (request, received_at)
+        try:
+            if self._block_timeout is None:
+                self._queue.put_nowait(item)
+            else:
+                self._queue.put(item, timeout=self._block_timeout)
+        except Full:
+            self._increment("_dropped")
+            return False
+
+        self._increment("_enqueued")
+        return True
+
+    def _run_worker(self) -> None:
+        database_handler = None
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                database_handler = self._write(database_handler, batch)
+
+    def _write(self, database_handler: Optional[DatabaseHandler],
+               batch: List[Tuple[IncomingRequest, datetime]]) -> Optional[DatabaseHandler]:
+        for attempt in range(self._max_retries + 1):
+            try:
+                if database_handler is None:
+                    database_handler = DatabaseHandler(**self._connection_params)
+                with METRICS.time("flask_recon_database_insert_seconds", (("mode", "batch"),)):
+                    database_handler.insert_requests(batch)
+                self._increment("_written", len(batch))
+                return database_handler
+            except (OperationalError, InterfaceError):
+                # the connection is gone, e.g. after a postgres restart, so the batch is retried on a fresh one
+                if database_handler is not None:
+                    database_handler.disconnect()
+                database_handler = None
+                sleep(self._retry_interval * 2 ** attempt)
+            except DatabaseError:
+                # a single bad row, such as an overlong path, would otherwise take the rest of the batch with it
+                return self._write_rows(database_handler, batch)
+            except Exception:
+                break
+        self._increment("_failed", len(batch))
+        return database_handler
+
+    def _write_rows(self, database_handler: DatabaseHandler,
+                    batch: List[Tuple[IncomingRequest, datetime]]) -> Optional[DatabaseHandler]:
+        for i, item in enumerate(batch):
+            try:
+                database_handler.insert_requests([item])
+                self._increment("_written")
+            except (OperationalError, InterfaceError):
+                database_handler.disconnect()
+                return self._write(None, batch[i:])
+            except Exception:
+                self._increment("_failed")
+        return database_handler
+
+    def _next_batch(self) -> List[Tuple[IncomingRequest, datetime]]:
+        try:
+            batch = [self._queue.get(timeout=self._flush_interval)]
+        except Empty:
+            return []
+
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _increment(self, counter: str, amount: int = 1) -> None:
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._counter_lock:
+            return {
+                "depth": self._queue.qsize(),
+                "enqueued": self._enqueued,
+                "dropped": self._dropped,
+                "written": self._written,
+                "failed": self._failed,
+            }
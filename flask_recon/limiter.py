@@ -0,0 +1,153 @@
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock, Thread, Event
+from time import monotonic
+from typing import Dict, Tuple, Any, Optional
+
+from psycopg2 import OperationalError, InterfaceError
+
+from flask_recon.database import DatabaseHandler
+from flask_recon.structures import IncomingRequest
+
+
+class TokenBucketLimiter:
+    _rate: float
+    _burst: float
+    _max_hosts: int
+    _buckets: "OrderedDict[str, Tuple[float, float]]"
+    _lock: Lock
+
+    def __init__(self, rate: float = 10.0, burst: float = 100.0, max_hosts: int = 100_000):
+        if rate <= 0 or burst < 1 or max_hosts < 1:
+            raise ValueError("rate and max_hosts must be positive and burst at least 1.")
+
+        self._rate = rate
+        self._burst = burst
+        self._max_hosts = max_hosts
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def allow(self, remote_address: str) -> bool:
+        now = monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(remote_address, (self._burst, now))
+            tokens = min(self._burst, tokens + (now - updated_at) * self._rate)
+            allowed = tokens >= 1
+            self._buckets[remote_address] = (tokens - 1 if allowed else tokens, now)
+            self._buckets.move_to_end(remote_address)
+            # the least recently seen hosts are forgotten first, and a forgotten host simply starts with a full bucket
+            while len(self._buckets) > self._max_hosts:
+                self._buckets.popitem(last=False)
+            return allowed
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class FloodAggregator:
+    # counts requests that were rate limited and not stored, so stored rows plus aggregates is the true total
+    _connection_params: Dict[str, Any]
+    _sample_rate: int
+    _flush_interval: float
+    _idle_timeout: float
+    _counts: Dict[Tuple[str, str, str, datetime], int]
+    _seen: Dict[str, Tuple[int, float]]
+    _lock: Lock
+    _stop_event: Event
+    _flush_thread: Optional[Thread] = None
+    _aggregated: int
+    _sampled: int
+    _failed: int
+
+    def __init__(self, connection_params: Dict[str, Any], sample_rate: int = 100, flush_interval: float = 5.0,
+                 idle_timeout: float = 60.0):
+        if sample_rate < 1:
+            raise ValueError("sample_rate must be positive.")
+
+        self._connection_params = connection_params
+        self._sample_rate = sample_rate
+        self._flush_interval = flush_interval
+        self._idle_timeout = idle_timeout
+        self._counts = {}
+        self._seen = {}
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._aggregated, self._sampled, self._failed = 0, 0, 0
+
+    def record(self, request: IncomingRequest, received_at: datetime) -> bool:
+        # returns whether this request is one of the 1 in sample_rate that should still be stored in full; sampled
+        # per host, since a flood that varies its path or query string would otherwise never repeat a key
+        host = request.host.address
+        now = monotonic()
+        minute = received_at.replace(second=0, microsecond=0)
+        with self._lock:
+            seen, _ = self._seen.get(host, (0, now))
+            self._seen[host] = (seen + 1, now)
+            if seen % self._sample_rate == 0:
+                self._sampled += 1
+                return True
+
+            key = (host, request.uri.split("?")[0], request.method.value, minute)
+            self._counts[key] = self._counts.get(key, 0) + 1
+            self._aggregated += 1
+            return False
+
+    def start(self) -> None:
+        self._flush_thread = Thread(target=self._run, name="flask-recon-flood-aggregator", daemon=True)
+        self._flush_thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                database_handler = DatabaseHandler(**self._connection_params)
+                while not self._stop_event.is_set():
+                    self._stop_event.wait(self._flush_interval)
+                    self.flush(database_handler)
+                # whatever was counted after the last interval is still written on shutdown
+                self.flush(database_handler)
+                return
+            except (OperationalError, InterfaceError):
+                # the counts of the failed flush were put back, so they go out once the database is reachable
+                if self._stop_event.wait(self._flush_interval):
+                    return
+
+    def flush(self, database_handler: DatabaseHandler) -> None:
+        now = monotonic()
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            # a host forgets its sampling position once it has been quiet for idle_timeout seconds
+            self._seen = {host: (seen, last_seen) for host, (seen, last_seen) in self._seen.items()
+                          if now - last_seen < self._idle_timeout}
+        if not counts:
+            return
+
+        try:
+            database_handler.insert_request_aggregates(
+                [(host, path, method, minute, hits) for (host, path, method, minute), hits in counts.items()])
+        except (OperationalError, InterfaceError) as e:
+            self._restore(counts)
+            raise e
+        except Exception:
+            # anything else would fail again on retry, so the counts are given up rather than retried forever
+            with self._lock:
+                self._failed += sum(counts.values())
+
+    def _restore(self, counts: Dict[Tuple[str, str, str, datetime], int]) -> None:
+        with self._lock:
+            for key, hits in counts.items():
+                self._counts[key] = self._counts.get(key, 0) + hits
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending": sum(self._counts.values()),
+                "aggregated": self._aggregated,
+                "sampled": self._sampled,
+                "failed": self._failed,
+            }
@@ -0,0 +1,162 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, enumerate as enumerate_threads, get_native_id
+from time import perf_counter
+from typing import Dict, Tuple, List, Callable, Iterator, Optional
+
+Labels = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+TARPIT_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0, 14400.0, 86400.0)
+
+
+class MetricsShard:
+    # written only by the thread that owns it, so recording never takes a lock
+    counters: Dict[Tuple[str, Labels], float]
+    histograms: Dict[Tuple[str, Labels], List[float]]
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def copy(self) -> "MetricsShard":
+        # dict() and list() copy without releasing the GIL, so the owning thread can keep writing while this runs
+        shard = MetricsShard()
+        shard.counters = dict(self.counters)
+        shard.histograms = {key: list(values) for key, values in dict(self.histograms).items()}
+        return shard
+
+    def merge(self, other: "MetricsShard") -> None:
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, values in other.histograms.items():
+            if key not in self.histograms:
+                self.histograms[key] = list(values)
+            else:
+                self.histograms[key] = [a + b for a, b in zip(self.histograms[key], values)]
+
+
+class MetricsRegistry:
+    # shards are keyed by native thread id, which gevent leaves unpatched, so greenlets share their hub's shard
+    _shards: Dict[int, MetricsShard]
+    _retired: MetricsShard
+    _lock: Lock
+    _descriptions: Dict[str, Tuple[str, str]]
+    _buckets: Dict[str, Tuple[float, ...]]
+    _gauges: Dict[str, Callable[[], float]]
+
+    def __init__(self):
+        self._shards = {}
+        self._retired = MetricsShard()
+        self._lock = Lock()
+        self._descriptions = {}
+        self._buckets = {}
+        self._gauges = {}
+
+    def counter(self, name: str, description: str) -> None:
+        self._descriptions[name] = ("counter", description)
+
+    def histogram(self, name: str, description: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self._descriptions[name] = ("histogram", description)
+        self._buckets[name] = buckets
+
+    def gauge(self, name: str, description: str, callback: Callable[[], float]) -> None:
+        # gauges are read at scrape time, so the hot path never touches them
+        self._descriptions[name] = ("gauge", description)
+        self._gauges[name] = callback
+
+    def _shard(self) -> MetricsShard:
+        thread_id = get_native_id()
+        if (shard := self._shards.get(thread_id)) is None:
+            with self._lock:
+                shard = self._shards.setdefault(thread_id, MetricsShard())
+        return shard
+
+    def increment(self, name: str, labels: Labels = (), amount: float = 1) -> None:
+        counters = self._shard().counters
+        counters[(name, labels)] = counters.get((name, labels), 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        histograms = self._shard().histograms
+        buckets = self._buckets[name]
+        # one slot per bucket plus +Inf, then the running sum
+        if (values := histograms.get((name, labels))) is None:
+            values = histograms[(name, labels)] = [0] * (len(buckets) + 2)
+        values[bisect_left(buckets, value)] += 1
+        values[-1] += value
+
+    @contextmanager
+    def time(self, name: str, labels: Labels = ()) -> Iterator[None]:
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - started, labels)
+
+    def snapshot(self) -> MetricsShard:
+        alive = {thread.native_id for thread in enumerate_threads()}
+        total = MetricsShard()
+        with self._lock:
+            # shards of finished threads are folded into one, so thread-per-request servers don't grow the registry
+            for thread_id in [thread_id for thread_id in self._shards if thread_id not in alive]:
+                self._retired.merge(self._shards.pop(thread_id))
+            total.merge(self._retired)
+            shards = list(self._shards.values())
+        # live shards are copied before merging, since iterating one while its thread adds a label would fail
+        for shard in shards:
+            total.merge(shard.copy())
+        return total
+
+    def render(self) -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for name, (metric_type, description) in sorted(self._descriptions.items()):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type == "gauge":
+                lines.append(f"{name} {self.format_value(self._gauges[name]())}")
+            elif metric_type == "counter":
+                for (metric, labels), value in sorted(snapshot.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self.format_labels(labels)} {self.format_value(value)}")
+            else:
+                for (metric, labels), values in sorted(snapshot.histograms.items()):
+                    if metric == name:
+                        lines.extend(self.render_histogram(name, labels, values))
+        return "\n".join(lines) + "\n"
+
+    def render_histogram(self, name: str, labels: Labels, values: List[float]) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip([*self._buckets[name], "+Inf"], values[:-1]):
+            cumulative += count
+            bucket_labels = self.format_labels((*labels, ("le", str(bound))))
+            lines.append(f"{name}_bucket{bucket_labels} {self.format_value(cumulative)}")
+        lines.append(f"{name}_sum{self.format_labels(labels)} {self.format_value(values[-1])}")
+        lines.append(f"{name}_count{self.format_labels(labels)} {self.format_value(cumulative)}")
+        return lines
+
+    @staticmethod
+    def format_labels(labels: Labels) -> str:
+        if not labels:
+            return ""
+        escaped = [(key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                   for key, value in labels]
+        return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+    @staticmethod
+    def format_value(value: Optional[float]) -> str:
+        if value is None:
+            return "NaN"
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+METRICS = MetricsRegistry()
+METRICS.histogram("flask_recon_classification_seconds", "Time spent in determine_threat_level.")
+METRICS.histogram("flask_recon_database_insert_seconds", "Time spent writing requests to the database.")
+METRICS.histogram("flask_recon_honeypot_lookup_seconds", "Time spent matching a path against the honeypots.")
+METRICS.histogram("flask_recon_tarpit_duration_seconds", "How long tarpitted connections were held.",
+                  buckets=TARPIT_BUCKETS)
+METRICS.counter("flask_recon_requests_total", "Requests received, by method.")
+METRICS.counter("flask_recon_request_types_total", "Classified request types.")
+METRICS.counter("flask_recon_attack_types_total", "Classified attack types.")
+METRICS.counter("flask_recon_rate_limited_total", "Requests over the per-address limit that were only counted.")
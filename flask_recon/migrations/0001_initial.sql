@@ -0,0 +1,206 @@
+CREATE TABLE IF NOT EXISTS "actors"
+(
+    "actor_id"     SERIAL PRIMARY KEY,
+    "host"         VARCHAR(255) NOT NULL,
+    "flagged"      BOOLEAN      NOT NULL DEFAULT FALSE,
+    "threat_level" INTEGER      NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS "requests"
+(
+    "request_id"   SERIAL PRIMARY KEY,
+    "actor_id"     INTEGER      NOT NULL,
+    "timestamp"    TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "method"       VARCHAR(255) NOT NULL,
+    "path"         VARCHAR(255) NOT NULL,
+    "body"         JSONB,
+    "headers"      JSONB,
+    "query_string" TEXT,
+    "port"         INTEGER      NOT NULL,
+    "acceptable"   BOOLEAN      NOT NULL,
+    "threat_level" INTEGER      NOT NULL DEFAULT 0,
+    "request_types" TEXT[],
+    "attack_types" TEXT[],
+    "matched_flags" TEXT[],
+    "flags_version" VARCHAR(16),
+    "fingerprint"  CHAR(64),
+    FOREIGN KEY ("actor_id") REFERENCES "actors" ("actor_id")
+);
+
+ALTER TABLE "requests" ADD COLUMN IF NOT EXISTS "request_types" TEXT[];
+ALTER TABLE "requests" ADD COLUMN IF NOT EXISTS "attack_types" TEXT[];
+ALTER TABLE "requests" ADD COLUMN IF NOT EXISTS "matched_flags" TEXT[];
+ALTER TABLE "requests" ADD COLUMN IF NOT EXISTS "flags_version" VARCHAR(16);
+ALTER TABLE "requests" ADD COLUMN IF NOT EXISTS "fingerprint" CHAR(64);
+
+DO
+$$
+    BEGIN
+        IF (SELECT "data_type" FROM "information_schema"."columns"
+            WHERE "table_name" = 'requests' AND "column_name" = 'headers') <> 'jsonb' THEN
+            ALTER TABLE "requests"
+                ALTER COLUMN "headers" TYPE JSONB USING REPLACE("headers", '\u0000', '\ufffd')::JSONB,
+                ALTER COLUMN "body" TYPE JSONB USING REPLACE("body", '\u0000', '\ufffd')::JSONB;
+        END IF;
+    END
+$$;
+
+CREATE TABLE IF NOT EXISTS "honeypots"
+(
+    "honeypot_id"    SERIAL PRIMARY KEY,
+    "file_name"      VARCHAR(255) NOT NULL,
+    "dummy_contents" TEXT         NOT NULL,
+    "match_type"     VARCHAR(16)  NOT NULL DEFAULT 'file'
+);
+
+ALTER TABLE "honeypots" ADD COLUMN IF NOT EXISTS "match_type" VARCHAR(16) NOT NULL DEFAULT 'file';
+
+CREATE TABLE IF NOT EXISTS "analysed_requests"
+(
+    "analysis_id" SERIAL PRIMARY KEY,
+    "request_id"  INTEGER NOT NULL,
+    "analysis"    TEXT,
+    "notes"       TEXT,
+    "created_at"  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY ("request_id") REFERENCES "requests" ("request_id")
+);
+
+ALTER TABLE "analysed_requests" ADD COLUMN IF NOT EXISTS "created_at" TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS "analysed_actors"
+(
+    "analysis_id" SERIAL PRIMARY KEY,
+    "actor_id"    INTEGER NOT NULL,
+    "analysis"    TEXT,
+    "notes"       TEXT,
+    FOREIGN KEY ("actor_id") REFERENCES "actors" ("actor_id")
+);
+
+CREATE TABLE IF NOT EXISTS "admins"
+(
+    "admin_id" SERIAL PRIMARY KEY,
+    "username" VARCHAR(255) NOT NULL,
+    "password" VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS "admin_sessions"
+(
+    "session_id" SERIAL PRIMARY KEY,
+    "admin_id"   INTEGER,
+    "token"      VARCHAR(255),
+    FOREIGN KEY ("admin_id") REFERENCES "admins" ("admin_id")
+);
+
+CREATE TABLE IF NOT EXISTS "admin_keys"
+(
+    "key_id" SERIAL PRIMARY KEY,
+    "key"    VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS "dashboard_stats"
+(
+    "stats_id"           INTEGER PRIMARY KEY DEFAULT 1 CHECK ("stats_id" = 1),
+    "request_count"      BIGINT  NOT NULL DEFAULT 0,
+    "actor_count"        BIGINT  NOT NULL DEFAULT 0,
+    "endpoint_count"     BIGINT  NOT NULL DEFAULT 0,
+    "first_request_time" TIMESTAMP,
+    "last_request_time"  TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS "endpoint_counts"
+(
+    "path"            VARCHAR(255) PRIMARY KEY,
+    "hits"            BIGINT       NOT NULL DEFAULT 0,
+    "last_request_id" INTEGER      NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS "analysis_cache"
+(
+    "fingerprint"  CHAR(64) PRIMARY KEY,
+    "analysis"     TEXT      NOT NULL,
+    "hits"         BIGINT    NOT NULL DEFAULT 0,
+    "created_at"   TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "last_used_at" TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS "fingerprints"
+(
+    "fingerprint"   CHAR(64) PRIMARY KEY,
+    "method"        VARCHAR(255) NOT NULL,
+    "path_template" VARCHAR(255) NOT NULL,
+    "query_keys"    TEXT[]       NOT NULL,
+    "header_names"  TEXT[]       NOT NULL,
+    "ua_family"     VARCHAR(32)  NOT NULL,
+    "request_count" BIGINT       NOT NULL DEFAULT 0,
+    "actor_count"   INTEGER      NOT NULL DEFAULT 0,
+    "first_seen"    TIMESTAMP,
+    "last_seen"     TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS "fingerprint_actors"
+(
+    "fingerprint" CHAR(64) NOT NULL,
+    "actor_id"    INTEGER  NOT NULL,
+    PRIMARY KEY ("fingerprint", "actor_id"),
+    FOREIGN KEY ("fingerprint") REFERENCES "fingerprints" ("fingerprint"),
+    FOREIGN KEY ("actor_id") REFERENCES "actors" ("actor_id")
+);
+
+INSERT INTO "dashboard_stats" ("stats_id") VALUES (1) ON CONFLICT DO NOTHING;
+
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+
+-- the old actor_exists and insert_actor pair could race and store a host twice, so duplicates are merged into the
+-- lowest actor_id before the unique index is built
+CREATE TEMPORARY TABLE "merged_actors" ON COMMIT DROP AS
+SELECT "actor_id", "kept_actor_id"
+FROM (SELECT "actor_id", MIN("actor_id") OVER (PARTITION BY "host") AS "kept_actor_id" FROM "actors") AS "ranked"
+WHERE "actor_id" <> "kept_actor_id";
+
+UPDATE "requests" SET "actor_id" = "merged_actors"."kept_actor_id"
+FROM "merged_actors" WHERE "requests"."actor_id" = "merged_actors"."actor_id";
+UPDATE "analysed_actors" SET "actor_id" = "merged_actors"."kept_actor_id"
+FROM "merged_actors" WHERE "analysed_actors"."actor_id" = "merged_actors"."actor_id";
+INSERT INTO "fingerprint_actors" ("fingerprint", "actor_id")
+SELECT "fingerprint", "kept_actor_id" FROM "fingerprint_actors", "merged_actors"
+WHERE "merged_actors"."actor_id" = "fingerprint_actors"."actor_id"
+ON CONFLICT DO NOTHING;
+DELETE FROM "fingerprint_actors" WHERE "actor_id" IN (SELECT "actor_id" FROM "merged_actors");
+
+UPDATE "actors" SET "flagged" = "merged"."flagged", "threat_level" = "merged"."threat_level"
+FROM (
+    SELECT "kept"."actor_id", BOOL_OR("kept"."flagged" OR "duplicate"."flagged") AS "flagged",
+           COALESCE((SELECT FLOOR(AVG("threat_level"))::INTEGER FROM "requests"
+                     WHERE "requests"."actor_id" = "kept"."actor_id"), 0) AS "threat_level"
+    FROM "merged_actors"
+    JOIN "actors" AS "kept" ON "kept"."actor_id" = "merged_actors"."kept_actor_id"
+    JOIN "actors" AS "duplicate" ON "duplicate"."actor_id" = "merged_actors"."actor_id"
+    GROUP BY "kept"."actor_id"
+) AS "merged"
+WHERE "actors"."actor_id" = "merged"."actor_id";
+DELETE FROM "actors" WHERE "actor_id" IN (SELECT "actor_id" FROM "merged_actors");
+
+DROP INDEX IF EXISTS "actor_host_index";
+CREATE UNIQUE INDEX IF NOT EXISTS "actor_host_unique_index" ON "actors" ("host");
+CREATE INDEX IF NOT EXISTS "request_actor_id_index" ON "requests" ("actor_id");
+CREATE INDEX IF NOT EXISTS "request_path_index" ON "requests" ("path");
+CREATE INDEX IF NOT EXISTS "request_timestamp_index" ON "requests" ("timestamp", "request_id");
+CREATE INDEX IF NOT EXISTS "request_actor_timestamp_index" ON "requests" ("actor_id", "timestamp", "request_id");
+CREATE INDEX IF NOT EXISTS "request_path_timestamp_index" ON "requests" ("path", "timestamp", "request_id");
+CREATE INDEX IF NOT EXISTS "request_flags_version_index" ON "requests" ("flags_version");
+CREATE INDEX IF NOT EXISTS "endpoint_counts_singleton_index" ON "endpoint_counts" ("last_request_id") WHERE "hits" = 1;
+CREATE UNIQUE INDEX IF NOT EXISTS "analysed_request_id_index" ON "analysed_requests" ("request_id");
+CREATE INDEX IF NOT EXISTS "analysis_cache_last_used_index" ON "analysis_cache" ("last_used_at");
+CREATE INDEX IF NOT EXISTS "request_fingerprint_index" ON "requests" ("fingerprint", "timestamp", "request_id");
+CREATE INDEX IF NOT EXISTS "request_unfingerprinted_index" ON "requests" ("request_id") WHERE "fingerprint" IS NULL;
+CREATE INDEX IF NOT EXISTS "fingerprint_actor_count_index" ON "fingerprints" ("actor_count", "fingerprint");
+CREATE INDEX IF NOT EXISTS "fingerprint_request_count_index" ON "fingerprints" ("request_count", "fingerprint");
+CREATE INDEX IF NOT EXISTS "fingerprint_last_seen_index" ON "fingerprints" ("last_seen", "fingerprint");
+CREATE INDEX IF NOT EXISTS "actor_host_trgm_index" ON "actors" USING GIN ("host" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "request_path_trgm_index" ON "requests" USING GIN ("path" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "request_query_string_trgm_index" ON "requests" USING GIN ("query_string" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "request_headers_trgm_index" ON "requests" USING GIN (("headers"::TEXT) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "request_body_trgm_index" ON "requests" USING GIN (("body"::TEXT) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "request_headers_jsonb_index" ON "requests" USING GIN ("headers" jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS "request_body_jsonb_index" ON "requests" USING GIN ("body" jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS "request_method_index" ON "requests" ("method");
@@ -0,0 +1,20 @@
+CREATE TABLE IF NOT EXISTS "authorized_addresses"
+(
+    "address_id" SERIAL PRIMARY KEY,
+    "host"       VARCHAR(255) NOT NULL,
+    "address"    VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS "connect_targets"
+(
+    "connect_target_id" SERIAL PRIMARY KEY,
+    "url"               TEXT NOT NULL,
+    "body"              TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS "authorized_address_host_index" ON "authorized_addresses" ("host");
+CREATE UNIQUE INDEX IF NOT EXISTS "connect_target_url_index" ON "connect_targets" ("url");
+CREATE UNIQUE INDEX IF NOT EXISTS "admin_session_token_index" ON "admin_sessions" ("token");
+CREATE UNIQUE INDEX IF NOT EXISTS "admin_username_index" ON "admins" ("username");
+CREATE UNIQUE INDEX IF NOT EXISTS "admin_key_index" ON "admin_keys" ("key");
+CREATE INDEX IF NOT EXISTS "honeypot_file_name_index" ON "honeypots" ("file_name", "match_type");
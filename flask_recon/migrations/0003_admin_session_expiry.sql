@@ -0,0 +1,6 @@
+ALTER TABLE "admin_sessions" ADD COLUMN IF NOT EXISTS "created_at" TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+-- sessions issued before expiry existed get a full lifetime from now rather than being logged out immediately
+ALTER TABLE "admin_sessions" ADD COLUMN IF NOT EXISTS "expires_at" TIMESTAMP NOT NULL
+    DEFAULT CURRENT_TIMESTAMP + INTERVAL '7 days';
+
+CREATE INDEX IF NOT EXISTS "admin_session_expires_at_index" ON "admin_sessions" ("expires_at");
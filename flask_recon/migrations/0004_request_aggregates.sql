@@ -0,0 +1,13 @@
+-- rate limited requests are counted here per actor, path and minute instead of being stored as full rows
+CREATE TABLE IF NOT EXISTS "request_aggregates"
+(
+    "actor_id" INTEGER      NOT NULL,
+    "path"     VARCHAR(255) NOT NULL,
+    "method"   VARCHAR(255) NOT NULL,
+    "minute"   TIMESTAMP    NOT NULL,
+    "hits"     BIGINT       NOT NULL DEFAULT 0,
+    PRIMARY KEY ("actor_id", "path", "method", "minute"),
+    FOREIGN KEY ("actor_id") REFERENCES "actors" ("actor_id")
+);
+
+CREATE INDEX IF NOT EXISTS "request_aggregate_minute_index" ON "request_aggregates" ("minute");
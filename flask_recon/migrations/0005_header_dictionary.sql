@@ -0,0 +1,48 @@
+-- every distinct header name and value pair is stored once, and requests keep the ids in their original order
+CREATE TABLE IF NOT EXISTS "header_values"
+(
+    "header_id" SERIAL PRIMARY KEY,
+    "name"      TEXT NOT NULL,
+    "value"     TEXT NOT NULL
+);
+
+-- hashed, since scanner payloads in header values can exceed the btree row size limit
+CREATE UNIQUE INDEX IF NOT EXISTS "header_value_unique_index" ON "header_values" (md5("name"), md5("value"));
+CREATE INDEX IF NOT EXISTS "header_value_trgm_index" ON "header_values"
+    USING GIN (("name" || ': ' || "value") gin_trgm_ops);
+
+ALTER TABLE "requests" ADD COLUMN IF NOT EXISTS "header_ids" INTEGER[];
+
+INSERT INTO "header_values" ("name", "value")
+SELECT DISTINCT "header"."key", "header"."value"
+FROM "requests",
+     jsonb_each_text(CASE WHEN jsonb_typeof("requests"."headers") = 'object' THEN "requests"."headers"
+                          ELSE '{}' END) AS "header"
+ON CONFLICT DO NOTHING;
+
+UPDATE "requests" SET "header_ids" = (
+    SELECT COALESCE(array_agg("header_values"."header_id" ORDER BY "header"."position"), '{}')
+    FROM jsonb_each_text(CASE WHEN jsonb_typeof("requests"."headers") = 'object' THEN "requests"."headers"
+                              ELSE '{}' END) WITH ORDINALITY AS "header" ("name", "value", "position")
+    JOIN "header_values" ON md5("header_values"."name") = md5("header"."name")
+                        AND md5("header_values"."value") = md5("header"."value")
+)
+WHERE "headers" IS NOT NULL AND jsonb_typeof("headers") <> 'null';
+
+-- dropping the column takes its trigram and jsonb indexes with it
+ALTER TABLE "requests" DROP COLUMN IF EXISTS "headers";
+
+CREATE INDEX IF NOT EXISTS "request_header_ids_index" ON "requests" USING GIN ("header_ids");
+
+-- decodes header_ids back into the JSON text the headers column used to hold, with the original order
+CREATE OR REPLACE FUNCTION "request_headers"(INTEGER[]) RETURNS TEXT
+    LANGUAGE SQL STABLE PARALLEL SAFE AS
+$$
+SELECT CASE
+           WHEN $1 IS NULL THEN 'null'
+           ELSE COALESCE(json_object_agg("header_values"."name", "header_values"."value"
+                                         ORDER BY "ids"."position")::TEXT, '{}')
+           END
+FROM unnest($1) WITH ORDINALITY AS "ids" ("header_id", "position")
+JOIN "header_values" ON "header_values"."header_id" = "ids"."header_id"
+$$;
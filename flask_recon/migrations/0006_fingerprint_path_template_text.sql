@@ -0,0 +1,2 @@
+-- placeholders such as {int} make a template longer than the path it came from, so it can outgrow the request path
+ALTER TABLE "fingerprints" ALTER COLUMN "path_template" TYPE TEXT;
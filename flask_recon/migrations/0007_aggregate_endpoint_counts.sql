@@ -0,0 +1,5 @@
+-- a path can be counted only through request_aggregates, and then has no stored row to point at
+ALTER TABLE "endpoint_counts" ALTER COLUMN "last_request_id" DROP NOT NULL;
+
+CREATE INDEX IF NOT EXISTS "request_aggregate_path_index" ON "request_aggregates" ("path", "actor_id");
+CREATE INDEX IF NOT EXISTS "request_aggregate_actor_index" ON "request_aggregates" ("actor_id", "hits");
@@ -0,0 +1,132 @@
+from collections import defaultdict
+from json import loads, dumps
+from os import makedirs, replace
+from os.path import isfile, join
+from sys import argv
+from typing import List, Tuple, Any, Dict
+
+from database_util import CONNECTION_PARAMS
+from flask_recon.database import DatabaseHandler
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa, pq = None, None
+
+STATE_FILE = "_export_state.json"
+EXPORT_SCHEMA = None if pa is None else pa.schema([
+    ("request_id", pa.int32()),
+    ("actor_id", pa.int32()),
+    ("host", pa.dictionary(pa.int32(), pa.string())),
+    ("timestamp", pa.timestamp("us")),
+    ("method", pa.dictionary(pa.int8(), pa.string())),
+    ("path", pa.string()),
+    ("query_string", pa.string()),
+    ("headers", pa.map_(pa.string(), pa.string())),
+    ("body", pa.string()),
+    ("port", pa.int32()),
+    ("acceptable", pa.bool_()),
+    ("threat_level", pa.int8()),
+    ("request_types", pa.list_(pa.string())),
+    ("attack_types", pa.list_(pa.string())),
+    ("matched_flags", pa.list_(pa.string())),
+    ("flags_version", pa.string()),
+])
+
+
+class ParquetExporter:
+    _database_handler: DatabaseHandler
+    _output_directory: str
+    _batch_size: int
+
+    def __init__(self, connection_params: Dict[str, Any], output_directory: str, batch_size: int = 100_000):
+        if pa is None:
+            raise ImportError("pyarrow is required for Parquet export. Install it with pip install pyarrow.")
+
+        self._database_handler = DatabaseHandler(**connection_params)
+        self._output_directory = output_directory
+        self._batch_size = batch_size
+
+    @property
+    def state_file(self) -> str:
+        return join(self._output_directory, STATE_FILE)
+
+    def load_last_request_id(self) -> int:
+        if not isfile(self.state_file):
+            return 0
+        return loads(open(self.state_file).read()).get("last_request_id", 0)
+
+    def save_last_request_id(self, last_request_id: int) -> None:
+        with open(f"{self.state_file}.tmp", "w") as f:
+            f.write(dumps({"last_request_id": last_request_id}))
+        replace(f"{self.state_file}.tmp", self.state_file)
+
+    @staticmethod
+    def to_columns(rows: List[Tuple[Any, ...]]) -> Dict[str, List[Any]]:
+        headers = [loads(row[4]) or {} for row in rows]
+        return {
+            "request_id": [row[10] for row in rows],
+            "actor_id": [row[0] for row in rows],
+            "host": [row[9] for row in rows],
+            "timestamp": [row[1] for row in rows],
+            "method": [row[2] for row in rows],
+            "path": [row[8] for row in rows],
+            "query_string": [row[5] for row in rows],
+            "headers": [[(str(k), str(v)) for k, v in h.items()] for h in headers],
+            "body": [row[3] for row in rows],
+            "port": [row[6] for row in rows],
+            "acceptable": [row[15] for row in rows],
+            "threat_level": [row[7] for row in rows],
+            "request_types": [row[11] for row in rows],
+            "attack_types": [row[12] for row in rows],
+            "matched_flags": [row[13] for row in rows],
+            "flags_version": [row[14] for row in rows],
+        }
+
+    def write_batch(self, rows: List[Tuple[Any, ...]]) -> None:
+        partitions: Dict[str, List[Tuple[Any, ...]]] = defaultdict(list)
+        for row in rows:
+            partitions[row[1].date().isoformat()].append(row)
+
+        for day, day_rows in partitions.items():
+            directory = join(self._output_directory, f"date={day}")
+            makedirs(directory, exist_ok=True)
+            # file names carry the request_id range, so re-running after an interruption overwrites, not duplicates
+            file_name = f"part-{day_rows[0][10]}-{day_rows[-1][10]}.parquet"
+            table = pa.Table.from_pydict(self.to_columns(day_rows), schema=EXPORT_SCHEMA)
+            pq.write_table(table, join(directory, file_name), compression="zstd")
+
+    def run(self) -> int:
+        makedirs(self._output_directory, exist_ok=True)
+        last_request_id, total = self.load_last_request_id(), 0
+        # only ids that can no longer be committed out of order are exported, since the checkpoint never goes back
+        if (settled_request_id := self._database_handler.get_settled_request_id()) is None:
+            print("Writers did not settle in time, nothing exported.")
+            return 0
+
+        for rows in self._database_handler.stream_requests(self._batch_size, after_request_id=last_request_id,
+                                                           until_request_id=settled_request_id):
+            self.write_batch(rows)
+            self.save_last_request_id(rows[-1][10])
+            total += len(rows)
+            print(f"Exported {total} requests.")
+        return total
+
+
+if __name__ == '__main__':
+    if not 2 <= len(argv) <= 3:
+        print("Usage: python -m flask_recon.parquet_export <output_directory> [Optional[batch_size]]")
+        exit(1)
+
+    try:
+        batch_size = int(argv[2]) if len(argv) == 3 else 100_000
+    except ValueError:
+        print("Batch size must be an integer.")
+        exit(1)
+
+    ParquetExporter(
+        connection_params=CONNECTION_PARAMS,
+        output_directory=argv[1],
+        batch_size=batch_size
+    ).run()
@@ -0,0 +1,194 @@
+from abc import ABC, abstractmethod
+from base64 import b64encode, b64decode
+from binascii import Error as Base64Error
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import scrypt, pbkdf2_hmac, sha256
+from hmac import compare_digest
+from os import urandom, cpu_count
+from statistics import quantiles, median
+from sys import argv
+from time import perf_counter
+from typing import Optional, List, Callable, Any
+
+from flask_recon.database import DatabaseHandler
+
+try:
+    # monkey-patched threads are greenlets, so hashing has to go to gevent's pool of real threads instead
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+except ImportError:
+    get_hub, is_module_patched = None, None
+
+SALT_SIZE = 16
+
+
+class KeyDerivationFunction(ABC):
+    name: str
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        ...
+
+    @abstractmethod
+    def verify(self, password: str, encoded: str) -> bool:
+        ...
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return True
+
+    def handles(self, encoded: str) -> bool:
+        return encoded.startswith(f"{self.name}$")
+
+
+class Scrypt(KeyDerivationFunction):
+    name = "scrypt"
+    _n: int
+    _r: int
+    _p: int
+    _key_size: int
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1, key_size: int = 32):
+        self._n = n
+        self._r = r
+        self._p = p
+        self._key_size = key_size
+
+    @staticmethod
+    def derive(password: str, salt: bytes, n: int, r: int, p: int, key_size: int) -> bytes:
+        # maxmem is sized to the parameters, since scrypt needs 128 * n * r bytes of working memory
+        return scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=key_size, maxmem=256 * n * r)
+
+    def hash(self, password: str) -> str:
+        salt = urandom(SALT_SIZE)
+        key = self.derive(password, salt, self._n, self._r, self._p, self._key_size)
+        return f"{self.name}${self._n}${self._r}${self._p}${b64encode(salt).decode()}${b64encode(key).decode()}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        try:
+            _, n, r, p, salt, key = encoded.split("$")
+            key = b64decode(key)
+            return compare_digest(self.derive(password, b64decode(salt), int(n), int(r), int(p), len(key)), key)
+        except (ValueError, Base64Error):
+            return False
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return not encoded.startswith(f"{self.name}${self._n}${self._r}${self._p}$")
+
+
+class Pbkdf2(KeyDerivationFunction):
+    name = "pbkdf2_sha256"
+    _iterations: int
+
+    def __init__(self, iterations: int = 600_000):
+        self._iterations = iterations
+
+    def hash(self, password: str) -> str:
+        salt = urandom(SALT_SIZE)
+        key = pbkdf2_hmac("sha256", password.encode(), salt, self._iterations)
+        return f"{self.name}${self._iterations}${b64encode(salt).decode()}${b64encode(key).decode()}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        try:
+            _, iterations, salt, key = encoded.split("$")
+            return compare_digest(pbkdf2_hmac("sha256", password.encode(), b64decode(salt), int(iterations)),
+                                  b64decode(key))
+        except (ValueError, Base64Error):
+            return False
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return not encoded.startswith(f"{self.name}${self._iterations}$")
+
+
+class LegacySha256(KeyDerivationFunction):
+    # the unsalted digests stored before the KDF layer existed; only ever verified, then rehashed on login
+    name = "sha256"
+
+    def hash(self, password: str) -> str:
+        raise ValueError("Unsalted sha256 hashes are only accepted for verification.")
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return compare_digest(sha256(password.encode()).hexdigest(), encoded)
+
+    def handles(self, encoded: str) -> bool:
+        return len(encoded) == 64 and "$" not in encoded
+
+
+class PasswordHasher:
+    _kdf: KeyDerivationFunction
+    _verifiers: List[KeyDerivationFunction]
+    _executor: ThreadPoolExecutor
+    _dummy_hash: str
+
+    def __init__(self, kdf: Optional[KeyDerivationFunction] = None, workers: int = min(4, cpu_count() or 1)):
+        self._kdf = kdf or Scrypt()
+        self._verifiers = [self._kdf, Scrypt(), Pbkdf2(), LegacySha256()]
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flask-recon-passwords")
+        # unknown usernames are verified against this, so a miss costs the same as a wrong password
+        self._dummy_hash = self._kdf.hash(urandom(SALT_SIZE).hex())
+
+    def _run(self, func: Callable[..., Any], *args) -> Any:
+        if is_module_patched is not None and is_module_patched("threading"):
+            return get_hub().threadpool.spawn(func, *args).get()
+        return self._executor.submit(func, *args).result()
+
+    def hash(self, password: str) -> str:
+        return self._run(self._kdf.hash, password)
+
+    def verify(self, password: str, encoded: str) -> bool:
+        for kdf in self._verifiers:
+            if kdf.handles(encoded):
+                return self._run(kdf.verify, password, encoded)
+        return False
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return not self._kdf.handles(encoded) or self._kdf.needs_rehash(encoded)
+
+    def authenticate(self, database_handler: DatabaseHandler, username: str, password: str) -> bool:
+        encoded = database_handler.get_admin_password(username)
+        if encoded is None:
+            self.verify(password, self._dummy_hash)
+            return False
+
+        if not self.verify(password, encoded):
+            return False
+        if self.needs_rehash(encoded):
+            database_handler.update_admin_password(username, self.hash(password))
+        return True
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    if not 1 <= len(argv) <= 2:
+        print("Usage: python -m flask_recon.passwords [Optional[runs]]")
+        exit(1)
+
+    try:
+        runs = int(argv[1]) if len(argv) > 1 else 20
+    except ValueError:
+        print("Runs must be an integer.")
+        exit(1)
+
+    candidates: List[KeyDerivationFunction] = [
+        *[Scrypt(n=2 ** exponent) for exponent in range(13, 18)],
+        *[Pbkdf2(iterations=iterations) for iterations in (200_000, 600_000, 1_200_000)],
+    ]
+    workers = min(4, cpu_count() or 1)
+    print(f"{'kdf':<40} {'p50 ms':>9} {'p95 ms':>9} {f'logins/s x{workers}':>14}")
+    for candidate in candidates:
+        encoded = candidate.hash("benchmark-password")
+        latencies = []
+        for _ in range(runs):
+            started = perf_counter()
+            candidate.verify("benchmark-password", encoded)
+            latencies.append((perf_counter() - started) * 1000)
+
+        # hashlib releases the GIL while deriving, so throughput should scale with the pool
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            started = perf_counter()
+            list(executor.map(lambda _: candidate.verify("benchmark-password", encoded), range(runs)))
+            throughput = runs / (perf_counter() - started)
+
+        print(f"{encoded.rsplit('$', 2)[0]:<40} {median(latencies):>9.2f} {quantiles(latencies, n=100)[94]:>9.2f} "
+              f"{throughput:>14.1f}")
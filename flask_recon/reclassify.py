@@ -0,0 +1,126 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from json import loads, dumps
+from os import cpu_count, replace, remove
+from os.path import isfile
+from sys import argv
+from typing import List, Tuple, Any, Deque, Dict, Set
+
+from database_util import CONNECTION_PARAMS
+from flask_recon.database import DatabaseHandler
+from flask_recon.flags import KNOWN_FLAGS
+from flask_recon.structures import IncomingRequest, RequestMethod
+
+CHECKPOINT_FILE = "reclassify.checkpoint"
+
+
+def classify_batch(rows: List[Tuple[Any, ...]]) -> List[Tuple[Any, ...]]:
+    classifications = []
+    for row in rows:
+        # the method is rebuilt as an enum so scoring matches what insert_request computed at ingest
+        request = IncomingRequest(row[6]).from_components(
+            host=row[9],
+            timestamp=row[1],
+            request_method=RequestMethod.from_str(row[2]),
+            request_body=loads(row[3]),
+            request_headers=loads(row[4]),
+            query_string=row[5],
+            request_uri=row[8],
+            request_id=row[10],
+        )
+        request.determine_threat_level()
+        classifications.append((request.request_id, request.threat_level,
+                                [t.value for t in request.request_types], [t.value for t in request.attack_types],
+                                request.matched_flags, request.flags_version))
+    return classifications
+
+
+class Reclassifier:
+    _reader: DatabaseHandler
+    _writer: DatabaseHandler
+    _batch_size: int
+    _workers: int
+    _checkpoint_file: str
+    _reclassify_all: bool
+    _actor_ids: Set[int]
+
+    def __init__(self, connection_params: Dict[str, Any], batch_size: int = 5000, workers: int = cpu_count() or 1,
+                 checkpoint_file: str = CHECKPOINT_FILE, reclassify_all: bool = False):
+        self._reader = DatabaseHandler(**connection_params)
+        self._writer = DatabaseHandler(**connection_params)
+        self._batch_size = batch_size
+        self._workers = workers
+        self._checkpoint_file = checkpoint_file
+        self._reclassify_all = reclassify_all
+        self._actor_ids = set()
+
+    def load_checkpoint(self) -> int:
+        if not isfile(self._checkpoint_file):
+            return 0
+
+        checkpoint = loads(open(self._checkpoint_file).read())
+        if checkpoint.get("flags_version") != KNOWN_FLAGS.version:
+            return 0
+        last_request_id = checkpoint.get("last_request_id", 0)
+        # only the position is checkpointed, so the actors touched before it are recovered from the table instead
+        self._actor_ids = set(self._reader.get_actor_ids_until(last_request_id))
+        return last_request_id
+
+    def save_checkpoint(self, last_request_id: int) -> None:
+        # written to a temporary file first so an interrupted write never leaves a corrupt checkpoint
+        with open(f"{self._checkpoint_file}.tmp", "w") as f:
+            f.write(dumps({"flags_version": KNOWN_FLAGS.version, "last_request_id": last_request_id}))
+        replace(f"{self._checkpoint_file}.tmp", self._checkpoint_file)
+
+    def write_back(self, rows: List[Tuple[Any, ...]], future: "Future[List[Tuple[Any, ...]]]") -> int:
+        self._writer.update_request_classifications(future.result())
+        # heavy actors appear in every batch, so their averages are recomputed once at the end rather than per batch
+        self._actor_ids.update(row[0] for row in rows)
+        self.save_checkpoint(rows[-1][10])
+        return len(rows)
+
+    def update_actors(self) -> None:
+        actor_ids = sorted(self._actor_ids)
+        for i in range(0, len(actor_ids), self._batch_size):
+            self._writer.update_actor_threat_levels(actor_ids[i:i + self._batch_size])
+
+    def run(self) -> int:
+        after_request_id = self.load_checkpoint()
+        stale_version = None if self._reclassify_all else KNOWN_FLAGS.version
+        in_flight: Deque[Tuple[List[Tuple[Any, ...]], Future]] = deque()
+        total = 0
+        with ProcessPoolExecutor(max_workers=self._workers) as executor:
+            for rows in self._reader.stream_requests(self._batch_size, after_request_id, stale_version):
+                in_flight.append((rows, executor.submit(classify_batch, rows)))
+                # batches are written back in order so the checkpoint only ever covers completed work
+                while len(in_flight) >= self._workers * 2:
+                    total += self.write_back(*in_flight.popleft())
+                    print(f"Reclassified {total} requests.")
+            while in_flight:
+                total += self.write_back(*in_flight.popleft())
+        self.update_actors()
+        if isfile(self._checkpoint_file):
+            remove(self._checkpoint_file)
+        print(f"Reclassified {total} requests.")
+        return total
+
+
+if __name__ == '__main__':
+    if not 1 <= len(argv) <= 4:
+        print("Usage: python -m flask_recon.reclassify [Optional[batch_size]] [Optional[workers]] [Optional[all]]")
+        exit(1)
+
+    numeric_args = [arg for arg in argv[1:] if arg != "all"]
+    try:
+        batch_size = int(numeric_args[0]) if len(numeric_args) > 0 else 5000
+        workers = int(numeric_args[1]) if len(numeric_args) > 1 else cpu_count() or 1
+    except ValueError:
+        print("Batch size and workers must be integers.")
+        exit(1)
+
+    Reclassifier(
+        connection_params=CONNECTION_PARAMS,
+        batch_size=batch_size,
+        workers=workers,
+        reclassify_all="all" in argv
+    ).run()
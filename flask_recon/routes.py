@@ -1,11 +1,55 @@
 from datetime import datetime
-from typing import List, Dict, Callable, Tuple
+from functools import wraps
+from json import loads
+from typing import List, Dict, Callable, Tuple, Optional, Iterator
+from zlib import compressobj
 
 from flask import request, render_template, Response, redirect
 
-from flask_recon import Listener, RemoteHost, IncomingRequest
+from flask_recon import Listener, RemoteHost, IncomingRequest, PageCursor
+from flask_recon.database import DEFAULT_PAGE_SIZE, SESSION_LIFETIME
 
 BASE_DIRECTORY = "flask-recon"
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 2000
+GZIP_WBITS = 31
+SESSION_COOKIE = "X-Session-Token"
+
+
+def page_args() -> Tuple[int, Optional[PageCursor]]:
+    limit = max(1, min(request.args.get("limit", DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    token = request.args.get("page")
+    return limit, PageCursor.decode(token) if token else None
+
+
+def offset_args(default_limit: int = 100) -> Tuple[int, int]:
+    limit = max(1, min(request.args.get("limit", default_limit, type=int), MAX_PAGE_SIZE))
+    offset = max(0, request.args.get("offset", 0, type=int))
+    return limit, offset
+
+
+def request_page(requests: List[IncomingRequest], next_cursor: Optional[PageCursor]) -> dict:
+    return {
+        "requests": [req.as_dict for req in requests],
+        "next_page": next_cursor.encode() if next_cursor else None,
+    }
+
+
+def admin_required(func):
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        token = request.cookies.get(SESSION_COOKIE)
+        if not token or not self._listener.sessions.validate(self._listener.database_handler, token):
+            return "Unauthorized", 401
+        return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+def session_response(token: str) -> Response:
+    response = redirect(f"/{BASE_DIRECTORY}")
+    response.set_cookie(SESSION_COOKIE, token, max_age=int(SESSION_LIFETIME.total_seconds()))
+    return response
 
 
 class Api:
@@ -15,22 +59,62 @@ class Api:
         self._listener = listener
 
     def all_endpoints(self):
-        return self._listener.database_handler.get_all_endpoints()
+        limit, offset = offset_args()
+        return self._listener.database_handler.get_all_endpoints(
+            limit=limit,
+            offset=offset,
+            min_count=request.args.get("min_count", 1, type=int)
+        )
 
     def all_hosts(self):
-        return self._listener.database_handler.get_remote_hosts()
+        limit, offset = offset_args()
+        try:
+            return self._listener.database_handler.get_remote_hosts(
+                limit=limit,
+                offset=offset,
+                sort_by=request.args.get("sort_by", "total"),
+                descending=request.args.get("order", "desc") != "asc"
+            )
+        except ValueError:
+            return "Invalid sort_by parameter", 400
 
     def hosts_by_endpoint(self):
         endpoint = request.args.get("endpoint")
-        return self._listener.database_handler.get_hosts_by_endpoint(endpoint)
+        if endpoint is None:
+            return "Missing endpoint parameter", 400
+
+        limit, offset = offset_args()
+        try:
+            return self._listener.database_handler.get_hosts_by_endpoint(
+                endpoint,
+                limit=limit,
+                offset=offset,
+                sort_by=request.args.get("sort_by", "requests"),
+                descending=request.args.get("order", "desc") != "asc"
+            )
+        except ValueError:
+            return "Invalid sort_by parameter", 400
 
     def requests_by_endpoint(self):
         endpoint = request.args.get("endpoint")
-        return self._listener.database_handler.get_requests(endpoint)
+        if endpoint is None:
+            return "Missing endpoint parameter", 400
+        try:
+            limit, cursor = page_args()
+        except ValueError:
+            return "Invalid page parameter", 400
+        return request_page(*self._listener.database_handler.get_requests(endpoint, limit=limit, cursor=cursor))
 
     def requests_by_host(self):
         host = request.args.get("host")
-        return self._listener.database_handler.get_requests(host=RemoteHost(host))
+        if host is None:
+            return "Missing host parameter", 400
+        try:
+            limit, cursor = page_args()
+        except ValueError:
+            return "Invalid page parameter", 400
+        return request_page(*self._listener.database_handler.get_requests(host=RemoteHost(host), limit=limit,
+                                                                          cursor=cursor))
 
     @property
     def routes(self) -> Dict[str, Tuple[Callable, List[str]]]:
@@ -50,24 +134,50 @@ class WebApp:
         self._listener = listener
 
     def view_endpoints(self):
+        limit, offset = offset_args()
+        min_count = request.args.get("min_count", 1, type=int)
         return render_template("flask-recon/view_endpoints.html",
-                               endpoints=self._listener.database_handler.get_all_endpoints())
+                               endpoints=self._listener.database_handler.get_all_endpoints(limit, offset, min_count),
+                               limit=limit, offset=offset, min_count=min_count)
 
     def view_hosts(self):
-        return render_template("flask-recon/view_hosts.html", hosts=self._listener.database_handler.get_remote_hosts())
+        limit, offset = offset_args()
+        sort_by = request.args.get("sort_by", "total")
+        order = request.args.get("order", "desc")
+        try:
+            hosts = self._listener.database_handler.get_remote_hosts(limit, offset, sort_by, order != "asc")
+        except ValueError:
+            return "Invalid sort_by parameter", 400
+        return render_template("flask-recon/view_hosts.html", hosts=hosts, limit=limit, offset=offset,
+                               sort_by=sort_by, order=order)
 
     def html_hosts_by_endpoint(self):
         endpoint = request.args.get("endpoint")
-        return render_template("flask-recon/hosts_by_endpoint.html",
-                               hosts=self._listener.database_handler.get_hosts_by_endpoint(endpoint),
-                               endpoint=endpoint)
+        if endpoint is None:
+            return "Missing endpoint parameter", 400
+
+        limit, offset = offset_args()
+        sort_by = request.args.get("sort_by", "requests")
+        order = request.args.get("order", "desc")
+        try:
+            hosts = self._listener.database_handler.get_hosts_by_endpoint(endpoint, limit, offset, sort_by,
+                                                                          order != "asc")
+        except ValueError:
+            return "Invalid sort_by parameter", 400
+        return render_template("flask-recon/hosts_by_endpoint.html", hosts=hosts, endpoint=endpoint, limit=limit,
+                               offset=offset, sort_by=sort_by, order=order)
 
     def html_requests_by_endpoint(self):
         endpoint = request.args.get("endpoint")
-        requests = self._listener.database_handler.get_requests(endpoint=endpoint)
-        self.update_tls(requests)
+        try:
+            limit, cursor = page_args()
+        except ValueError:
+            return "Invalid page parameter", 400
+
+        requests, next_cursor = self._listener.database_handler.get_requests(endpoint=endpoint, limit=limit,
+                                                                             cursor=cursor)
         return render_template("flask-recon/view_requests.html", requests=requests, endpoint=endpoint,
-                               title=f"Requests to {endpoint}")
+                               title=f"Requests to {endpoint}", next_page=next_cursor.encode() if next_cursor else None)
 
     def html_requests_by_host(self):
         host = request.args.get("host")
@@ -76,14 +186,15 @@ class WebApp:
 
         endpoint = request.args.get("endpoint")
         remote_host = RemoteHost(host)
+        try:
+            limit, cursor = page_args()
+        except ValueError:
+            return "Invalid page parameter", 400
 
-        if endpoint is not None:
-            requests = self._listener.database_handler.get_requests(endpoint=endpoint, host=remote_host)
-        else:
-            requests = self._listener.database_handler.get_requests(host=remote_host)
-
-        self.update_tls(requests)
-        return render_template("flask-recon/view_requests.html", requests=requests, host=host, title=f"Requests from {host}")
+        requests, next_cursor = self._listener.database_handler.get_requests(endpoint=endpoint, host=remote_host,
+                                                                             limit=limit, cursor=cursor)
+        return render_template("flask-recon/view_requests.html", requests=requests, host=host, title=f"Requests from {host}",
+                               next_page=next_cursor.encode() if next_cursor else None)
 
     def html_search(self):
         if any([
@@ -96,12 +207,41 @@ class WebApp:
         ]):
             case_sensitive = request.args.get("case_sensitive") == "on"
             all_must_match = request.args.get("all_must_match") == "on"
-            results = self._listener.database_handler.search(method=method, all_must_match=all_must_match,
-                                                             uri=uri, host=host, query_string=query_string, body=body,
-                                                             case_sensitive=case_sensitive, headers=headers)
-            return render_template("flask-recon/search.html", requests=results)
+            try:
+                limit, cursor = page_args()
+            except ValueError:
+                return "Invalid page parameter", 400
+            results, next_cursor = self._listener.database_handler.search(
+                method=method, all_must_match=all_must_match, uri=uri, host=host, query_string=query_string,
+                body=body, case_sensitive=case_sensitive, headers=headers, limit=limit, cursor=cursor)
+            return render_template("flask-recon/search.html", requests=results,
+                                   next_page=next_cursor.encode() if next_cursor else None)
         return render_template("flask-recon/search.html")
 
+    def campaigns(self):
+        limit, offset = offset_args(DEFAULT_PAGE_SIZE)
+        try:
+            return self._listener.database_handler.get_campaigns(
+                limit=limit,
+                offset=offset,
+                sort_by=request.args.get("sort_by", "actors"),
+                descending=request.args.get("order", "desc") != "asc",
+                min_actors=request.args.get("min_actors", 1, type=int)
+            )
+        except ValueError:
+            return "Invalid sort_by parameter", 400
+
+    def campaign_requests(self):
+        fingerprint = request.args.get("fingerprint")
+        if fingerprint is None:
+            return "Missing fingerprint parameter", 400
+        try:
+            limit, cursor = page_args()
+        except ValueError:
+            return "Invalid page parameter", 400
+        return request_page(*self._listener.database_handler.get_campaign_requests(fingerprint, limit=limit,
+                                                                                  cursor=cursor))
+
     def csv_request_dump(self):
         request_id = request.args.get("request_id")
         if request_id is None:
@@ -115,25 +255,20 @@ class WebApp:
             return "Invalid request_id parameter", 400
 
     def home(self):
-        try:
-            last_actor, last_actor_time = self._listener.database_handler.get_last_actor()
-        except TypeError:
-            last_actor, last_actor_time = None, None
-        last_method, last_endpoint, last_threat_level = self._listener.database_handler.get_last_endpoint()
-        time_between_requests = self._listener.database_handler.get_average_time_between_requests()
-        last_request_time = self._listener.database_handler.get_last_request_time()
-        time_since_last_request = datetime.now() - last_request_time
+        stats = self._listener.dashboard_stats.get(self._listener.database_handler)
+        last_method, last_endpoint, last_threat_level = stats["last_endpoint"]
+        time_since_last_request = datetime.now() - stats["last_request_time"]
         return render_template(
             "flask-recon/home.html",
-            total_requests=self._listener.database_handler.get_request_count(),
-            total_endpoints=self._listener.database_handler.get_endpoint_count(),
-            total_actors=self._listener.database_handler.get_actor_count(),
+            total_requests=stats["total_requests"],
+            total_endpoints=stats["total_endpoints"],
+            total_actors=stats["total_actors"],
             time_since_last_request=self.parse_time(str(time_since_last_request)),
             last_endpoint=last_endpoint,
-            last_actor_time=last_actor_time,
+            last_actor_time=stats["last_actor_time"],
             last_request_method=last_method,
-            time_between_requests=self.parse_time(str(time_between_requests)),
-            last_actor=last_actor
+            time_between_requests=self.parse_time(str(stats["time_between_requests"])),
+            last_actor=stats["last_actor"]
         )
 
     def register(self):
@@ -152,11 +287,8 @@ class WebApp:
         if self._listener.database_handler.username_exists(username):
             return "Username already exists", 400
 
-        self._listener.database_handler.add_admin(username, password)
-        session_token = self._listener.database_handler.generate_admin_session_token(username)
-        response = redirect(f"/{BASE_DIRECTORY}")
-        response.set_cookie("X-Session-Token", session_token)
-        return response
+        self._listener.database_handler.add_admin(username, self._listener.passwords.hash(password))
+        return session_response(self._listener.sessions.create(self._listener.database_handler, username))
 
     def login(self):
         if request.method == "GET":
@@ -167,50 +299,98 @@ class WebApp:
         if not username or not password:
             return "Missing username or password", 400
 
-        if not self._listener.database_handler.validate_admin_credentials(username, password):
+        if not self._listener.passwords.authenticate(self._listener.database_handler, username, password):
             return "Invalid username or password", 400
 
-        session_token = self._listener.database_handler.generate_admin_session_token(username)
+        return session_response(self._listener.sessions.create(self._listener.database_handler, username))
 
+    def logout(self):
+        if token := request.cookies.get(SESSION_COOKIE):
+            self._listener.sessions.revoke(self._listener.database_handler, token)
         response = redirect(f"/{BASE_DIRECTORY}")
-        response.set_cookie("X-Session-Token", session_token)
+        response.delete_cookie(SESSION_COOKIE)
         return response
 
+    @admin_required
     def analyse_request(self):
-        session_cookie = request.cookies.get("X-Session-Token")
-        if not session_cookie or not self._listener.database_handler.validate_session_token(session_cookie):
-            return "Unauthorized", 401
-
         request_id = request.args.get("request_id")
         if request_id is None:
             return "Missing request_id parameter", 400
 
         try:
-            req = self._listener.database_handler.get_request(int(request_id))
-            if req is None:
-                return "Request not found", 404
-            return self._listener.request_analyser.analyse_request(req)
+            request_id = int(request_id)
         except ValueError:
             return "Invalid request_id parameter", 400
 
+        if (analysis := self._listener.database_handler.get_request_analysis(request_id)) is not None:
+            return loads(analysis)
+
+        pipeline = self._listener.analysis_pipeline
+        if pipeline is not None and request.args.get("queue") == "on":
+            return ("Analysis queued", 202) if pipeline.submit(request_id) else ("Analysis queue is full", 503)
+
+        req = self._listener.database_handler.get_request(request_id)
+        if req is None:
+            return "Request not found", 404
+        analysis = self._listener.analysis_cache.analyse(self._listener.database_handler,
+                                                         self._listener.request_analyser, req)
+        self._listener.database_handler.insert_request_analysis(request_id, analysis)
+        return loads(analysis)
+
     def csv_actor_dump(self):
         host = request.args.get("host")
         if host is None:
             return "Missing host parameter", 400
+
+        actor_id = self._listener.database_handler.get_actor_id(RemoteHost(host))
+        if actor_id == -1:
+            return "Actor not found", 404
+        return self.export_response(
+            self.stream_csv(compress=False, actor_id=actor_id),
+            headers={
+                "Content-Type": "text/csv",
+                "Content-Disposition": f"attachment; filename=actor-{actor_id}.csv"
+            }
+        )
+
+    @admin_required
+    def csv_export(self):
         try:
-            actor_id = self._listener.database_handler.get_actor_id(RemoteHost(host))
-            actor_requests = self._listener.database_handler.search(actor_id=int(actor_id))
-            if not actor_requests:
-                return "Actor not found", 404
-            return Response(
-                f"{actor_requests[0].csv_headers}\n" + "\n".join([req.as_csv for req in actor_requests]),
-                headers={
-                    "Content-Type": "text/csv",
-                    "Content-Disposition": f"attachment; filename=actor-{actor_id}.csv"
-                }
-            )
+            start, end = [datetime.fromisoformat(value) if (value := request.args.get(key)) else None
+                          for key in ["start", "end"]]
         except ValueError:
-            return "Invalid actor_id parameter", 400
+            return "Invalid start or end parameter", 400
+        compress = request.args.get("gzip") == "on"
+        headers = {
+            "Content-Type": "application/gzip" if compress else "text/csv",
+            "Content-Disposition": f"attachment; filename=requests.csv{'.gz' if compress else ''}"
+        }
+        return self.export_response(
+            self.stream_csv(compress=compress, start=start, end=end, endpoint=request.args.get("endpoint"),
+                            min_threat_level=request.args.get("threat_level", type=int)),
+            headers=headers
+        )
+
+    def export_response(self, stream: Iterator[bytes], headers: Dict[str, str]):
+        if not self._listener.reserve_export():
+            return "Too many exports in progress", 503
+
+        # released on close rather than when the stream ends, since a HEAD response never starts the stream
+        response = Response(stream, headers=headers)
+        response.call_on_close(self._listener.release_export)
+        return response
+
+    def stream_csv(self, compress: bool, **filters) -> Iterator[bytes]:
+        # rows are pulled through a server-side cursor, so memory is bounded by the export batch size
+        compressor = compressobj(wbits=GZIP_WBITS) if compress else None
+        with self._listener.dedicated_database_connection() as database_handler:
+            header = f"{IncomingRequest(0).csv_headers}\n".encode()
+            yield compressor.compress(header) if compressor else header
+            for batch in database_handler.export_requests(batch_size=EXPORT_BATCH_SIZE, **filters):
+                chunk = "".join(f"{req.csv_row}\n" for req in batch).encode()
+                yield compressor.compress(chunk) if compressor else chunk
+        if compressor:
+            yield compressor.flush()
 
     @staticmethod
     def parse_time(t: str) -> str:
@@ -224,11 +404,6 @@ class WebApp:
     def favicon():
         return open("favicon.ico", "rb").read(), 200
 
-    @staticmethod
-    def update_tls(reqs: List[IncomingRequest]):
-        for req in reqs:
-            req.determine_threat_level()
-
     @property
     def routes(self) -> Dict[str, Tuple[Callable, List[str]]]:
         return {
@@ -239,10 +414,14 @@ class WebApp:
             f"/{BASE_DIRECTORY}/requests-by-endpoint": (self.html_requests_by_endpoint, ["GET"]),
             f"/{BASE_DIRECTORY}/requests-by-host": (self.html_requests_by_host, ["GET"]),
             f"/{BASE_DIRECTORY}/search": (self.html_search, ["GET"]),
+            f"/{BASE_DIRECTORY}/campaigns": (self.campaigns, ["GET"]),
+            f"/{BASE_DIRECTORY}/campaign-requests": (self.campaign_requests, ["GET"]),
             f"/{BASE_DIRECTORY}/csv-request-dump": (self.csv_request_dump, ["GET"]),
             f"/{BASE_DIRECTORY}/csv-actor-dump": (self.csv_actor_dump, ["GET"]),
+            f"/{BASE_DIRECTORY}/csv-export": (self.csv_export, ["GET"]),
             f"/{BASE_DIRECTORY}/register": (self.register, ["GET", "POST"]),
             f"/{BASE_DIRECTORY}/login": (self.login, ["GET", "POST"]),
+            f"/{BASE_DIRECTORY}/logout": (self.logout, ["POST"]),
             f"/{BASE_DIRECTORY}/analyse-request": (self.analyse_request, ["GET"]),
             "/favicon.ico": (self.favicon, ["GET"]),
         }
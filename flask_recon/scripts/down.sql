@@ -1,6 +1,16 @@
+DROP TABLE "request_aggregates";
+DROP TABLE "header_values";
+DROP TABLE "fingerprint_actors";
+DROP TABLE "fingerprints";
+DROP TABLE "analysis_cache";
+DROP TABLE "dashboard_stats";
+DROP TABLE "endpoint_counts";
 DROP TABLE "analysed_requests";
 DROP TABLE "analysed_actors";
 DROP TABLE "requests";
 DROP TABLE "actors";
+DROP FUNCTION "request_headers"(INTEGER[]);
 DROP TABLE "honeypots";
-DROP TABLE "authorized_addresses";
\ No newline at end of file
+DROP TABLE "authorized_addresses";
+DROP TABLE "connect_targets";
+DELETE FROM "schema_migrations" WHERE "package" IN ('flask_recon', 'ip_address_checker');
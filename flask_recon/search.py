@@ -0,0 +1,120 @@
+from json import loads, dumps
+from typing import List, Tuple, Any
+
+from flask_recon.structures import RequestMethod
+
+# pg_trgm can only use its index when the pattern has a full trigram of literal characters
+MIN_TRIGRAM_LENGTH = 3
+
+
+class SearchPredicate:
+    _condition: str
+    _variables: List[Any]
+    _indexed: bool
+
+    def __init__(self, condition: str, variables: List[Any], indexed: bool):
+        self._condition = condition
+        self._variables = variables
+        self._indexed = indexed
+
+    @property
+    def condition(self) -> str:
+        return self._condition
+
+    @property
+    def variables(self) -> List[Any]:
+        return self._variables
+
+    @property
+    def indexed(self) -> bool:
+        return self._indexed
+
+
+class SearchPlanner:
+    _case_sensitive: bool
+    _all_must_match: bool
+    _predicates: List[SearchPredicate]
+
+    def __init__(self, case_sensitive: bool = False, all_must_match: bool = False):
+        self._case_sensitive = case_sensitive
+        self._all_must_match = all_must_match
+        self._predicates = []
+
+    def equals(self, column: str, value: Any) -> "SearchPlanner":
+        self._predicates.append(SearchPredicate(f"{column} = %s", [value], True))
+        return self
+
+    def contains(self, column: str, term: str) -> "SearchPlanner":
+        operator = "LIKE" if self._case_sensitive else "ILIKE"
+        self._predicates.append(SearchPredicate(f"{column} {operator} %s", [f"%{self.escape_like(term)}%"],
+                                                len(term) >= MIN_TRIGRAM_LENGTH))
+        return self
+
+    def method(self, term: str) -> "SearchPlanner":
+        # methods are stored as enum values, so a full method name is an exact match rather than a substring scan
+        method = term if self._case_sensitive else term.upper()
+        if method in RequestMethod.__members__:
+            return self.equals('"requests"."method"', method)
+        return self.contains('"requests"."method"', term)
+
+    def host(self, term: str) -> "SearchPlanner":
+        # resolved to actor ids up front so the predicate stays on requests and can join a bitmap OR; a full address
+        # is still a substring search like any other term, answered by the trigram index on actors
+        operator = "LIKE" if self._case_sensitive else "ILIKE"
+        self._predicates.append(SearchPredicate(
+            f'"requests"."actor_id" = ANY(ARRAY(SELECT "actor_id" FROM "actors" WHERE "host" {operator} %s))',
+            [f"%{self.escape_like(term)}%"], len(term) >= MIN_TRIGRAM_LENGTH))
+        return self
+
+    def document(self, column: str, term: str) -> "SearchPlanner":
+        # a JSON object is answered by containment on the jsonb_path_ops index, anything else by trigram on its text
+        if term.lstrip().startswith("{"):
+            try:
+                document = loads(term)
+            except ValueError:
+                document = None
+            if isinstance(document, dict):
+                self._predicates.append(SearchPredicate(f"{column} @> %s::JSONB", [dumps(document)], True))
+                return self
+        return self.contains(f"({column})::TEXT", term)
+
+    def headers(self, term: str) -> "SearchPlanner":
+        # matched against the header dictionary first, so requests are only probed through their header_ids index
+        if term.lstrip().startswith("{"):
+            try:
+                document = loads(term)
+            except ValueError:
+                document = None
+            if isinstance(document, dict):
+                # a pair that was never stored resolves to 0, which no request holds, instead of being dropped
+                lookups = ", ".join(['(SELECT COALESCE(MAX("header_id"), 0) FROM "header_values" '
+                                     'WHERE md5("name") = md5(%s) AND md5("value") = md5(%s))'] * len(document))
+                variables = [str(part) for header in document.items() for part in header]
+                self._predicates.append(SearchPredicate(
+                    f'"requests"."header_ids" @> ARRAY[{lookups}]::INTEGER[]', variables, True))
+                return self
+
+        operator = "LIKE" if self._case_sensitive else "ILIKE"
+        self._predicates.append(SearchPredicate(
+            f'"requests"."header_ids" && ARRAY(SELECT "header_id" FROM "header_values" '
+            f'WHERE ("name" || \': \' || "value") {operator} %s)',
+            [f"%{self.escape_like(term)}%"], True))
+        return self
+
+    def build(self) -> Tuple[str, List[Any]]:
+        separator = " AND " if self._all_must_match else " OR "
+        variables = [variable for predicate in self._predicates for variable in predicate.variables]
+        return separator.join(predicate.condition for predicate in self._predicates), variables
+
+    @property
+    def uses_index(self) -> bool:
+        # an OR is only index driven when every branch is; an AND needs one indexed branch
+        if not self._predicates:
+            return False
+        if self._all_must_match:
+            return any(predicate.indexed for predicate in self._predicates)
+        return all(predicate.indexed for predicate in self._predicates)
+
+    @staticmethod
+    def escape_like(term: str) -> str:
+        return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
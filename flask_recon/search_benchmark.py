@@ -0,0 +1,97 @@
+from json import dumps
+from statistics import quantiles
+from sys import argv
+from time import perf_counter
+from typing import List, Dict, Any
+
+from database_util import CONNECTION_PARAMS
+from flask_recon.database import DatabaseHandler
+
+BENCHMARK_SEARCHES: List[Dict[str, Any]] = [
+    {"uri": "wp-login"},
+    {"uri": ".env", "query_string": "XDEBUG"},
+    {"host": "10.1.2.3"},
+    {"host": "10.1."},
+    {"headers": "zgrab"},
+    {"headers": '{"User-Agent": "curl/8.4.0"}'},
+    {"body": "passwd"},
+    {"method": "POST", "uri": "cgi-bin", "all_must_match": True},
+]
+BENCHMARK_SEED_QUERY = """
+    INSERT INTO "actors" ("host")
+    SELECT '10.' || (i / 65536) %% 256 || '.' || (i / 256) %% 256 || '.' || i %% 256
+    FROM generate_series(1, %(actors)s) AS i
+    ON CONFLICT ("host") DO NOTHING;
+
+    INSERT INTO "header_values" ("name", "value")
+    VALUES ('Host', 'example.com'), ('Accept', '*/*'), ('User-Agent', 'curl/8.4.0'),
+           ('User-Agent', 'Mozilla/5.0 zgrab/0.x'), ('User-Agent', 'python-requests/2.31.0'),
+           ('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)')
+    ON CONFLICT DO NOTHING;
+
+    INSERT INTO "requests" ("actor_id", "timestamp", "method", "path", "body", "header_ids", "query_string", "port",
+                            "acceptable", "threat_level")
+    SELECT
+        (SELECT MIN("actor_id") FROM "actors") + i %% %(actors)s,
+        NOW() - (i || ' seconds')::INTERVAL,
+        (ARRAY['GET', 'GET', 'GET', 'POST', 'HEAD'])[1 + i %% 5],
+        (ARRAY['/', '/wp-login.php', '/.env', '/cgi-bin/luci', '/admin/config.php', '/api/v1/users/' || i])[1 + i %% 6],
+        CASE WHEN i %% 5 = 3 THEN jsonb_build_object('user', 'admin', 'pass', 'passwd' || i %% 100) ELSE '{}' END,
+        ARRAY[
+            (SELECT "header_id" FROM "header_values" WHERE "name" = 'Host'),
+            (SELECT "header_id" FROM "header_values"
+             WHERE "name" = 'User-Agent'
+               AND "value" = (ARRAY['curl/8.4.0', 'Mozilla/5.0 zgrab/0.x', 'python-requests/2.31.0',
+                                    'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'])[1 + i %% 4]),
+            (SELECT "header_id" FROM "header_values" WHERE "name" = 'Accept')
+        ],
+        CASE WHEN i %% 7 = 0 THEN 'XDEBUG_SESSION_START=phpstorm' ELSE '' END,
+        80,
+        i %% 3 = 0,
+        i %% 10
+    FROM generate_series(%(start)s, %(end)s - 1) AS i;
+
+    ANALYZE "actors";
+    ANALYZE "header_values";
+    ANALYZE "requests";
+"""
+
+
+if __name__ == '__main__':
+    if not 1 <= len(argv) <= 3:
+        print("Usage: python -m flask_recon.search_benchmark [Optional[table_sizes]] [Optional[runs]]")
+        print("Seeds the flask_recon_benchmark database with synthetic requests and reports search latency.")
+        exit(1)
+
+    try:
+        table_sizes = [int(size) for size in argv[1].split(",")] if len(argv) > 1 else [10_000, 100_000, 1_000_000]
+        runs = int(argv[2]) if len(argv) > 2 else 20
+    except ValueError:
+        print("Table sizes must be a comma separated list of integers and runs must be an integer.")
+        exit(1)
+    if runs < 2:
+        # quantiles needs at least two samples to report percentiles
+        print("Runs must be at least 2.")
+        exit(1)
+
+    database_handler = DatabaseHandler(**{**CONNECTION_PARAMS, "dbname": "flask_recon_benchmark"})
+    database_handler.execute('SELECT COUNT(*) FROM "requests"')
+    seeded = database_handler.fetchone()[0]
+    print(f"{'rows':>10} {'search':<60} {'index':>6} {'p50 ms':>9} {'p95 ms':>9}")
+    for size in sorted(table_sizes):
+        if size > seeded:
+            database_handler.execute(BENCHMARK_SEED_QUERY, {"actors": 10_000, "start": seeded, "end": size})
+            database_handler.connection.commit()
+            seeded = size
+
+        for search in BENCHMARK_SEARCHES:
+            latencies = []
+            for _ in range(runs):
+                started = perf_counter()
+                database_handler.search(**search)
+                latencies.append((perf_counter() - started) * 1000)
+            planner = database_handler.search_planner(**search)
+            percentiles = quantiles(latencies, n=100)
+            p50, p95 = percentiles[49], percentiles[94]
+            print(f"{seeded:>10} {dumps(search):<60} {'yes' if planner.uses_index else 'no':>6} {p50:>9.2f} "
+                  f"{p95:>9.2f}")
@@ -1,11 +1,23 @@
+from contextlib import contextmanager
+from datetime import datetime
 from re import compile
-from time import sleep
-from typing import Tuple, Dict, Optional
+from threading import BoundedSemaphore
+from typing import Tuple, Dict, Optional, Any, Iterator, Set
 
-from flask import Flask, request, Response
+from flask import Flask, request, Response, g, has_app_context
 
+from database_util import HandlerPool
+from flask_recon.analysis import AnalysisPipeline, AnalysisCache
 from flask_recon.database import DatabaseHandler
-from flask_recon.structures import IncomingRequest, RequestMethod, HALT_PAYLOAD
+from flask_recon.honeypots import HoneypotCache
+from flask_recon.ingestion import IngestionQueue
+from flask_recon.limiter import TokenBucketLimiter, FloodAggregator
+from flask_recon.metrics import METRICS
+from flask_recon.passwords import PasswordHasher
+from flask_recon.sessions import SessionCache
+from flask_recon.stats import DashboardStats, SummaryFlusher
+from flask_recon.structures import IncomingRequest, RequestMethod
+from flask_recon.tarpit import Tarpit
 from flask_recon.util import RequestAnalyser
 
 PORTS = {
@@ -16,21 +28,51 @@ PORTS = {
 
 class Listener:
     _database_handler: DatabaseHandler
+    _connection_params: Dict[str, Any]
+    _handler_pool: Optional[HandlerPool[DatabaseHandler]] = None
+    _ingestion_queue: Optional[IngestionQueue] = None
+    _analysis_pipeline: Optional[AnalysisPipeline] = None
+    _analysis_cache: AnalysisCache
+    _rate_limiter: Optional[TokenBucketLimiter] = None
+    _flood_aggregator: Optional[FloodAggregator] = None
     _flask: Flask
     _port: int
     _halt_scanner_threads: bool
     _max_halt_messages: int
+    _tarpit: Optional[Tarpit]
+    _honeypots: HoneypotCache
+    _sessions: SessionCache
+    _passwords: PasswordHasher
     _request_analyser: RequestAnalyser
+    _dashboard_stats: DashboardStats
+    _summary_flusher: Optional[SummaryFlusher] = None
+    _metrics_addresses: Set[str]
+    _export_slots: BoundedSemaphore
     _ip_regex = compile(r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}")
 
     def __init__(self, flask: Flask, halt_scanner_threads: bool = True, max_halt_messages: int = 100_000,
-                 port: int = 80):
+                 port: int = 80, tarpit: Optional[Tarpit] = None,
+                 metrics_addresses: Optional[Set[str]] = None, max_exports: int = 2):
         self._request_analyser = RequestAnalyser(open("token", "r").read())
+        self._dashboard_stats = DashboardStats()
+        self._honeypots = HoneypotCache()
+        self._sessions = SessionCache()
+        self._passwords = PasswordHasher()
+        self._analysis_cache = AnalysisCache()
         self._port = port
         self._halt_scanner_threads = halt_scanner_threads
         self._max_halt_messages = max_halt_messages
+        if halt_scanner_threads:
+            self._tarpit = tarpit or Tarpit(max_chunks=max_halt_messages)
+        else:
+            self._tarpit = None
+        # anyone else requesting /metrics is a scanner and is recorded like any other request
+        self._metrics_addresses = metrics_addresses if metrics_addresses is not None else {"127.0.0.1", "::1"}
+        # each export holds its own connection for the whole download, so they are capped separately from the pool
+        self._export_slots = BoundedSemaphore(max_exports)
         self._flask = flask
         self.add_routes()
+        self.add_gauges()
 
     def route(self, *args, **kwargs):
         return self._flask.route(*args, **kwargs)
@@ -38,14 +80,103 @@ class Listener:
     def run(self, *args, **kwargs):
         self._flask.run(*args, **kwargs)
 
-    def connect_database(self, dbname: str, user: str, password: str, host: str, port: str):
-        self._database_handler = DatabaseHandler(
-            dbname=dbname,
-            user=user,
-            password=password,
-            host=host,
-            port=port
+    def connect_database(self, dbname: str, user: str, password: str, host: str, port: str,
+                         min_connections: int = 0, max_connections: int = 0):
+        self._connection_params = {
+            "dbname": dbname,
+            "user": user,
+            "password": password,
+            "host": host,
+            "port": port
+        }
+        self._database_handler = DatabaseHandler(**self._connection_params)
+        self._honeypots.load(self._database_handler)
+        self._honeypots.start_listener(self._connection_params)
+        self._sessions.start_sweeper(self._connection_params)
+        self._summary_flusher = SummaryFlusher(self._connection_params)
+        self._summary_flusher.start()
+        if max_connections > 0:
+            self._handler_pool = HandlerPool(
+                handler_class=DatabaseHandler,
+                connection_params=self._connection_params,
+                min_size=min_connections,
+                max_size=max_connections
+            )
+
+    def shutdown(self, timeout: Optional[float] = 10.0):
+        # the queue drains first, so the rows it writes are still counted by the final summary flush
+        if self._flood_aggregator is not None:
+            self._flood_aggregator.stop(timeout)
+        if self._ingestion_queue is not None:
+            self._ingestion_queue.stop(timeout)
+        if self._analysis_pipeline is not None:
+            self._analysis_pipeline.stop(timeout)
+        if self._summary_flusher is not None:
+            self._summary_flusher.stop(timeout)
+        self._sessions.stop_sweeper(timeout)
+        self._honeypots.stop_listener(timeout)
+
+    def start_analysis_pipeline(self, concurrency: int = 4, max_queued: int = 10_000):
+        self._analysis_pipeline = AnalysisPipeline(
+            analyser=self._request_analyser,
+            cache=self._analysis_cache,
+            connection_params=self._connection_params,
+            concurrency=concurrency,
+            max_queued=max_queued
         )
+        self._analysis_pipeline.start()
+
+    @contextmanager
+    def database_connection(self) -> Iterator[DatabaseHandler]:
+        if self._handler_pool is None:
+            yield self._database_handler
+            return
+
+        with self._handler_pool.connection() as database_handler:
+            yield database_handler
+
+    def reserve_export(self) -> bool:
+        return self._export_slots.acquire(blocking=False)
+
+    def release_export(self) -> None:
+        self._export_slots.release()
+
+    @contextmanager
+    def dedicated_database_connection(self) -> Iterator[DatabaseHandler]:
+        # for work that outlives the request, such as streamed exports; never drawn from the request pool, so slow
+        # downloads cannot starve ingestion of connections
+        database_handler = DatabaseHandler(**self._connection_params)
+        try:
+            yield database_handler
+        finally:
+            database_handler.disconnect()
+
+    def release_database_handler(self, _):
+        database_handler = g.pop("database_handler", None)
+        if database_handler is not None:
+            self._handler_pool.release(database_handler)
+
+    def start_ingestion_queue(self, max_size: int = 10_000, workers: int = 2, batch_size: int = 500,
+                              flush_interval: float = 0.5, block_timeout: Optional[float] = None):
+        self._ingestion_queue = IngestionQueue(
+            connection_params=self._connection_params,
+            max_size=max_size,
+            workers=workers,
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            block_timeout=block_timeout
+        )
+        self._ingestion_queue.start()
+
+    def start_flood_aggregation(self, rate: float = 10.0, burst: float = 100.0, sample_rate: int = 100,
+                                flush_interval: float = 5.0, max_hosts: int = 100_000):
+        self._rate_limiter = TokenBucketLimiter(rate=rate, burst=burst, max_hosts=max_hosts)
+        self._flood_aggregator = FloodAggregator(
+            connection_params=self._connection_params,
+            sample_rate=sample_rate,
+            flush_interval=flush_interval
+        )
+        self._flood_aggregator.start()
 
     def error_handler(self, _):
         return self.handle_request(*self.unpack_request_values(request))
@@ -67,24 +198,69 @@ class Listener:
             request_body=body,
             timestamp="",
         )
-        self._database_handler.insert_request(req)
+        # stamped once here, so queued, direct and rate limited requests all share the web host's clock
+        received_at = datetime.now()
+        if not self.should_store(req, received_at):
+            # counted by the flood aggregator instead, so it is neither classified nor written as a row
+            METRICS.increment("flask_recon_requests_total", (("method", req.method.value),))
+            METRICS.increment("flask_recon_rate_limited_total")
+        else:
+            with METRICS.time("flask_recon_classification_seconds"):
+                req.determine_threat_level()
+            self.count_request(req)
+
+            if self._ingestion_queue is not None:
+                self._ingestion_queue.put(req, received_at)
+            else:
+                with METRICS.time("flask_recon_database_insert_seconds", (("mode", "direct"),)):
+                    with self.database_connection() as database_handler:
+                        database_handler.insert_request(req, received_at)
         if req.is_acceptable:
             return "404 Not Found", 404
 
-        file = self.grab_payload_file(req.uri)
-        if (honeypot_response := self._database_handler.get_honeypot(file)) is not None:
-            response = Response("", status=200, headers=self.text_response_headers(len(honeypot_response)))
-            yield honeypot_response
-            return response
+        with METRICS.time("flask_recon_honeypot_lookup_seconds"):
+            honeypot_response = self._honeypots.lookup(req.uri)
+        if honeypot_response is not None:
+            return Response(honeypot_response, status=200, headers=self.text_response_headers(len(honeypot_response)))
 
-        if self._halt_scanner_threads:
-            for _ in range(self._max_halt_messages):
-                yield (HALT_PAYLOAD * 1024) * 1024
-                sleep(1)
-            return "", 200
+        if self._tarpit is not None and (stream := self._tarpit.stream(req.host.address)) is not None:
+            return Response(stream, status=200, content_type="text/plain", direct_passthrough=True)
 
         return "404 Not Found", 404
 
+    def should_store(self, req: IncomingRequest, received_at: datetime) -> bool:
+        # over the limit, only one in sample_rate requests per host and path is still stored in full
+        if self._rate_limiter is None or self._rate_limiter.allow(req.host.address):
+            return True
+        return self._flood_aggregator.record(req, received_at)
+
+    @staticmethod
+    def count_request(req: IncomingRequest) -> None:
+        METRICS.increment("flask_recon_requests_total", (("method", req.method.value),))
+        for request_type in req.request_types:
+            METRICS.increment("flask_recon_request_types_total", (("type", request_type.value),))
+        for attack_type in req.attack_types:
+            METRICS.increment("flask_recon_attack_types_total", (("type", attack_type.value),))
+
+    def metrics(self):
+        if request.remote_addr not in self._metrics_addresses:
+            return self.handle_request(*self.unpack_request_values(request))
+        return Response(METRICS.render(), status=200, content_type="text/plain; version=0.0.4")
+
+    def add_gauges(self):
+        METRICS.gauge("flask_recon_ingestion_queue_depth", "Requests waiting to be written by the ingestion queue.",
+                      lambda: self._ingestion_queue.depth if self._ingestion_queue is not None else 0)
+        METRICS.gauge("flask_recon_analysis_queue_depth", "Requests waiting for LLM analysis.",
+                      lambda: self._analysis_pipeline.stats["depth"] if self._analysis_pipeline is not None else 0)
+        METRICS.gauge("flask_recon_active_tarpits", "Connections currently held in the tarpit.",
+                      lambda: self._tarpit.active if self._tarpit is not None else 0)
+        METRICS.gauge("flask_recon_summary_deltas_pending", "Committed requests not yet counted in dashboard_stats.",
+                      DatabaseHandler.pending_summaries)
+        METRICS.gauge("flask_recon_campaign_deltas_pending", "Committed requests not yet counted in fingerprints.",
+                      DatabaseHandler.pending_campaigns)
+        METRICS.gauge("flask_recon_flood_aggregates_pending", "Rate limited requests waiting to be flushed as counts.",
+                      lambda: self._flood_aggregator.stats["pending"] if self._flood_aggregator is not None else 0)
+
     def __call__(self, *args, **kwargs):
         return self._flask.__call__(*args, **kwargs)
 
@@ -138,10 +314,61 @@ class Listener:
         for i in [400, 404, 403]:
             self._flask.errorhandler(i)(self.error_handler)
         self._flask.route("/robots.txt", methods=["GET"])(self.robots)
+        self._flask.route("/metrics", methods=["GET"])(self.metrics)
+        self._flask.teardown_request(self.release_database_handler)
 
     @property
     def database_handler(self) -> DatabaseHandler:
-        return self._database_handler
+        if self._handler_pool is None or not has_app_context():
+            return self._database_handler
+
+        if "database_handler" not in g:
+            g.database_handler = self._handler_pool.acquire()
+        return g.database_handler
+
+    @property
+    def handler_pool(self) -> Optional[HandlerPool[DatabaseHandler]]:
+        return self._handler_pool
+
+    @property
+    def ingestion_queue(self) -> Optional[IngestionQueue]:
+        return self._ingestion_queue
+
+    @property
+    def rate_limiter(self) -> Optional[TokenBucketLimiter]:
+        return self._rate_limiter
+
+    @property
+    def flood_aggregator(self) -> Optional[FloodAggregator]:
+        return self._flood_aggregator
+
+    @property
+    def passwords(self) -> PasswordHasher:
+        return self._passwords
+
+    @property
+    def sessions(self) -> SessionCache:
+        return self._sessions
+
+    @property
+    def analysis_cache(self) -> AnalysisCache:
+        return self._analysis_cache
+
+    @property
+    def analysis_pipeline(self) -> Optional[AnalysisPipeline]:
+        return self._analysis_pipeline
+
+    @property
+    def honeypots(self) -> HoneypotCache:
+        return self._honeypots
+
+    @property
+    def tarpit(self) -> Optional[Tarpit]:
+        return self._tarpit
+
+    @property
+    def dashboard_stats(self) -> DashboardStats:
+        return self._dashboard_stats
 
     @property
     def request_analyser(self) -> RequestAnalyser:
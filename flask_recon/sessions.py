@@ -0,0 +1,83 @@
+from datetime import timedelta
+from threading import Thread, Event
+from time import monotonic
+from typing import Dict, Any, Optional
+
+from flask_recon.cache import LRUCache
+from flask_recon.database import DatabaseHandler, SESSION_LIFETIME
+
+
+class SessionCache:
+    # token -> monotonic deadline; entries also carry a short TTL so a logout in another process is seen within max_age seconds
+    _tokens: LRUCache[str, float]
+    _max_age: float
+    _sweep_interval: float
+    _sweep_batch_size: int
+    _stop_event: Event
+    _sweeper_thread: Optional[Thread] = None
+
+    def __init__(self, max_size: int = 1_000, max_age: float = 60.0, sweep_interval: float = 300.0,
+                 sweep_batch_size: int = 1_000):
+        self._tokens = LRUCache(max_size=max_size, ttl=max_age)
+        self._max_age = max_age
+        self._sweep_interval = sweep_interval
+        self._sweep_batch_size = sweep_batch_size
+        self._stop_event = Event()
+
+    def create(self, database_handler: DatabaseHandler, admin_username: str,
+               lifetime: timedelta = SESSION_LIFETIME) -> str:
+        token, remaining = database_handler.generate_admin_session_token(admin_username, lifetime)
+        self._remember(token, remaining)
+        return token
+
+    def validate(self, database_handler: DatabaseHandler, token: str) -> bool:
+        if (deadline := self._tokens.get(token)) is not None:
+            if deadline > monotonic():
+                return True
+            self._tokens.invalidate(token)
+            return False
+
+        if (remaining := database_handler.get_session_remaining(token)) is None:
+            return False
+        self._remember(token, remaining)
+        return True
+
+    def revoke(self, database_handler: DatabaseHandler, token: str) -> None:
+        self._tokens.invalidate(token)
+        database_handler.delete_admin_session(token)
+
+    def _remember(self, token: str, remaining: float) -> None:
+        # never cached past the session's own expiry
+        if remaining > 0:
+            self._tokens.put(token, monotonic() + remaining, ttl=min(self._max_age, remaining))
+
+    def start_sweeper(self, connection_params: Dict[str, Any]) -> None:
+        self._sweeper_thread = Thread(target=self._sweep, args=(connection_params,), name="flask-recon-sessions",
+                                      daemon=True)
+        self._sweeper_thread.start()
+
+    def stop_sweeper(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        if self._sweeper_thread is not None:
+            self._sweeper_thread.join(timeout)
+
+    def _sweep(self, connection_params: Dict[str, Any]) -> None:
+        while not self._stop_event.is_set():
+            database_handler = None
+            try:
+                database_handler = DatabaseHandler(**connection_params)
+                while not self._stop_event.is_set():
+                    # deleted in small batches so the sweep never holds long locks on admin_sessions
+                    deleted = self._sweep_batch_size
+                    while deleted == self._sweep_batch_size and not self._stop_event.is_set():
+                        deleted = database_handler.delete_expired_admin_sessions(self._sweep_batch_size)
+                    self._stop_event.wait(self._sweep_interval)
+            except Exception:
+                self._stop_event.wait(self._sweep_interval)
+            finally:
+                if database_handler is not None:
+                    database_handler.disconnect()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return self._tokens.stats
@@ -0,0 +1,65 @@
+from threading import Thread, Event
+from typing import Dict, Any, Optional
+
+from flask_recon.cache import LRUCache
+from flask_recon.database import DatabaseHandler
+
+DASHBOARD_KEY = "dashboard"
+
+
+class DashboardStats:
+    _cache: LRUCache[str, Dict[str, Any]]
+
+    def __init__(self, ttl: float = 5.0):
+        self._cache = LRUCache(max_size=1, ttl=ttl)
+
+    def get(self, database_handler: DatabaseHandler) -> Dict[str, Any]:
+        if (stats := self._cache.get(DASHBOARD_KEY)) is not None:
+            return stats
+
+        stats = database_handler.get_dashboard_stats()
+        self._cache.put(DASHBOARD_KEY, stats)
+        return stats
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+
+
+class SummaryFlusher:
+    # the only writer of dashboard_stats, endpoint_counts and the campaign tables outside rebuilds and backfills, so
+    # their rows are never contended
+    _connection_params: Dict[str, Any]
+    _flush_interval: float
+    _stop_event: Event
+    _flusher_thread: Optional[Thread] = None
+
+    def __init__(self, connection_params: Dict[str, Any], flush_interval: float = 1.0):
+        self._connection_params = connection_params
+        self._flush_interval = flush_interval
+        self._stop_event = Event()
+
+    def start(self) -> None:
+        self._flusher_thread = Thread(target=self._flush, name="flask-recon-summaries", daemon=True)
+        self._flusher_thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        if self._flusher_thread is not None:
+            self._flusher_thread.join(timeout)
+
+    def _flush(self) -> None:
+        while True:
+            try:
+                database_handler = DatabaseHandler(**self._connection_params)
+                while not self._stop_event.is_set():
+                    self._stop_event.wait(self._flush_interval)
+                    database_handler.flush_summaries()
+                    database_handler.flush_campaigns()
+                # whatever was committed after the last interval is still written on shutdown
+                database_handler.flush_summaries()
+                database_handler.flush_campaigns()
+                return
+            except Exception:
+                # failed deltas are restored by the flush methods, so a reconnect loses nothing
+                if self._stop_event.wait(self._flush_interval):
+                    return
@@ -1,6 +1,9 @@
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from binascii import Error as Base64Error
+from datetime import datetime
 from enum import Enum
 from json import dumps
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple, Any
 
 import werkzeug.exceptions
 from flask import Request
@@ -68,6 +71,34 @@ class RemoteHost:
         self._open_ports[port] = True
 
 
+class PageCursor:
+    _timestamp: datetime
+    _request_id: int
+
+    def __init__(self, timestamp: datetime, request_id: int):
+        self._timestamp = timestamp
+        self._request_id = request_id
+
+    def encode(self) -> str:
+        return urlsafe_b64encode(f"{self._timestamp.isoformat()}|{self._request_id}".encode()).decode()
+
+    @staticmethod
+    def decode(token: str) -> "PageCursor":
+        try:
+            timestamp, request_id = urlsafe_b64decode(token.encode()).decode().split("|")
+            return PageCursor(datetime.fromisoformat(timestamp), int(request_id))
+        except (Base64Error, UnicodeDecodeError) as e:
+            raise ValueError("Invalid page token.") from e
+
+    @property
+    def timestamp(self) -> datetime:
+        return self._timestamp
+
+    @property
+    def request_id(self) -> int:
+        return self._request_id
+
+
 class IncomingRequest:
     _csv_sep: str = ","
     _host: RemoteHost
@@ -84,6 +115,8 @@ class IncomingRequest:
     _request_id: Optional[int]
     _request_types: Optional[List[RequestType]] = None
     _attack_types: Optional[List[AttackType]] = None
+    _matched_flags: Optional[List[str]] = None
+    _flags_version: Optional[str] = None
 
     def __init__(self, local_port: int):
         self._local_port = local_port
@@ -103,7 +136,9 @@ class IncomingRequest:
     def from_components(self, host: str, request_method: RequestMethod, request_headers: Optional[Dict[str, str]],
                         request_uri: str, query_string: Optional[str], request_body: Optional[Dict[str, str]],
                         timestamp: str, threat_level: Optional[int] = None,
-                        request_id: Optional[int] = None) -> "IncomingRequest":
+                        request_id: Optional[int] = None, request_types: Optional[List[RequestType]] = None,
+                        attack_types: Optional[List[AttackType]] = None, matched_flags: Optional[List[str]] = None,
+                        flags_version: Optional[str] = None) -> "IncomingRequest":
         self._host = RemoteHost(host)
         self._request_method = request_method
         self._request_headers = request_headers
@@ -113,15 +148,21 @@ class IncomingRequest:
         self._timestamp = timestamp
         self._threat_level = threat_level
         self._request_id = request_id
+        self._request_types = request_types
+        self._attack_types = attack_types
+        self._matched_flags = matched_flags
+        self._flags_version = flags_version
         return self
 
     def determine_threat_level(self):
         method_score, uri_score, query_score, body_score, ua_score = 5, 4, 5, 0, 5
-        total_request_types, total_attack_types = [], []
+        total_request_types, total_attack_types, matched_flags = [], [], []
 
         if self._request_headers and "user-agent" in [k.lower() for k in self._request_headers.keys()]:
             ua = self._request_headers.get("user-agent") or self._request_headers.get("User-Agent")
-            ua_score, request_types, attack_types = self.calc_avg_tl_str(ua, KNOWN_FLAGS.known_ua_flags)
+            ua_flags = KNOWN_FLAGS.ua_matcher.match(ua)
+            ua_score, request_types, attack_types = self.score_flags(ua_flags)
+            matched_flags.extend(ua_flags)
             total_request_types.extend(request_types)
             total_attack_types.extend(attack_types)
 
@@ -136,17 +177,18 @@ class IncomingRequest:
 
         if self._request_uri == "/":
             uri_score = 0
-        elif any(map(self._request_uri.__contains__, [flag.flag for flag in KNOWN_FLAGS.known_payload_flags])):
-            uri_score, request_types, attack_types = self.calc_avg_tl_str(self._request_uri,
-                                                                          KNOWN_FLAGS.known_payload_flags)
+        elif uri_flags := KNOWN_FLAGS.payload_matcher.match(self._request_uri):
+            uri_score, request_types, attack_types = self.score_flags(uri_flags)
+            matched_flags.extend(uri_flags)
             total_request_types.extend(request_types)
             total_attack_types.extend(attack_types)
         else:
             uri_score = 6
 
         if self._query_string:
-            query_score, request_types, attack_types = self.calc_avg_tl_str(self._query_string,
-                                                                            KNOWN_FLAGS.known_payload_flags)
+            query_flags = KNOWN_FLAGS.payload_matcher.match(self._query_string)
+            query_score, request_types, attack_types = self.score_flags(query_flags)
+            matched_flags.extend(query_flags)
             total_request_types.extend(request_types)
             total_attack_types.extend(attack_types)
         if self._request_body:
@@ -166,15 +208,14 @@ class IncomingRequest:
         self._request_types = sorted(deduped_request_types, key=lambda x: total_request_types.count(x), reverse=True)
         self._attack_types = sorted(deduped_attack_types, key=lambda x: total_attack_types.count(x), reverse=True)
         self._threat_level = int(round((method_score + uri_score + query_score + body_score + ua_score) / 5, 0))
+        self._matched_flags = list(dict.fromkeys(flag.flag for flag in matched_flags))
+        self._flags_version = KNOWN_FLAGS.version
 
     @staticmethod
-    def calc_avg_tl_str(value: str, flags: List[Flag]) -> Tuple[float, List[RequestType], List[AttackType]]:
+    def score_flags(flags: List[Flag]) -> Tuple[float, List[RequestType], List[AttackType]]:
         threat_level, flag_count = 0, 0
         request_types, attack_types = [], []
         for flag in flags:
-            if flag.flag not in value:
-                continue
-
             threat_level += flag.score
             flag_count += 1
             request_types.extend(flag.request_types)
@@ -189,14 +230,36 @@ class IncomingRequest:
         return f"origin_host{s}method{s}url{s}headers{s}body{s}timestamp"
 
     @property
-    def as_csv(self) -> str:
+    def csv_row(self) -> str:
         qs_sep = "?" if self.query_string else ""
         s = self._csv_sep
-        header = "address,method,uri,query_string,headers,body,timestamp\n"
-        return header + (f"{self.host.address}{s}{self.method}{s}{self.escape_csv(self.uri)}{qs_sep}"
+        return (f"{self.host.address}{s}{self.method}{s}{self.escape_csv(self.uri)}{qs_sep}"
                 f"{self.escape_csv(self.query_string)}{s}{self.escape_csv(dumps(self.headers))}{s}"
                 f"{self.escape_csv(dumps(self.body))}{s}{self.timestamp}")
 
+    @property
+    def as_csv(self) -> str:
+        header = "address,method,uri,query_string,headers,body,timestamp\n"
+        return header + self.csv_row
+
+    @property
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "host": self.host.address,
+            "method": getattr(self.method, "value", self.method),
+            "uri": self.uri,
+            "query_string": self.query_string,
+            "headers": self.headers,
+            "body": self.body,
+            "timestamp": str(self.timestamp),
+            "threat_level": self.threat_level,
+            "request_types": [t.value for t in self.request_types] if self.request_types else None,
+            "attack_types": [t.value for t in self.attack_types] if self.attack_types else None,
+            "matched_flags": self.matched_flags,
+            "flags_version": self.flags_version,
+        }
+
     @staticmethod
     def escape_csv(value: str) -> str:
         value = value.replace('"', "'")
@@ -253,3 +316,11 @@ class IncomingRequest:
     @property
     def attack_types(self) -> Optional[List[AttackType]]:
         return self._attack_types
+
+    @property
+    def matched_flags(self) -> Optional[List[str]]:
+        return self._matched_flags
+
+    @property
+    def flags_version(self) -> Optional[str]:
+        return self._flags_version
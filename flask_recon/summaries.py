@@ -0,0 +1,119 @@
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Tuple, List, Optional, Set
+
+from flask_recon.fingerprints import RequestFingerprint
+
+# request_id is None for hits that have no stored row behind them
+SummaryEntry = Tuple[Optional[int], str, datetime, int]
+SummarySnapshot = Tuple[int, int, Dict[str, Tuple[int, Optional[int]]], Optional[datetime], Optional[datetime]]
+CampaignSnapshot = Tuple[Dict[str, Tuple[RequestFingerprint, int, datetime, datetime]], Set[Tuple[str, int]]]
+
+
+class SummaryCounters:
+    # committed ingest deltas, kept in memory so concurrent inserts never queue on the dashboard_stats row
+    _lock: Lock
+    _requests: int
+    _actors: int
+    _endpoints: Dict[str, Tuple[int, Optional[int]]]
+    _first_request_time: Optional[datetime]
+    _last_request_time: Optional[datetime]
+
+    def __init__(self):
+        self._lock = Lock()
+        self._reset()
+
+    def add(self, entries: List[SummaryEntry], new_actors: int = 0) -> None:
+        with self._lock:
+            self._actors += new_actors
+            for request_id, path, timestamp, hits in entries:
+                self._requests += hits
+                self._add_endpoint(path, hits, request_id)
+                self._add_time(timestamp, timestamp)
+
+    def drain(self) -> Optional[SummarySnapshot]:
+        with self._lock:
+            if not self._requests and not self._actors:
+                return None
+            snapshot = (self._requests, self._actors, self._endpoints, self._first_request_time,
+                        self._last_request_time)
+            self._reset()
+            return snapshot
+
+    def restore(self, snapshot: SummarySnapshot) -> None:
+        # a failed flush is folded back in, so its counts go out with the next one
+        requests, actors, endpoints, first_request_time, last_request_time = snapshot
+        with self._lock:
+            self._requests += requests
+            self._actors += actors
+            for path, (hits, last_request_id) in endpoints.items():
+                self._add_endpoint(path, hits, last_request_id)
+            self._add_time(first_request_time, last_request_time)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def _reset(self) -> None:
+        self._requests, self._actors = 0, 0
+        self._endpoints = {}
+        self._first_request_time, self._last_request_time = None, None
+
+    def _add_endpoint(self, path: str, hits: int, request_id: Optional[int]) -> None:
+        previous_hits, last_request_id = self._endpoints.get(path, (0, None))
+        if last_request_id is None or (request_id is not None and request_id > last_request_id):
+            last_request_id = request_id
+        self._endpoints[path] = (previous_hits + hits, last_request_id)
+
+    def _add_time(self, first_request_time: Optional[datetime], last_request_time: Optional[datetime]) -> None:
+        if first_request_time is not None:
+            self._first_request_time = min(filter(None, (self._first_request_time, first_request_time)))
+        if last_request_time is not None:
+            self._last_request_time = max(filter(None, (self._last_request_time, last_request_time)))
+
+    @property
+    def pending(self) -> int:
+        return self._requests
+
+
+class CampaignCounters:
+    # fingerprint totals and new (fingerprint, actor) pairs, written outside the insert transaction
+    _lock: Lock
+    _campaigns: Dict[str, Tuple[RequestFingerprint, int, datetime, datetime]]
+    _actors: Set[Tuple[str, int]]
+
+    def __init__(self):
+        self._lock = Lock()
+        self._campaigns, self._actors = {}, set()
+
+    def add(self, entries: List[Tuple[RequestFingerprint, int, datetime]]) -> None:
+        with self._lock:
+            for fingerprint, actor_id, timestamp in entries:
+                self._add_campaign(fingerprint, 1, timestamp, timestamp)
+                self._actors.add((fingerprint.digest, actor_id))
+
+    def drain(self) -> Optional[CampaignSnapshot]:
+        with self._lock:
+            if not self._campaigns:
+                return None
+            snapshot = (self._campaigns, self._actors)
+            self._campaigns, self._actors = {}, set()
+            return snapshot
+
+    def restore(self, snapshot: CampaignSnapshot) -> None:
+        campaigns, actors = snapshot
+        with self._lock:
+            for fingerprint, hits, first_seen, last_seen in campaigns.values():
+                self._add_campaign(fingerprint, hits, first_seen, last_seen)
+            self._actors.update(actors)
+
+    def _add_campaign(self, fingerprint: RequestFingerprint, hits: int, first_seen: datetime,
+                      last_seen: datetime) -> None:
+        _, previous_hits, previous_first_seen, previous_last_seen = self._campaigns.get(
+            fingerprint.digest, (None, 0, first_seen, last_seen))
+        self._campaigns[fingerprint.digest] = (fingerprint, previous_hits + hits, min(previous_first_seen, first_seen),
+                                               max(previous_last_seen, last_seen))
+
+    @property
+    def pending(self) -> int:
+        return sum(hits for _, hits, _, _ in self._campaigns.values())
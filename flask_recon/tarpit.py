@@ -0,0 +1,109 @@
+from collections import defaultdict
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterator, Optional
+
+from flask_recon.metrics import METRICS
+from flask_recon.structures import HALT_PAYLOAD
+
+try:
+    # under a gevent server each tarpitted connection is a greenlet, so sleeping here costs no OS thread
+    from gevent import sleep
+except ImportError:
+    from time import sleep
+
+
+class Tarpit:
+    _payload: bytes
+    _drip_interval: float
+    _max_chunks: int
+    _max_per_ip: int
+    _max_connections: int
+    _lock: Lock
+    _active_by_ip: Dict[str, int]
+    _active: int
+    _total: int
+    _rejected: int
+
+    def __init__(self, chunk_size: int = len(HALT_PAYLOAD) * 1024, drip_interval: float = 1.0,
+                 max_chunks: int = 100_000, max_per_ip: int = 4, max_connections: int = 10_000):
+        if chunk_size < 1 or max_chunks < 1 or max_per_ip < 1 or max_connections < 1:
+            raise ValueError("chunk_size, max_chunks, max_per_ip and max_connections must be positive.")
+
+        # allocated once and shared by every tarpitted connection
+        repeats = chunk_size // len(HALT_PAYLOAD) + 1
+        self._payload = (HALT_PAYLOAD * repeats).encode()[:chunk_size]
+        self._drip_interval = drip_interval
+        self._max_chunks = max_chunks
+        self._max_per_ip = max_per_ip
+        self._max_connections = max_connections
+        self._lock = Lock()
+        self._active_by_ip = defaultdict(int)
+        self._active, self._total, self._rejected = 0, 0, 0
+
+    def acquire(self, remote_address: str) -> bool:
+        with self._lock:
+            if self._active >= self._max_connections or self._active_by_ip[remote_address] >= self._max_per_ip:
+                self._rejected += 1
+                return False
+
+            self._active_by_ip[remote_address] += 1
+            self._active += 1
+            self._total += 1
+            return True
+
+    def release(self, remote_address: str) -> None:
+        with self._lock:
+            self._active -= 1
+            self._active_by_ip[remote_address] -= 1
+            if self._active_by_ip[remote_address] <= 0:
+                del self._active_by_ip[remote_address]
+
+    def stream(self, remote_address: str) -> Optional["TarpitStream"]:
+        if not self.acquire(remote_address):
+            return None
+        return TarpitStream(self, remote_address)
+
+    def drip(self) -> Iterator[bytes]:
+        for _ in range(self._max_chunks):
+            yield self._payload
+            sleep(self._drip_interval)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "active": self._active,
+                "total": self._total,
+                "rejected": self._rejected,
+                "active_hosts": len(self._active_by_ip),
+            }
+
+
+class TarpitStream:
+    # an iterable rather than a generator, since werkzeug never starts the body of a HEAD response and closing an
+    # unstarted generator skips its finally; the WSGI server calls close() either way
+    _tarpit: Tarpit
+    _remote_address: str
+    _started: float
+    _closed: bool
+
+    def __init__(self, tarpit: Tarpit, remote_address: str):
+        self._tarpit = tarpit
+        self._remote_address = remote_address
+        self._started = monotonic()
+        self._closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._tarpit.drip()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._tarpit.release(self._remote_address)
+        METRICS.observe("flask_recon_tarpit_duration_seconds", monotonic() - self._started)
@@ -1,9 +1,13 @@
-from json import loads
+from hashlib import sha256
+from json import loads, dumps
 from os import mkdir
 from os.path import isfile
-from typing import Optional
+from typing import Optional, Dict
+from urllib.parse import unquote, parse_qsl, urlencode
 
-from requests import get, post
+from requests import get, Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from flask_recon.structures import IncomingRequest, RequestType, AttackType, RequestMethod
 
@@ -24,22 +28,41 @@ TEMPLATE_FILES = [
     "flask_recon/templates/login_form.html",
     "flask_recon/templates/register_form.html",
 ]
+# headers that differ between otherwise identical scanner requests, dropped before fingerprinting and analysis
+VOLATILE_HEADERS = {
+    "host", "date", "x-forwarded-for", "x-forwarded-host", "x-forwarded-proto", "x-real-ip", "forwarded",
+    "cf-connecting-ip", "cf-ray", "cf-ipcountry", "cf-visitor", "cdn-loop", "true-client-ip", "via",
+    "content-length", "if-modified-since", "if-none-match", "cookie", "x-request-id",
+}
 
 
 class RequestAnalyser:
     _openai_key: str
     _generation_temperature: float
+    _completions_url: str
+    _timeout: float
+    _session: Session
 
-    def __init__(self, openai_key: str, generation_temperature: float = 0.5):
+    def __init__(self, openai_key: str, generation_temperature: float = 0.5, completions_url: str = COMPLETIONS_URL,
+                 timeout: float = 60.0, max_retries: int = 3, pool_size: int = 8):
         self._openai_key = openai_key
         self._generation_temperature = generation_temperature
+        self._completions_url = completions_url
+        self._timeout = timeout
+        # one keep-alive pool shared by every caller, retrying rate limits and server errors with backoff
+        retry = Retry(total=max_retries, backoff_factor=1.0, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["POST"])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self._session = Session()
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
 
     def analyse_request(self, request: IncomingRequest) -> dict:
-        return self.send_openai_request(self.user_message(request))
+        return self.send_openai_request(self.normalised_message(request))
 
     def send_openai_request(self, message: str) -> dict:
-        response = post(
-            COMPLETIONS_URL, headers=self.openai_headers,
+        response = self._session.post(
+            self._completions_url, headers=self.openai_headers, timeout=self._timeout,
             json=self.generate_openai_request_body(message, self._generation_temperature, self.system_message)
         )
         response.raise_for_status()
@@ -72,6 +95,32 @@ class RequestAnalyser:
         path = req.uri + (f"?{req.query_string}" if req.query_string else "")
         return f"PATH: {path}, METHOD: {req.method}, HEADERS: {req.headers}, BODY: {req.body}"
 
+    @staticmethod
+    def normalise_headers(headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+        if not headers:
+            return {}
+        return {k.lower(): v for k, v in sorted(headers.items(), key=lambda h: h[0].lower())
+                if k.lower() not in VOLATILE_HEADERS}
+
+    @staticmethod
+    def normalise_path(path: str, query_string: Optional[str]) -> str:
+        path = "/" + "/".join(segment for segment in unquote(path).split("/") if segment)
+        if query_string:
+            path += "?" + urlencode(sorted(parse_qsl(query_string, keep_blank_values=True)))
+        return path
+
+    @staticmethod
+    def normalised_message(req: IncomingRequest) -> str:
+        path = RequestAnalyser.normalise_path(req.uri, req.query_string)
+        method = getattr(req.method, "value", req.method)
+        headers = dumps(RequestAnalyser.normalise_headers(req.headers))
+        body = dumps(req.body, sort_keys=True)
+        return f"PATH: {path}, METHOD: {method}, HEADERS: {headers}, BODY: {body}"
+
+    @staticmethod
+    def fingerprint(req: IncomingRequest) -> str:
+        return sha256(RequestAnalyser.normalised_message(req).encode()).hexdigest()
+
     @staticmethod
     def generate_openai_request_body(user_message: str, temperature: float,
                                      system_message: Optional[str] = None) -> dict:
@@ -0,0 +1,3 @@
+-- the lookup reads the flask_recon tables, so only the indexes it depends on are ensured here
+CREATE UNIQUE INDEX IF NOT EXISTS "actor_host_unique_index" ON "actors" ("host");
+CREATE INDEX IF NOT EXISTS "request_actor_timestamp_index" ON "requests" ("actor_id", "timestamp", "request_id");
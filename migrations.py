@@ -0,0 +1,156 @@
+from hashlib import sha256
+from os import listdir
+from os.path import join, dirname, abspath, isdir
+from re import compile
+from sys import argv
+from typing import List, Tuple, Dict, Optional
+
+from database_util import BaseHandler, CONNECTION_PARAMS
+
+MIGRATION_FILE = compile(r"^(\d{4})_(\w+)\.sql$")
+PACKAGES = ("flask_recon", "ip_address_checker", "downtime_checker")
+# the ip address checker reads the flask_recon tables, so it migrates against the same database
+DEFAULT_DATABASES = {
+    "flask_recon": "flask_recon",
+    "ip_address_checker": "flask_recon",
+    "downtime_checker": "downtime_checker",
+}
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    _version: int
+    _name: str
+    _sql: str
+
+    def __init__(self, version: int, name: str, sql: str):
+        self._version = version
+        self._name = name
+        self._sql = sql
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def sql(self) -> str:
+        return self._sql
+
+    @property
+    def checksum(self) -> str:
+        return sha256(self._sql.encode()).hexdigest()
+
+
+class MigrationRunner:
+    _database_handler: BaseHandler
+    _package: str
+    _directory: str
+
+    def __init__(self, database_handler: BaseHandler, package: str, directory: Optional[str] = None):
+        self._database_handler = database_handler
+        self._package = package
+        self._directory = directory or join(dirname(abspath(__file__)), package, "migrations")
+        if not isdir(self._directory):
+            raise MigrationError(f"No migrations directory for {package} at {self._directory}.")
+
+    @property
+    def migrations(self) -> List[Migration]:
+        migrations = []
+        for file_name in sorted(listdir(self._directory)):
+            if (match := MIGRATION_FILE.match(file_name)) is None:
+                continue
+            with open(join(self._directory, file_name)) as f:
+                migrations.append(Migration(int(match.group(1)), match.group(2), f.read()))
+
+        versions = [migration.version for migration in migrations]
+        if len(versions) != len(set(versions)):
+            raise MigrationError(f"Duplicate migration versions in {self._directory}.")
+        return migrations
+
+    def ensure_table(self) -> None:
+        self._database_handler.execute("""
+            CREATE TABLE IF NOT EXISTS "schema_migrations"
+            (
+                "package"    VARCHAR(64)  NOT NULL,
+                "version"    INTEGER      NOT NULL,
+                "name"       VARCHAR(255) NOT NULL,
+                "checksum"   CHAR(64)     NOT NULL,
+                "applied_at" TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY ("package", "version")
+            )
+        """)
+
+    def applied(self) -> Dict[int, str]:
+        self._database_handler.execute('SELECT "version", "checksum" FROM "schema_migrations" WHERE "package" = %s',
+                                       (self._package,))
+        return dict(self._database_handler.fetchall())
+
+    def pending(self, target: Optional[int] = None) -> List[Migration]:
+        applied = self.applied()
+        pending = []
+        for migration in self.migrations:
+            if migration.version in applied:
+                # an applied migration that has since been edited would leave databases silently diverged
+                if applied[migration.version] != migration.checksum:
+                    raise MigrationError(f"{self._package} migration {migration.version}_{migration.name} changed "
+                                         "after it was applied.")
+                continue
+            if target is None or migration.version <= target:
+                pending.append(migration)
+        return pending
+
+    def run(self, target: Optional[int] = None) -> List[Tuple[int, str]]:
+        connection = self._database_handler.connection
+        applied = []
+        # a session lock survives the per-migration commits, so concurrent deployments apply each migration once
+        self._database_handler.execute("SELECT pg_advisory_lock(hashtext(%s))", (self._package,))
+        try:
+            self.ensure_table()
+            connection.commit()
+            for migration in self.pending(target):
+                try:
+                    self._database_handler.execute(migration.sql)
+                    self._database_handler.execute(
+                        'INSERT INTO "schema_migrations" ("package", "version", "name", "checksum") '
+                        "VALUES (%s, %s, %s, %s)",
+                        (self._package, migration.version, migration.name, migration.checksum))
+                    connection.commit()
+                except Exception as e:
+                    connection.rollback()
+                    raise MigrationError(f"{self._package} migration {migration.version}_{migration.name} "
+                                         f"failed: {e}")
+                applied.append((migration.version, migration.name))
+        finally:
+            connection.rollback()
+            self._database_handler.execute("SELECT pg_advisory_unlock(hashtext(%s))", (self._package,))
+            connection.commit()
+        return applied
+
+
+if __name__ == '__main__':
+    if not 2 <= len(argv) <= 4 or argv[1] not in PACKAGES:
+        print(f"Usage: python -m migrations <{'|'.join(PACKAGES)}> [Optional[dbname]] [Optional[target_version]]")
+        exit(1)
+
+    try:
+        target_version = int(argv[3]) if len(argv) > 3 else None
+    except ValueError:
+        print("Target version must be an integer.")
+        exit(1)
+
+    package = argv[1]
+    runner = MigrationRunner(
+        database_handler=BaseHandler(**{**CONNECTION_PARAMS,
+                                        "dbname": argv[2] if len(argv) > 2 else DEFAULT_DATABASES[package]}),
+        package=package
+    )
+    for version, name in runner.run(target_version):
+        print(f"Applied {package} migration {version:04d}_{name}.")
+    print(f"{package} schema is up to date.")
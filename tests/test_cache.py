@@ -0,0 +1,53 @@
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from flask_recon.cache import LRUCache
+
+
+class LRUCacheTest(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats, {"size": 2, "hits": 3, "misses": 1, "evictions": 1})
+
+    def test_put_refreshes_recency(self):
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("a", 10)
+        cache.put("c", 3)
+        self.assertEqual(cache.get("a"), 10)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+    def test_expired_entries_are_evicted(self):
+        cache = LRUCache(max_size=4, ttl=10.0)
+        with patch("flask_recon.cache.monotonic", return_value=100.0):
+            cache.put("a", 1)
+            cache.put("b", 2, ttl=30.0)
+        with patch("flask_recon.cache.monotonic", return_value=110.0):
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(cache.stats["evictions"], 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_invalidate(self):
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.invalidate("a")
+        cache.invalidate("missing")
+        self.assertIsNone(cache.get("a"))
+
+    def test_rejects_empty_cache(self):
+        with self.assertRaises(ValueError):
+            LRUCache(max_size=0)
+
+
+if __name__ == '__main__':
+    main()
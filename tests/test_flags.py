@@ -0,0 +1,58 @@
+from random import Random
+from unittest import TestCase, main
+
+from flask_recon.flags import Flag, FlagMatcher, RequestType, KNOWN_FLAGS
+
+
+def naive_match(flags, value):
+    # the per-flag substring scan FlagMatcher replaced
+    return [flag for flag in flags if flag.flag in value]
+
+
+def make_flags(strings):
+    return [Flag(request_types=[RequestType.SCAN], flag_string=string, score=1) for string in strings]
+
+
+class FlagMatcherTest(TestCase):
+    def assertMatchesNaive(self, flags, value):
+        self.assertEqual([flag.flag for flag in FlagMatcher(flags).match(value)],
+                         [flag.flag for flag in naive_match(flags, value)], value)
+
+    def test_overlapping_and_nested_flags(self):
+        flags = make_flags(["he", "she", "his", "hers", "e", "/etc/passwd", "etc", "passwd", "/etc", "aa", "aaa"])
+        for value in ["ushers", "/etc/passwd", "../../etc/passwd%00", "aaaa", "hishe", "", "nothing", "h"]:
+            self.assertMatchesNaive(flags, value)
+
+    def test_results_follow_flag_order(self):
+        flags = make_flags(["passwd", "/etc/", "etc"])
+        self.assertEqual([flag.flag for flag in FlagMatcher(flags).match("/etc/passwd")], ["passwd", "/etc/", "etc"])
+
+    def test_empty_flag_always_matches(self):
+        flags = make_flags(["", "admin"])
+        self.assertMatchesNaive(flags, "")
+        self.assertMatchesNaive(flags, "/admin")
+        self.assertEqual([flag.flag for flag in FlagMatcher(flags).match(None)], [""])
+
+    def test_duplicate_flags(self):
+        self.assertMatchesNaive(make_flags(["abc", "abc", "bc"]), "xabcx")
+
+    def test_random_values(self):
+        rng = Random(0)
+        alphabet = "abc/."
+        for _ in range(200):
+            flags = make_flags(["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+                                for _ in range(rng.randint(1, 12))])
+            value = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            self.assertMatchesNaive(flags, value)
+
+    def test_known_flags(self):
+        rng = Random(1)
+        strings = [flag.flag for flag in KNOWN_FLAGS.known_payload_flags]
+        for _ in range(200):
+            # stitched from real flags so overlaps between them are exercised, not just random noise
+            value = "".join(rng.choice(strings)[rng.randint(0, 3):] for _ in range(rng.randint(1, 4)))
+            self.assertMatchesNaive(KNOWN_FLAGS.known_payload_flags, value)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from flask_recon.limiter import TokenBucketLimiter
+
+
+class TokenBucketLimiterTest(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.clock = patch("flask_recon.limiter.monotonic", side_effect=lambda: self.now)
+        self.clock.start()
+        self.addCleanup(self.clock.stop)
+
+    def test_burst_then_limited(self):
+        limiter = TokenBucketLimiter(rate=1.0, burst=3.0)
+        self.assertEqual([limiter.allow("192.0.2.1") for _ in range(4)], [True, True, True, False])
+
+    def test_refills_at_rate(self):
+        limiter = TokenBucketLimiter(rate=2.0, burst=2.0)
+        self.assertTrue(limiter.allow("192.0.2.1"))
+        self.assertTrue(limiter.allow("192.0.2.1"))
+        self.assertFalse(limiter.allow("192.0.2.1"))
+        self.now += 0.5
+        self.assertTrue(limiter.allow("192.0.2.1"))
+        self.assertFalse(limiter.allow("192.0.2.1"))
+
+    def test_refill_is_capped_at_burst(self):
+        limiter = TokenBucketLimiter(rate=10.0, burst=2.0)
+        limiter.allow("192.0.2.1")
+        self.now += 3600
+        self.assertEqual([limiter.allow("192.0.2.1") for _ in range(3)], [True, True, False])
+
+    def test_rejected_requests_spend_no_tokens(self):
+        limiter = TokenBucketLimiter(rate=1.0, burst=1.0)
+        self.assertTrue(limiter.allow("192.0.2.1"))
+        for _ in range(5):
+            self.assertFalse(limiter.allow("192.0.2.1"))
+        self.now += 1.0
+        self.assertTrue(limiter.allow("192.0.2.1"))
+
+    def test_hosts_have_separate_buckets(self):
+        limiter = TokenBucketLimiter(rate=1.0, burst=1.0)
+        self.assertTrue(limiter.allow("192.0.2.1"))
+        self.assertFalse(limiter.allow("192.0.2.1"))
+        self.assertTrue(limiter.allow("192.0.2.2"))
+
+    def test_least_recently_seen_host_is_forgotten(self):
+        limiter = TokenBucketLimiter(rate=1.0, burst=1.0, max_hosts=2)
+        limiter.allow("192.0.2.1")
+        limiter.allow("192.0.2.2")
+        limiter.allow("192.0.2.1")
+        limiter.allow("192.0.2.3")
+        self.assertEqual(len(limiter), 2)
+        # forgotten, so it starts again with a full bucket
+        self.assertTrue(limiter.allow("192.0.2.2"))
+        self.assertFalse(limiter.allow("192.0.2.3"))
+
+    def test_rejects_invalid_parameters(self):
+        for kwargs in [{"rate": 0}, {"burst": 0.5}, {"max_hosts": 0}]:
+            with self.assertRaises(ValueError, msg=kwargs):
+                TokenBucketLimiter(**kwargs)
+
+
+if __name__ == '__main__':
+    main()
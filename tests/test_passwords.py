@@ -0,0 +1,98 @@
+from base64 import b64encode
+from hashlib import sha256
+from unittest import TestCase, main
+
+from flask_recon.passwords import KeyDerivationFunction, LegacySha256, PasswordHasher, Pbkdf2, Scrypt
+
+# far below the production cost, so the suite stays fast
+FAST_SCRYPT = {"n": 2 ** 4, "r": 8, "p": 1}
+FAST_PBKDF2 = {"iterations": 1000}
+
+
+class AdminStore:
+    # stands in for the two DatabaseHandler calls PasswordHasher.authenticate makes
+    def __init__(self, passwords):
+        self.passwords = passwords
+
+    def get_admin_password(self, username):
+        return self.passwords.get(username)
+
+    def update_admin_password(self, username, encoded):
+        self.passwords[username] = encoded
+
+
+class KeyDerivationFunctionTest(TestCase):
+    def test_verify(self):
+        for kdf in [Scrypt(**FAST_SCRYPT), Pbkdf2(**FAST_PBKDF2)]:
+            encoded = kdf.hash("correct horse")
+            self.assertTrue(kdf.handles(encoded))
+            self.assertTrue(kdf.verify("correct horse", encoded))
+            self.assertFalse(kdf.verify("wrong horse", encoded))
+            tampered = f"{encoded.rsplit('$', 1)[0]}${b64encode(bytes(32)).decode()}"
+            self.assertFalse(kdf.verify("correct horse", tampered))
+            self.assertFalse(kdf.verify("correct horse", "not$an$encoded$hash"))
+
+    def test_hashes_are_salted(self):
+        kdf = Pbkdf2(**FAST_PBKDF2)
+        self.assertNotEqual(kdf.hash("correct horse"), kdf.hash("correct horse"))
+
+    def test_needs_rehash_when_parameters_change(self):
+        encoded = Scrypt(**FAST_SCRYPT).hash("correct horse")
+        self.assertFalse(Scrypt(**FAST_SCRYPT).needs_rehash(encoded))
+        self.assertTrue(Scrypt(**{**FAST_SCRYPT, "n": 2 ** 5}).needs_rehash(encoded))
+        encoded = Pbkdf2(**FAST_PBKDF2).hash("correct horse")
+        self.assertFalse(Pbkdf2(**FAST_PBKDF2).needs_rehash(encoded))
+        self.assertTrue(Pbkdf2(iterations=2000).needs_rehash(encoded))
+
+    def test_legacy_sha256_is_verify_only(self):
+        kdf = LegacySha256()
+        encoded = sha256(b"correct horse").hexdigest()
+        self.assertTrue(kdf.handles(encoded))
+        self.assertTrue(kdf.verify("correct horse", encoded))
+        with self.assertRaises(ValueError):
+            kdf.hash("correct horse")
+
+    def test_incomplete_kdf_cannot_be_instantiated(self):
+        class HashOnly(KeyDerivationFunction):
+            name = "hash_only"
+
+            def hash(self, password: str) -> str:
+                return password
+
+        with self.assertRaises(TypeError):
+            HashOnly()
+
+
+class PasswordHasherTest(TestCase):
+    def setUp(self):
+        self.hasher = PasswordHasher(kdf=Scrypt(**FAST_SCRYPT), workers=1)
+        self.addCleanup(self.hasher.shutdown)
+
+    def test_rehashes_older_hashes_on_login(self):
+        for encoded in [sha256(b"correct horse").hexdigest(), Pbkdf2(**FAST_PBKDF2).hash("correct horse"),
+                        Scrypt(**{**FAST_SCRYPT, "n": 2 ** 5}).hash("correct horse")]:
+            store = AdminStore({"admin": encoded})
+            self.assertTrue(self.hasher.authenticate(store, "admin", "correct horse"))
+            self.assertNotEqual(store.passwords["admin"], encoded)
+            self.assertFalse(self.hasher.needs_rehash(store.passwords["admin"]))
+            self.assertTrue(self.hasher.verify("correct horse", store.passwords["admin"]))
+
+    def test_wrong_password_is_not_rehashed(self):
+        encoded = sha256(b"correct horse").hexdigest()
+        store = AdminStore({"admin": encoded})
+        self.assertFalse(self.hasher.authenticate(store, "admin", "wrong horse"))
+        self.assertEqual(store.passwords["admin"], encoded)
+
+    def test_current_hash_is_kept(self):
+        encoded = self.hasher.hash("correct horse")
+        store = AdminStore({"admin": encoded})
+        self.assertTrue(self.hasher.authenticate(store, "admin", "correct horse"))
+        self.assertEqual(store.passwords["admin"], encoded)
+
+    def test_unknown_user_and_format(self):
+        self.assertFalse(self.hasher.authenticate(AdminStore({}), "nobody", "correct horse"))
+        self.assertFalse(self.hasher.verify("correct horse", "bcrypt$unknown"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+from base64 import urlsafe_b64encode
+from datetime import datetime
+from unittest import TestCase, main
+
+from flask_recon.structures import PageCursor
+
+
+class PageCursorTest(TestCase):
+    def test_round_trip(self):
+        for timestamp in [datetime(2024, 2, 29, 23, 59, 59, 999999), datetime(1970, 1, 1)]:
+            cursor = PageCursor.decode(PageCursor(timestamp, 123456).encode())
+            self.assertEqual(cursor.timestamp, timestamp)
+            self.assertEqual(cursor.request_id, 123456)
+
+    def test_token_is_url_safe(self):
+        token = PageCursor(datetime(2024, 1, 1, 12, 30), 1).encode()
+        self.assertNotRegex(token, r"[+/]")
+
+    def test_invalid_tokens(self):
+        for token in ["not base64!", urlsafe_b64encode(b"no-separator").decode(),
+                      urlsafe_b64encode(b"yesterday|1").decode(), urlsafe_b64encode(b"2024-01-01|one").decode(),
+                      urlsafe_b64encode(b"\xff\xfe").decode()]:
+            with self.assertRaises(ValueError, msg=token):
+                PageCursor.decode(token)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+from unittest import TestCase, main
+
+from flask import Flask, Response, request
+
+from flask_recon.tarpit import Tarpit
+
+
+class TarpitTest(TestCase):
+    def setUp(self):
+        self.tarpit = Tarpit(chunk_size=16, drip_interval=0, max_chunks=2, max_per_ip=4, max_connections=8)
+        self.app = Flask(__name__)
+
+        # mirrors Listener.handle_request, which hands the stream to werkzeug the same way
+        @self.app.route("/<path:path>", methods=["GET", "HEAD"])
+        def tarpitted(path):
+            if (stream := self.tarpit.stream(request.remote_addr)) is None:
+                return "404 Not Found", 404
+            return Response(stream, status=200, content_type="text/plain", direct_passthrough=True)
+
+    def test_head_requests_release_their_slot(self):
+        client = self.app.test_client()
+        for _ in range(10):
+            # the test client only calls the WSGI close() once its own response is closed
+            with client.head("/wp-login.php") as response:
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.tarpit.active, 0)
+        self.assertEqual(self.tarpit.stats["rejected"], 0)
+
+    def test_get_requests_release_their_slot(self):
+        client = self.app.test_client()
+        for _ in range(10):
+            with client.get("/wp-login.php") as response:
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), 32)
+        self.assertEqual(self.tarpit.active, 0)
+
+    def test_unstarted_stream_releases_on_close(self):
+        stream = self.tarpit.stream("192.0.2.1")
+        self.assertEqual(self.tarpit.active, 1)
+        stream.close()
+        stream.close()
+        self.assertEqual(self.tarpit.active, 0)
+        self.assertEqual(self.tarpit.stats["active_hosts"], 0)
+
+    def test_per_address_cap(self):
+        streams = [self.tarpit.stream("192.0.2.1") for _ in range(5)]
+        self.assertIsNone(streams[-1])
+        for stream in streams[:-1]:
+            stream.close()
+        self.assertIsNotNone(self.tarpit.stream("192.0.2.1"))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,20 @@
 from flask import Flask, render_template, request, Response
 from gevent.pywsgi import WSGIServer
 
+from database_util import HandlerPool, CONNECTION_PARAMS
 from flask_recon import Listener, add_routes
 import ip_address_checker
 from ip_address_checker.database import IpNotFound
 
+WEBSITE_CONNECTION_PARAMS = {**CONNECTION_PARAMS, "dbname": "new_flask_recon"}
+
 app = Flask(__name__)
-ip_address_db_handler = ip_address_checker.DatabaseHandler("new_flask_recon", "postgres", "postgres", "localhost", "5432")
+ip_address_db_pool = HandlerPool(
+    handler_class=ip_address_checker.DatabaseHandler,
+    connection_params=WEBSITE_CONNECTION_PARAMS,
+    min_size=1,
+    max_size=4
+)
 
 
 @app.route('/')
@@ -53,7 +61,8 @@ def ip_lookup():
     elif request.method == "POST":
         ip_address = request.form["ip_address"]
         try:
-            host_id, host, request_count = ip_address_db_handler.get_ip_details(ip_address)
+            with ip_address_db_pool.connection() as ip_address_db_handler:
+                host_id, host, request_count = ip_address_db_handler.get_ip_details(ip_address)
         except IpNotFound:
             return render_template('ip-address-search-result.html', host_id=None, host=None, request_count=None)
         return render_template('ip-address-search-result.html', host_id=host_id, host=host, request_count=request_count)
@@ -74,6 +83,6 @@ def cv():
 if __name__ == '__main__':
     listener = Listener(app, halt_scanner_threads=False)
     add_routes(listener, run_api=False, run_webapp=True)
-    listener.connect_database("new_flask_recon", "postgres", "postgres", "localhost", "5432")
+    listener.connect_database(**WEBSITE_CONNECTION_PARAMS, min_connections=2, max_connections=16)
     http_server = WSGIServer(('0.0.0.0', 443), listener, keyfile="key.pem", certfile="cert.pem")
     http_server.serve_forever()